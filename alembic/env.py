@@ -14,7 +14,7 @@ from database.database import Base
 # Base = declarative_base()
 
 # Import your models here so Alembic can detect them
-from models import otp, user, merchant, merchant_detail
+from models import otp, user, merchant, merchant_detail, catalog, webhook
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -75,7 +75,7 @@ from database.database import Base
 # Base = declarative_base()
 
 # Import your models here so Alembic can detect them
-from models import otp, user, merchant, merchant_detail
+from models import otp, user, merchant, merchant_detail, catalog, webhook
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
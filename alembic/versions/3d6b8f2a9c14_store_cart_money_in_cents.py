@@ -0,0 +1,61 @@
+"""Store cart money in integer cents
+
+Revision ID: 3d6b8f2a9c14
+Revises: 5e9a7c1d3f28
+Create Date: 2026-10-18 16:41:09.284617
+
+Replaces the Float price/total columns of carts, cart_items and
+cart_item_modifiers with integer cents, and adds cart_items.modifiers_cents
+(the per-unit sum of an item's modifiers) so totals can be moved by deltas.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d6b8f2a9c14'
+down_revision: Union[str, Sequence[str], None] = '5e9a7c1d3f28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, float column, cents column, cents type)
+MONEY_COLUMNS = [
+    ('carts', 'subtotal', 'subtotal_cents', sa.BigInteger()),
+    ('carts', 'total_amount', 'total_cents', sa.BigInteger()),
+    ('cart_items', 'price', 'price_cents', sa.Integer()),
+    ('cart_items', 'line_total', 'line_total_cents', sa.Integer()),
+    ('cart_item_modifiers', 'price', 'price_cents', sa.Integer()),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, float_column, cents_column, cents_type in MONEY_COLUMNS:
+        op.add_column(table, sa.Column(cents_column, cents_type, nullable=False, server_default='0'))
+        op.execute(f'UPDATE {table} SET {cents_column} = ROUND(COALESCE({float_column}, 0) * 100)')
+        op.drop_column(table, float_column)
+
+    op.add_column('cart_items', sa.Column('modifiers_cents', sa.Integer(), nullable=False, server_default='0'))
+    op.execute(
+        'UPDATE cart_items SET modifiers_cents = ('
+        'SELECT COALESCE(SUM(cart_item_modifiers.price_cents), 0) FROM cart_item_modifiers '
+        'WHERE cart_item_modifiers.cart_item_id = cart_items.id)'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('cart_items', 'modifiers_cents')
+
+    for table, float_column, cents_column, _ in reversed(MONEY_COLUMNS):
+        # Same nullability and defaults the Float columns had before
+        nullable = (table, float_column) in {('carts', 'subtotal'), ('carts', 'total_amount'), ('cart_item_modifiers', 'price')}
+        op.add_column(table, sa.Column(float_column, sa.Float(), nullable=True))
+        op.execute(f'UPDATE {table} SET {float_column} = {cents_column} / 100.0')
+        if not nullable:
+            op.alter_column(table, float_column, existing_type=sa.Float(), nullable=False)
+        op.drop_column(table, cents_column)
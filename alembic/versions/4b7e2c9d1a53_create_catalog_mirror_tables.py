@@ -0,0 +1,139 @@
+"""Create catalog mirror tables
+
+Revision ID: 4b7e2c9d1a53
+Revises: cafe5df41e54
+Create Date: 2026-10-18 10:12:41.208531
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e2c9d1a53'
+down_revision: Union[str, Sequence[str], None] = 'cafe5df41e54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('catalog_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('merchant_id', sa.String(length=64), nullable=False),
+    sa.Column('clover_id', sa.String(length=64), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=True),
+    sa.Column('price', sa.BigInteger(), nullable=False),
+    sa.Column('price_type', sa.String(length=32), nullable=True),
+    sa.Column('sku', sa.String(length=100), nullable=True),
+    sa.Column('hidden', sa.Boolean(), nullable=False),
+    sa.Column('available', sa.Boolean(), nullable=True),
+    sa.Column('modified_time', sa.BigInteger(), nullable=True),
+    sa.Column('data', sa.JSON(), nullable=False),
+    sa.Column('synced_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('merchant_id', 'clover_id', name='uq_catalog_items_merchant_item')
+    )
+    op.create_index(op.f('ix_catalog_items_id'), 'catalog_items', ['id'], unique=False)
+    op.create_index('ix_catalog_items_merchant_modified', 'catalog_items', ['merchant_id', 'modified_time'], unique=False)
+
+    op.create_table('catalog_categories',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('merchant_id', sa.String(length=64), nullable=False),
+    sa.Column('clover_id', sa.String(length=64), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=True),
+    sa.Column('sort_order', sa.Integer(), nullable=True),
+    sa.Column('modified_time', sa.BigInteger(), nullable=True),
+    sa.Column('data', sa.JSON(), nullable=False),
+    sa.Column('synced_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('merchant_id', 'clover_id', name='uq_catalog_categories_merchant_category')
+    )
+    op.create_index(op.f('ix_catalog_categories_id'), 'catalog_categories', ['id'], unique=False)
+
+    op.create_table('catalog_item_categories',
+    sa.Column('merchant_id', sa.String(length=64), nullable=False),
+    sa.Column('item_id', sa.String(length=64), nullable=False),
+    sa.Column('category_id', sa.String(length=64), nullable=False),
+    sa.PrimaryKeyConstraint('merchant_id', 'item_id', 'category_id')
+    )
+    op.create_index('ix_catalog_item_categories_category', 'catalog_item_categories', ['merchant_id', 'category_id'], unique=False)
+
+    op.create_table('catalog_modifier_groups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('merchant_id', sa.String(length=64), nullable=False),
+    sa.Column('clover_id', sa.String(length=64), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=True),
+    sa.Column('min_required', sa.Integer(), nullable=True),
+    sa.Column('max_allowed', sa.Integer(), nullable=True),
+    sa.Column('modified_time', sa.BigInteger(), nullable=True),
+    sa.Column('data', sa.JSON(), nullable=False),
+    sa.Column('synced_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('merchant_id', 'clover_id', name='uq_catalog_modifier_groups_merchant_group')
+    )
+    op.create_index(op.f('ix_catalog_modifier_groups_id'), 'catalog_modifier_groups', ['id'], unique=False)
+
+    op.create_table('catalog_modifiers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('merchant_id', sa.String(length=64), nullable=False),
+    sa.Column('clover_id', sa.String(length=64), nullable=False),
+    sa.Column('modifier_group_id', sa.String(length=64), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=True),
+    sa.Column('price', sa.BigInteger(), nullable=False),
+    sa.Column('available', sa.Boolean(), nullable=True),
+    sa.Column('data', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('merchant_id', 'clover_id', name='uq_catalog_modifiers_merchant_modifier')
+    )
+    op.create_index(op.f('ix_catalog_modifiers_id'), 'catalog_modifiers', ['id'], unique=False)
+    op.create_index('ix_catalog_modifiers_group', 'catalog_modifiers', ['merchant_id', 'modifier_group_id'], unique=False)
+
+    op.create_table('catalog_item_stocks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('merchant_id', sa.String(length=64), nullable=False),
+    sa.Column('item_id', sa.String(length=64), nullable=False),
+    sa.Column('stock_count', sa.BigInteger(), nullable=True),
+    sa.Column('quantity', sa.Float(), nullable=True),
+    sa.Column('modified_time', sa.BigInteger(), nullable=True),
+    sa.Column('data', sa.JSON(), nullable=False),
+    sa.Column('synced_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('merchant_id', 'item_id', name='uq_catalog_item_stocks_merchant_item')
+    )
+    op.create_index(op.f('ix_catalog_item_stocks_id'), 'catalog_item_stocks', ['id'], unique=False)
+
+    op.create_table('catalog_sync_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('merchant_id', sa.String(length=64), nullable=False),
+    sa.Column('entity', sa.String(length=32), nullable=False),
+    sa.Column('watermark', sa.BigInteger(), nullable=True),
+    sa.Column('last_full_sync_at', sa.DateTime(), nullable=True),
+    sa.Column('last_synced_at', sa.DateTime(), nullable=True),
+    sa.Column('object_count', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('merchant_id', 'entity', name='uq_catalog_sync_state_merchant_entity')
+    )
+    op.create_index(op.f('ix_catalog_sync_state_id'), 'catalog_sync_state', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_catalog_sync_state_id'), table_name='catalog_sync_state')
+    op.drop_table('catalog_sync_state')
+    op.drop_index(op.f('ix_catalog_item_stocks_id'), table_name='catalog_item_stocks')
+    op.drop_table('catalog_item_stocks')
+    op.drop_index('ix_catalog_modifiers_group', table_name='catalog_modifiers')
+    op.drop_index(op.f('ix_catalog_modifiers_id'), table_name='catalog_modifiers')
+    op.drop_table('catalog_modifiers')
+    op.drop_index(op.f('ix_catalog_modifier_groups_id'), table_name='catalog_modifier_groups')
+    op.drop_table('catalog_modifier_groups')
+    op.drop_index('ix_catalog_item_categories_category', table_name='catalog_item_categories')
+    op.drop_table('catalog_item_categories')
+    op.drop_index(op.f('ix_catalog_categories_id'), table_name='catalog_categories')
+    op.drop_table('catalog_categories')
+    op.drop_index('ix_catalog_items_merchant_modified', table_name='catalog_items')
+    op.drop_index(op.f('ix_catalog_items_id'), table_name='catalog_items')
+    op.drop_table('catalog_items')
@@ -0,0 +1,61 @@
+"""Add indexes for the hot query paths
+
+Revision ID: 5e9a7c1d3f28
+Revises: 8c3f1e6a2b47
+Create Date: 2026-10-18 15:20:44.118302
+
+Check the plans afterwards with `python -m database.explain_check`.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e9a7c1d3f28'
+down_revision: Union[str, Sequence[str], None] = '8c3f1e6a2b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_merchant_tokens_merchant_id', 'merchant_tokens', ['merchant_id']),       # get_merchant_token join
+    ('ix_carts_session_status', 'carts', ['session_id', 'status']),               # get_active_cart_by_session
+    ('ix_cart_items_cart_item', 'cart_items', ['cart_id', 'clover_item_id']),     # add_item_to_cart duplicate check
+    ('ix_cart_item_modifiers_cart_item_id', 'cart_item_modifiers', ['cart_item_id']),
+    ('ix_orders_merchant_created', 'orders', ['clover_merchant_id', 'created_at']),
+    # verify-otp needs none: otps' existing mobile_number index already narrows it to one number's codes
+]
+
+# Foreign key columns: MySQL drops its implicit FK index once one of ours can serve the
+# constraint, and won't let ours be dropped while it's the only one left
+FOREIGN_KEY_COLUMNS = {
+    'merchant_tokens': 'merchant_id',
+    'cart_items': 'cart_id',
+    'cart_item_modifiers': 'cart_item_id',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in reversed(INDEXES):
+        column = FOREIGN_KEY_COLUMNS.get(table)
+        if column:
+            others = [
+                index for index in inspector.get_indexes(table)
+                if index['name'] != name and index['column_names'][:1] == [column]
+            ]
+            if not others:
+                # Put back a plain index for the foreign key first (named like MySQL's implicit one)
+                op.create_index(column, table, [column], unique=False)
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,36 @@
+"""Add token expiry and refresh token to merchant_tokens
+
+Revision ID: 8c3f1e6a2b47
+Revises: 4b7e2c9d1a53
+Create Date: 2026-10-18 14:02:17.530914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c3f1e6a2b47'
+down_revision: Union[str, Sequence[str], None] = '4b7e2c9d1a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('merchant_tokens', sa.Column('refresh_token', sa.Text(), nullable=True))
+    op.add_column('merchant_tokens', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    op.add_column('merchant_tokens', sa.Column('refresh_token_expires_at', sa.DateTime(), nullable=True))
+    op.add_column('merchant_tokens', sa.Column('refreshed_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_merchant_tokens_expires_at'), 'merchant_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_merchant_tokens_expires_at'), table_name='merchant_tokens')
+    op.drop_column('merchant_tokens', 'refreshed_at')
+    op.drop_column('merchant_tokens', 'refresh_token_expires_at')
+    op.drop_column('merchant_tokens', 'expires_at')
+    op.drop_column('merchant_tokens', 'refresh_token')
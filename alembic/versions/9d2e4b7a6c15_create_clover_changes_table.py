@@ -0,0 +1,41 @@
+"""Create the shared log of received Clover webhook events
+
+Revision ID: 9d2e4b7a6c15
+Revises: 3d6b8f2a9c14
+Create Date: 2026-10-18 16:40:52.118306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2e4b7a6c15'
+down_revision: Union[str, Sequence[str], None] = '3d6b8f2a9c14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('clover_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('merchant_id', sa.String(length=64), nullable=False),
+    sa.Column('object_type', sa.String(length=8), nullable=False),
+    sa.Column('object_id', sa.String(length=64), nullable=False),
+    sa.Column('type', sa.String(length=16), nullable=False),
+    sa.Column('ts', sa.BigInteger(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_clover_changes_id'), 'clover_changes', ['id'], unique=False)
+    op.create_index('ix_clover_changes_created_at', 'clover_changes', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_clover_changes_created_at', table_name='clover_changes')
+    op.drop_index(op.f('ix_clover_changes_id'), table_name='clover_changes')
+    op.drop_table('clover_changes')
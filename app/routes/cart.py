@@ -1,9 +1,10 @@
 # app/routes/cart.py
 from fastapi import APIRouter, HTTPException, Query, Depends, Body
-from sqlalchemy.orm import Session
-from database.database import get_db
-from helpers.cart_helper import CartHelper
-from helpers.merchant_helper import MerchantHelper
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.database import get_async_db
+from helpers.cart_helper import AsyncCartHelper, CartNotActiveError
+from helpers.merchant_helper import AsyncMerchantHelper
+from services.item_availability import ItemAvailability, ItemUnavailableError, get_item_availability
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
@@ -51,7 +52,7 @@ def _build_headers(access_token: str):
 @router.post("/create")
 async def create_cart(
     request: CreateCartRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new empty cart for guest or logged-in user"""
     try:
@@ -65,7 +66,7 @@ async def create_cart(
         # For logged-in users, session_id is optional but recommended
         # For guest users, session_id is required
 
-        cart = CartHelper.create_cart(
+        cart = await AsyncCartHelper.create_cart(
             db=db,
             merchant_id=request.merchant_id,
             # customer_id=request.customer_id,  # Can be None for guests
@@ -90,10 +91,10 @@ async def create_cart(
 @router.get("/{cart_id}")
 async def get_cart(
     cart_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get cart details with all items and modifiers"""
-    cart_summary = CartHelper.get_cart_summary(db, cart_id)
+    cart_summary = await AsyncCartHelper.get_cart_summary(db, cart_id)
     if not cart_summary:
         raise HTTPException(status_code=404, detail="Cart not found")
 
@@ -107,26 +108,31 @@ async def get_cart(
 async def add_item_to_cart(
     cart_id: int,
     request: AddItemRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    item_availability: ItemAvailability = Depends(get_item_availability)
 ):
-    """Add an item to the cart"""
+    """Add an item to the cart (refused with 409 when the merchant is out of stock)"""
     try:
-        # Check if cart exists
-        cart = CartHelper.get_cart_by_id(db, cart_id)
+        # Check if cart exists (whether it's still active is checked under the cart lock)
+        cart = await AsyncCartHelper.get_cart_by_id(db, cart_id, with_items=False)
         if not cart:
             raise HTTPException(status_code=404, detail="Cart not found")
 
-        if cart.status != "active":
-            raise HTTPException(status_code=400, detail="Cannot modify inactive cart")
+        # Stock comes from memory only, loaded by the availability poll loop; until a
+        # merchant's first load lands the check is skipped rather than waiting on Clover
+        availability = item_availability.peek(cart.clover_merchant_id)
+        if availability is None:
+            item_availability.unchecked += 1
 
-        cart_item = CartHelper.add_item_to_cart(
+        cart_item = await AsyncCartHelper.add_item_to_cart(
             db=db,
             cart_id=cart_id,
             clover_item_id=request.clover_item_id,
             name=request.name,
             price=request.price,
             quantity=request.quantity,
-            notes=request.notes
+            notes=request.notes,
+            availability=availability
         )
 
         return {
@@ -136,6 +142,12 @@ async def add_item_to_cart(
             "quantity": cart_item.quantity,
             "line_total": cart_item.line_total
         }
+    except ItemUnavailableError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except CartNotActiveError:
+        raise HTTPException(status_code=400, detail="Cannot modify inactive cart")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add item: {str(e)}")
 
@@ -145,11 +157,11 @@ async def update_item_quantity(
     cart_id: int,
     cart_item_id: int,
     request: UpdateQuantityRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update quantity of a cart item"""
     try:
-        cart_item = CartHelper.update_item_quantity(
+        cart_item = await AsyncCartHelper.update_item_quantity(
             db=db,
             cart_item_id=cart_item_id,
             quantity=request.quantity
@@ -179,10 +191,10 @@ async def update_item_quantity(
 async def remove_item_from_cart(
     cart_id: int,
     cart_item_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Remove an item from the cart"""
-    success = CartHelper.remove_item_from_cart(db, cart_item_id)
+    success = await AsyncCartHelper.remove_item_from_cart(db, cart_item_id)
     if not success:
         raise HTTPException(status_code=404, detail="Cart item not found")
 
@@ -198,11 +210,11 @@ async def add_modifier_to_item(
     cart_id: int,
     cart_item_id: int,
     request: AddModifierRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add a modifier to a cart item"""
     try:
-        modifier = CartHelper.add_modifier_to_item(
+        modifier = await AsyncCartHelper.add_modifier_to_item(
             db=db,
             cart_item_id=cart_item_id,
             clover_modifier_id=request.clover_modifier_id,
@@ -225,10 +237,10 @@ async def add_modifier_to_item(
 @router.delete("/{cart_id}/clear")
 async def clear_cart(
     cart_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Clear all items from the cart"""
-    success = CartHelper.clear_cart(db, cart_id)
+    success = await AsyncCartHelper.clear_cart(db, cart_id)
     if not success:
         raise HTTPException(status_code=404, detail="Cart not found")
 
@@ -242,14 +254,14 @@ async def clear_cart(
 @router.get("/session/{session_id}")
 async def get_cart_by_session(
     session_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get active cart by session ID (for guest users)"""
-    cart = CartHelper.get_active_cart_by_session(db, session_id)
+    cart = await AsyncCartHelper.get_active_cart_by_session(db, session_id)
     if not cart:
         raise HTTPException(status_code=404, detail="No active cart found for this session")
 
-    cart_summary = CartHelper.get_cart_summary(db, cart.id)
+    cart_summary = await AsyncCartHelper.get_cart_summary(db, cart.id)
     return {
         "success": True,
         "cart": cart_summary
@@ -260,12 +272,12 @@ async def get_cart_by_session(
 async def assign_customer_to_cart(
     cart_id: int,
     # customer_id: str = Query(..., description="Customer ID to assign to cart"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Assign a logged-in customer to a guest cart (when user logs in during checkout)"""
     try:
         # Check if cart exists and is active
-        cart = CartHelper.get_cart_by_id(db, cart_id)
+        cart = await AsyncCartHelper.get_cart_by_id(db, cart_id)
         if not cart:
             raise HTTPException(status_code=404, detail="Cart not found")
 
@@ -278,7 +290,7 @@ async def assign_customer_to_cart(
         # Update cart with customer ID
         # cart.customer_id = customer_id
         cart.updated_at = datetime.now()
-        db.commit()
+        await db.commit()
 
         return {
             "success": True,
@@ -289,18 +301,18 @@ async def assign_customer_to_cart(
             "user_type": "logged_in"
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to assign customer: {str(e)}")
 
 
 @router.get("/customer/{customer_id}")
 async def get_customer_carts(
     customer_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all carts for a specific customer (logged-in user)"""
     try:
-        carts = CartHelper.get_carts_by_customer(db, customer_id)
+        carts = await AsyncCartHelper.get_carts_by_customer(db, customer_id)
         return {
             "success": True,
             "customer_id": customer_id,
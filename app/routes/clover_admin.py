@@ -0,0 +1,212 @@
+# app/routes/clover_admin.py
+import asyncio
+from fastapi import APIRouter, Query, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from database.database import SessionLocal, get_async_db
+from helpers.catalog_helper import AsyncCatalogHelper
+from helpers.merchant_helper import AsyncMerchantHelper, token_cache
+from services.clover_client import CloverClient, get_clover_client
+from services.catalog_sync import sync_merchant_catalog
+from services.catalog_index import CatalogIndex, get_catalog_index
+from services.item_availability import ItemAvailability, get_item_availability
+from services.clover_webhooks import WebhookProcessor, get_webhook_processor
+from services.catalog_warmup import CatalogWarmer, get_catalog_warmer
+from services.token_refresh import TokenRefresher, TokenRefreshError, get_token_refresher
+from services.cart_totals import CartTotalsVerifier, get_cart_totals_verifier
+from services.leader import LeaderElection, get_scheduler_leader
+from app.config.settings import Settings
+from utils.compression import precompressed
+
+router = APIRouter(prefix="/clover/admin", tags=["Clover Admin"])
+
+
+@router.get("/rate-limits")
+async def get_rate_limit_stats(
+    merchant_id: Optional[str] = Query(None, description="Optional Clover merchant ID to filter"),
+    clover: CloverClient = Depends(get_clover_client),
+):
+    """Queue depth and throttle counts per merchant, for sizing rate limits"""
+    if not clover.rate_limiter:
+        return {"success": True, "enabled": False, "merchants": {}}
+
+    return {
+        "success": True,
+        "enabled": True,
+        "merchants": clover.rate_limiter.stats(merchant_id),
+    }
+
+
+@router.get("/single-flight")
+async def get_single_flight_stats(clover: CloverClient = Depends(get_clover_client)):
+    """How many Clover GETs went upstream vs. shared an identical in-flight call"""
+    return {"success": True, "single_flight": clover.single_flight.stats()}
+
+
+@router.get("/circuit-breakers")
+async def get_circuit_breaker_stats(
+    merchant_id: Optional[str] = Query(None, description="Optional Clover merchant ID to filter"),
+    clover: CloverClient = Depends(get_clover_client),
+):
+    """Breaker state per merchant and endpoint, plus how many stale fallbacks are cached"""
+    return {
+        "success": True,
+        "merchants": clover.breakers.stats(merchant_id),
+        "stale_entries": len(clover.cache),
+    }
+
+
+@router.get("/http-cache")
+async def get_http_cache_stats(
+    merchant_id: Optional[str] = Query(None, description="Optional Clover merchant ID to filter"),
+    clover: CloverClient = Depends(get_clover_client),
+):
+    """Hit ratio, memory use and per-endpoint hits / 304s / downloads for cached Clover GETs"""
+    return {"success": True, "http_cache": clover.cache.stats(merchant_id), "precompressed": precompressed.stats()}
+
+
+@router.post("/http-cache/invalidate")
+async def invalidate_http_cache(
+    merchant_id: str = Query(..., description="Clover merchant ID whose cached responses to drop"),
+    endpoint: Optional[str] = Query(None, description="Only this endpoint, e.g. items or modifier_groups"),
+    clover: CloverClient = Depends(get_clover_client),
+):
+    """Drop a merchant's cached Clover responses, e.g. after a menu edit"""
+    removed = clover.cache.invalidate(merchant_id, endpoint)
+    return {"success": True, "merchant_id": merchant_id, "endpoint": endpoint, "removed": removed}
+
+
+@router.get("/merchant-tokens")
+async def get_merchant_token_cache_stats():
+    """Hits / misses of this worker's merchant token cache"""
+    return {"success": True, "merchant_tokens": token_cache.stats()}
+
+
+@router.post("/merchant-tokens/invalidate")
+async def invalidate_merchant_token_cache(
+    merchant_id: Optional[str] = Query(None, description="Clover merchant ID to forget (default: all)"),
+):
+    """Drop cached merchant tokens, e.g. after editing merchant_tokens by hand"""
+    token_cache.invalidate(merchant_id)
+    return {"success": True, "merchant_id": merchant_id}
+
+
+@router.get("/token-refresh")
+async def get_token_refresh_stats(token_refresher: TokenRefresher = Depends(get_token_refresher)):
+    """Scheduled and on-demand OAuth token refreshes, per merchant"""
+    return {"success": True, "token_refresh": token_refresher.stats()}
+
+
+@router.post("/token-refresh")
+async def refresh_merchant_token(
+    merchant_id: str = Query(..., description="Clover merchant ID whose token to refresh now"),
+    token_refresher: TokenRefresher = Depends(get_token_refresher),
+):
+    """Refresh a merchant's access token now (also joins a refresh already running)"""
+    try:
+        await token_refresher.refresh(merchant_id, force=True)
+    except TokenRefreshError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"success": True, "merchant_id": merchant_id, "status": token_refresher.status.get(merchant_id)}
+
+
+@router.get("/scheduler-leader")
+async def get_scheduler_leader_stats(leader: LeaderElection = Depends(get_scheduler_leader)):
+    """Whether this worker runs the leader-only schedulers (warm-up, token refresh, cart totals, mirror sync)"""
+    return {"success": True, "scheduler_leader": leader.stats()}
+
+
+@router.get("/cart-totals")
+async def get_cart_totals_stats(verifier: CartTotalsVerifier = Depends(get_cart_totals_verifier)):
+    """Cart totals drift found by the periodic check, and its last report"""
+    return {"success": True, "cart_totals": verifier.stats()}
+
+
+@router.post("/cart-totals/verify")
+async def verify_cart_totals(
+    repair: bool = Query(False, description="Reset drifted carts' totals from their items"),
+    verifier: CartTotalsVerifier = Depends(get_cart_totals_verifier),
+):
+    """Check every active cart's totals now"""
+    return {"success": True, "report": await verifier.verify(repair=repair)}
+
+
+@router.get("/catalog-sync")
+async def get_catalog_sync_status(
+    merchant_id: Optional[str] = Query(None, description="Optional Clover merchant ID to filter"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Watermark and last full / incremental sync per merchant and catalog entity"""
+    states = await AsyncCatalogHelper.list_sync_states(db, merchant_id)
+    merchants = {}
+    for state in states:
+        merchants.setdefault(state.merchant_id, {})[state.entity] = {
+            "watermark": state.watermark,
+            "last_full_sync_at": state.last_full_sync_at.isoformat() if state.last_full_sync_at else None,
+            "last_synced_at": state.last_synced_at.isoformat() if state.last_synced_at else None,
+            "object_count": state.object_count,
+        }
+    return {"success": True, "merchants": merchants}
+
+
+@router.post("/catalog-sync")
+async def run_catalog_sync(
+    merchant_id: str = Query(..., description="Clover merchant ID"),
+    full: bool = Query(False, description="Reload everything instead of only what changed"),
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client),
+):
+    """Sync a merchant's catalog mirror now"""
+    access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
+    if not access_token:
+        raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
+
+    # The mirror writes go through a sync session, run off the event loop (see sync_entity)
+    sync_db = SessionLocal()
+    try:
+        result = await sync_merchant_catalog(
+            clover, sync_db, merchant_id, access_token,
+            full=full,
+            full_sync_hours=Settings().CLOVER_CATALOG_FULL_SYNC_HOURS,
+        )
+    finally:
+        await asyncio.to_thread(sync_db.close)
+    return {"success": True, "merchant_id": merchant_id, "entities": result}
+
+
+@router.get("/catalog-index")
+async def get_catalog_index_stats(catalog_index: CatalogIndex = Depends(get_catalog_index)):
+    """Which merchants have an in-memory category/item index, its size and age"""
+    return {"success": True, "catalog_index": catalog_index.stats()}
+
+
+@router.get("/availability")
+async def get_availability_stats(item_availability: ItemAvailability = Depends(get_item_availability)):
+    """Which merchants have stock levels in memory, how many items are sold out, and poll counters"""
+    return {"success": True, "availability": item_availability.stats()}
+
+
+@router.get("/webhooks")
+async def get_webhook_stats(processor: WebhookProcessor = Depends(get_webhook_processor)):
+    """Webhook counters: requests, events, cache entries invalidated, re-fetch runs and errors"""
+    return {"success": True, "webhooks": processor.stats()}
+
+
+@router.get("/warmup")
+async def get_warmup_status(warmer: CatalogWarmer = Depends(get_catalog_warmer)):
+    """Warm-up scheduler settings and each merchant's last refresh (state, timing, errors)"""
+    return {"success": True, "warmup": warmer.stats()}
+
+
+@router.post("/warmup")
+async def run_warmup(
+    merchant_id: str = Query(..., description="Clover merchant ID"),
+    db: AsyncSession = Depends(get_async_db),
+    warmer: CatalogWarmer = Depends(get_catalog_warmer),
+):
+    """Warm one merchant's in-memory catalog now"""
+    access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
+    if not access_token:
+        raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
+
+    return {"success": True, "merchant_id": merchant_id, "status": await warmer.warm_merchant(merchant_id, access_token)}
@@ -1,20 +1,17 @@
 # app/routes/clover_cart.py
 from fastapi import APIRouter, HTTPException, Query, Depends, Body
-from sqlalchemy.orm import Session
-from database.database import get_db
-from helpers.cart_helper import CartHelper
-from helpers.merchant_helper import MerchantHelper
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.database import get_async_db
+from helpers.cart_helper import AsyncCartHelper
+from helpers.merchant_helper import AsyncMerchantHelper
 from models.cart import Cart
 from pydantic import BaseModel
+from services.clover_client import CloverClient, get_clover_client
 from typing import Optional, List, Dict, Any
-import httpx
-import os
 from datetime import datetime
 
 router = APIRouter(prefix="/clover-cart", tags=["Clover Cart Integration"])
 
-CLOVER_BASE_URL = os.getenv("CLOVER_BASE_URL", "https://apisandbox.dev.clover.com")
-
 
 class SyncCartRequest(BaseModel):
     cart_id: int
@@ -25,17 +22,11 @@ class CreateCloverOrderRequest(BaseModel):
     order_type: Optional[str] = "first_party_delivery"  # or "pickup", "delivery", etc.
 
 
-def _build_headers(access_token: str):
-    return {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-    }
-
-
 @router.post("/sync-to-clover")
 async def sync_cart_to_clover_order(
     request: SyncCartRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client)
 ):
     """
     Step 1: Create empty Clover order from cart
@@ -43,7 +34,7 @@ async def sync_cart_to_clover_order(
     """
     try:
         # Get cart details
-        cart = CartHelper.get_cart_by_id(db, request.cart_id)
+        cart = await AsyncCartHelper.get_cart_by_id(db, request.cart_id)
         if not cart:
             raise HTTPException(status_code=404, detail="Cart not found")
 
@@ -51,7 +42,7 @@ async def sync_cart_to_clover_order(
             raise HTTPException(status_code=400, detail="Can only sync active carts")
 
         # Get merchant token
-        access_token = MerchantHelper.get_merchant_token(db, cart.clover_merchant_id)
+        access_token = await AsyncMerchantHelper.get_merchant_token(db, cart.clover_merchant_id)
         if not access_token:
             raise HTTPException(status_code=404, detail="Merchant token not found")
 
@@ -64,29 +55,24 @@ async def sync_cart_to_clover_order(
             "note": f"Order created from cart {cart.id}"
         }
 
-        url = f"{CLOVER_BASE_URL}/v3/merchants/{cart.clover_merchant_id}/orders"
+        url = f"/v3/merchants/{cart.clover_merchant_id}/orders"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                headers=_build_headers(access_token),
-                json=clover_order_data
-            )
+        response = await clover.post(url, access_token, json=clover_order_data)
 
-            if response.status_code >= 400:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Clover API error: {response.text}"
-                )
+        if response.status_code >= 400:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Clover API error: {response.text}"
+            )
 
-            clover_order = response.json()
-            clover_order_id = clover_order.get("id")
+        clover_order = response.json()
+        clover_order_id = clover_order.get("id")
 
         # Update cart with Clover order ID
         cart.clover_order_id = clover_order_id
         cart.status = "synced"
         cart.synced_at = datetime.now()
-        db.commit()
+        await db.commit()
 
         return {
             "success": True,
@@ -97,14 +83,15 @@ async def sync_cart_to_clover_order(
         }
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to sync cart: {str(e)}")
 
 
 @router.post("/sync-items")
 async def sync_cart_items_to_clover(
     request: SyncCartRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client)
 ):
     """
     Step 2: Add line items to Clover order
@@ -112,7 +99,7 @@ async def sync_cart_items_to_clover(
     """
     try:
         # Get cart with items
-        cart = CartHelper.get_cart_by_id(db, request.cart_id)
+        cart = await AsyncCartHelper.get_cart_by_id(db, request.cart_id)
         if not cart:
             raise HTTPException(status_code=404, detail="Cart not found")
 
@@ -120,7 +107,7 @@ async def sync_cart_items_to_clover(
             raise HTTPException(status_code=400, detail="Cart not synced to Clover. Run sync-to-clover first.")
 
         # Get merchant token
-        access_token = MerchantHelper.get_merchant_token(db, cart.clover_merchant_id)
+        access_token = await AsyncMerchantHelper.get_merchant_token(db, cart.clover_merchant_id)
         if not access_token:
             raise HTTPException(status_code=404, detail="Merchant token not found")
 
@@ -136,35 +123,30 @@ async def sync_cart_items_to_clover(
                 "note": cart_item.notes or ""
             }
 
-            url = f"{CLOVER_BASE_URL}/v3/merchants/{cart.clover_merchant_id}/orders/{cart.clover_order_id}/line_items"
+            url = f"/v3/merchants/{cart.clover_merchant_id}/orders/{cart.clover_order_id}/line_items"
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url,
-                    headers=_build_headers(access_token),
-                    json=line_item_data
-                )
+            response = await clover.post(url, access_token, json=line_item_data)
 
-                if response.status_code >= 400:
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Failed to add line item: {response.text}"
-                    )
+            if response.status_code >= 400:
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Failed to add line item: {response.text}"
+                )
 
-                clover_line_item = response.json()
-                clover_line_item_id = clover_line_item.get("id")
+            clover_line_item = response.json()
+            clover_line_item_id = clover_line_item.get("id")
 
-                # Update cart item with Clover line item ID
-                cart_item.clover_line_item_id = clover_line_item_id
+            # Update cart item with Clover line item ID
+            cart_item.clover_line_item_id = clover_line_item_id
 
-                synced_items.append({
-                    "cart_item_id": cart_item.id,
-                    "clover_line_item_id": clover_line_item_id,
-                    "name": cart_item.name,
-                    "quantity": cart_item.quantity
-                })
+            synced_items.append({
+                "cart_item_id": cart_item.id,
+                "clover_line_item_id": clover_line_item_id,
+                "name": cart_item.name,
+                "quantity": cart_item.quantity
+            })
 
-        db.commit()
+        await db.commit()
 
         return {
             "success": True,
@@ -175,14 +157,15 @@ async def sync_cart_items_to_clover(
         }
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to sync items: {str(e)}")
 
 
 @router.post("/add-modifiers")
 async def sync_cart_modifiers_to_clover(
     request: SyncCartRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client)
 ):
     """
     Step 3: Add modifiers to line items in Clover order
@@ -190,7 +173,7 @@ async def sync_cart_modifiers_to_clover(
     """
     try:
         # Get cart with items and modifiers
-        cart = CartHelper.get_cart_by_id(db, request.cart_id)
+        cart = await AsyncCartHelper.get_cart_by_id(db, request.cart_id)
         if not cart:
             raise HTTPException(status_code=404, detail="Cart not found")
 
@@ -198,7 +181,7 @@ async def sync_cart_modifiers_to_clover(
             raise HTTPException(status_code=400, detail="Cart not synced to Clover")
 
         # Get merchant token
-        access_token = MerchantHelper.get_merchant_token(db, cart.clover_merchant_id)
+        access_token = await AsyncMerchantHelper.get_merchant_token(db, cart.clover_merchant_id)
         if not access_token:
             raise HTTPException(status_code=404, detail="Merchant token not found")
 
@@ -214,36 +197,31 @@ async def sync_cart_modifiers_to_clover(
                     "modifier": {
                         "id": modifier.clover_modifier_id
                     },
-                    "amount": int(modifier.price * 100)  # Convert to cents
+                    "amount": modifier.price_cents
                 }
 
                 url = (
-                    f"{CLOVER_BASE_URL}/v3/merchants/{cart.clover_merchant_id}/orders/"
+                    f"/v3/merchants/{cart.clover_merchant_id}/orders/"
                     f"{cart.clover_order_id}/line_items/{cart_item.clover_line_item_id}/modifications"
                 )
 
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        url,
-                        headers=_build_headers(access_token),
-                        json=modification_data
-                    )
+                response = await clover.post(url, access_token, json=modification_data)
 
-                    if response.status_code >= 400:
-                        raise HTTPException(
-                            status_code=response.status_code,
-                            detail=f"Failed to add modifier: {response.text}"
-                        )
+                if response.status_code >= 400:
+                    raise HTTPException(
+                        status_code=response.status_code,
+                        detail=f"Failed to add modifier: {response.text}"
+                    )
 
-                    clover_modification = response.json()
+                clover_modification = response.json()
 
-                    synced_modifiers.append({
-                        "cart_item_id": cart_item.id,
-                        "modifier_id": modifier.id,
-                        "clover_modification_id": clover_modification.get("id"),
-                        "name": modifier.name,
-                        "price": modifier.price
-                    })
+                synced_modifiers.append({
+                    "cart_item_id": cart_item.id,
+                    "modifier_id": modifier.id,
+                    "clover_modification_id": clover_modification.get("id"),
+                    "name": modifier.name,
+                    "price": modifier.price
+                })
 
         return {
             "success": True,
@@ -260,7 +238,8 @@ async def sync_cart_modifiers_to_clover(
 @router.get("/order-status/{cart_id}")
 async def get_clover_order_status(
     cart_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client)
 ):
     """
     Step 4: Get current order status from Clover
@@ -268,7 +247,7 @@ async def get_clover_order_status(
     """
     try:
         # Get cart
-        cart = CartHelper.get_cart_by_id(db, cart_id)
+        cart = await AsyncCartHelper.get_cart_by_id(db, cart_id)
         if not cart:
             raise HTTPException(status_code=404, detail="Cart not found")
 
@@ -276,22 +255,21 @@ async def get_clover_order_status(
             raise HTTPException(status_code=400, detail="Cart not synced to Clover")
 
         # Get merchant token
-        access_token = MerchantHelper.get_merchant_token(db, cart.clover_merchant_id)
+        access_token = await AsyncMerchantHelper.get_merchant_token(db, cart.clover_merchant_id)
         if not access_token:
             raise HTTPException(status_code=404, detail="Merchant token not found")
 
-        url = f"{CLOVER_BASE_URL}/v3/merchants/{cart.clover_merchant_id}/orders/{cart.clover_order_id}"
+        url = f"/v3/merchants/{cart.clover_merchant_id}/orders/{cart.clover_order_id}"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=_build_headers(access_token))
+        response = await clover.get(url, access_token)
 
-            if response.status_code >= 400:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Clover API error: {response.text}"
-                )
+        if response.status_code >= 400:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Clover API error: {response.text}"
+            )
 
-            clover_order = response.json()
+        clover_order = response.json()
 
         return {
             "success": True,
@@ -307,25 +285,26 @@ async def get_clover_order_status(
 @router.post("/complete-order")
 async def complete_order_flow(
     request: SyncCartRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client)
 ):
     """
     Complete workflow: Create order + Add items + Add modifiers
     """
     try:
         # Step 1: Sync cart to Clover order
-        await sync_cart_to_clover_order(request, db)
+        await sync_cart_to_clover_order(request, db, clover)
 
         # Step 2: Sync items
-        await sync_cart_items_to_clover(request, db)
+        await sync_cart_items_to_clover(request, db, clover)
 
         # Step 3: Sync modifiers
-        await sync_cart_modifiers_to_clover(request, db)
+        await sync_cart_modifiers_to_clover(request, db, clover)
 
         # Get final cart status
-        cart = CartHelper.get_cart_by_id(db, request.cart_id)
+        cart = await AsyncCartHelper.get_cart_by_id(db, request.cart_id)
         cart.status = "completed"
-        db.commit()
+        await db.commit()
 
         return {
             "success": True,
@@ -336,5 +315,5 @@ async def complete_order_flow(
         }
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to complete order: {str(e)}")
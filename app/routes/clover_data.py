@@ -1,110 +1,219 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
-from sqlalchemy.orm import Session
-import os
-import httpx
-from database.database import get_db
-from helpers.merchant_helper import MerchantHelper
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.database import get_async_db
+from helpers.merchant_helper import AsyncMerchantHelper
+from helpers.catalog_helper import AsyncCatalogHelper
+from services.clover_client import CloverClient, get_clover_client
+from services.clover_api import stream_all_pages, proxy_response, get_item_full
+from services.circuit_breaker import is_stale
+from services.http_cache import clover_json_response, etag_json_response
+from services.catalog_index import CatalogIndex, get_catalog_index
+from services.item_availability import ItemAvailability, get_item_availability
+from utils.json_response import MsgspecJSONResponse
 from typing import Optional,Dict, Any
 from models.merchant_detail import MerchantDetail
 
 router = APIRouter(prefix="/clover/catalog", tags=["Clover Catalog"])
 
-CLOVER_BASE_URL = os.getenv("CLOVER_BASE_URL", "https://apisandbox.dev.clover.com")
 
-
-def _build_headers(access_token: str):
-    return {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-    }
+def _mirror_response(request: Request, payload: Dict[str, Any]):
+    """Clover-shaped body served from the local catalog mirror"""
+    return etag_json_response(request, payload, headers={"X-Catalog-Source": "mirror"})
 
 
 @router.get("/items")
 async def list_items(
+    request: Request,
     merchant_id: str = Query(..., description="Clover merchant ID"),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
     expand: str = Query("", description="Optional expand params, e.g. categories,modifierGroups"),
-    db: Session = Depends(get_db),
+    all_pages: bool = Query(False, alias="all", description="Stream every page, using limit as the page size"),
+    mirror: bool = Query(False, description="Serve from the local catalog mirror once it has synced"),
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client),
 ):
-    access_token = MerchantHelper.get_merchant_token(db, merchant_id)
+    access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
     if not access_token:
         raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
 
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{merchant_id}/items"
+    if mirror and await AsyncCatalogHelper.is_synced(db, merchant_id, "items"):
+        page = await AsyncCatalogHelper.list_items(db, merchant_id, None if all_pages else limit, offset, expand)
+        return _mirror_response(request, page)
+
+    url = f"/v3/merchants/{merchant_id}/items"
     params = {"limit": limit, "offset": offset}
     if expand:
         params["expand"] = expand
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=_build_headers(access_token), params=params)
-        if r.status_code >= 400:
-            raise HTTPException(status_code=r.status_code, detail=r.text)
-        return r.json()
+    if all_pages:
+        return await stream_all_pages(clover, url, access_token, params=params, page_size=limit, offset=offset)
+
+    # Relay Clover's bytes untouched instead of parsing and re-serializing them
+    return await proxy_response(
+        clover, url, access_token,
+        params=params,
+        accept_encoding=request.headers.get("accept-encoding"),
+        if_none_match=request.headers.get("if-none-match"),
+    )
+
+
+@router.get("/items/{item_id}/full")
+async def get_item_with_modifiers(
+    request: Request,
+    item_id: str,
+    merchant_id: str = Query(..., description="Clover merchant ID"),
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client),
+):
+    """
+    An item with categories, stock and every modifier group's modifiers resolved, in one call.
+    The underlying Clover GETs go through the client's per-merchant HTTP cache, so repeat calls don't hit Clover.
+    """
+    access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
+    if not access_token:
+        raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
+
+    item = await get_item_full(clover, merchant_id, access_token, item_id)
+    return etag_json_response(request, item)
+
+
+@router.get("/search")
+async def search_catalog(
+    merchant_id: str = Query(..., description="Clover merchant ID"),
+    q: str = Query(..., min_length=1, max_length=100, description="Search text, matched against item names, SKUs and category names"),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client),
+    catalog_index: CatalogIndex = Depends(get_catalog_index),
+):
+    """Typeahead over the merchant's catalog, answered from the in-memory index (top matches only)"""
+    access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
+    if not access_token:
+        raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
+
+    index = await catalog_index.get(clover, merchant_id, access_token)
+    results = index.search(q, limit)
+    return MsgspecJSONResponse({"query": q, "count": len(results), "results": results})
+
+
+@router.get("/availability")
+async def get_availability(
+    merchant_id: str = Query(..., description="Clover merchant ID"),
+    item_ids: Optional[str] = Query(None, description="Comma-separated Clover item IDs; omit to get just the sold-out list"),
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client),
+    item_availability: ItemAvailability = Depends(get_item_availability),
+):
+    """Stock status in one call, from memory: every sold-out item ID, plus per-item counts when asked for"""
+    access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
+    if not access_token:
+        raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
+
+    availability = await item_availability.get(clover, merchant_id, access_token)
+    body: Dict[str, Any] = {"merchant_id": merchant_id, "sold_out": availability.sold_out()}
+    if item_ids:
+        body["items"] = {
+            item_id: {
+                "available": availability.is_available(item_id),
+                "stock_count": availability.stock_count(item_id),  # None: stock not tracked
+            }
+            for item_id in filter(None, (part.strip() for part in item_ids.split(",")))
+        }
+    return MsgspecJSONResponse(body)
 
 
 @router.get("/categories")
 async def list_categories(
+    request: Request,
     merchant_id: str = Query(..., description="Clover merchant ID"),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    all_pages: bool = Query(False, alias="all", description="Stream every page, using limit as the page size"),
+    mirror: bool = Query(False, description="Serve from the local catalog mirror once it has synced"),
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client),
 ):
-    access_token = MerchantHelper.get_merchant_token(db, merchant_id)
+    access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
     if not access_token:
         raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
 
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{merchant_id}/categories"
+    if mirror and await AsyncCatalogHelper.is_synced(db, merchant_id, "categories"):
+        page = await AsyncCatalogHelper.list_categories(db, merchant_id, None if all_pages else limit, offset)
+        return _mirror_response(request, page)
+
+    url = f"/v3/merchants/{merchant_id}/categories"
     params = {"limit": limit, "offset": offset}
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=_build_headers(access_token), params=params)
-        if r.status_code >= 400:
-            raise HTTPException(status_code=r.status_code, detail=r.text)
-        return r.json()
+    if all_pages:
+        return await stream_all_pages(clover, url, access_token, params=params, page_size=limit, offset=offset)
+
+    # Relay Clover's bytes untouched instead of parsing and re-serializing them
+    return await proxy_response(
+        clover, url, access_token,
+        params=params,
+        accept_encoding=request.headers.get("accept-encoding"),
+        if_none_match=request.headers.get("if-none-match"),
+    )
 
 
 @router.get("/modifier-groups")
 async def list_modifier_groups(
+    request: Request,
     merchant_id: str = Query(..., description="Clover merchant ID"),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    all_pages: bool = Query(False, alias="all", description="Stream every page, using limit as the page size"),
+    mirror: bool = Query(False, description="Serve from the local catalog mirror once it has synced"),
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client),
 ):
-    access_token = MerchantHelper.get_merchant_token(db, merchant_id)
+    access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
     if not access_token:
         raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
 
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{merchant_id}/modifier_groups"
+    if mirror and await AsyncCatalogHelper.is_synced(db, merchant_id, "modifier_groups"):
+        page = await AsyncCatalogHelper.list_modifier_groups(db, merchant_id, None if all_pages else limit, offset)
+        return _mirror_response(request, page)
+
+    url = f"/v3/merchants/{merchant_id}/modifier_groups"
     params = {"limit": limit, "offset": offset}
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=_build_headers(access_token), params=params)
-        if r.status_code >= 400:
-            raise HTTPException(status_code=r.status_code, detail=r.text)
-        return r.json()
+    if all_pages:
+        return await stream_all_pages(clover, url, access_token, params=params, page_size=limit, offset=offset)
+
+    r = await clover.get(url, access_token, params=params)
+    if r.status_code >= 400:
+        raise HTTPException(status_code=r.status_code, detail=r.text)
+    return clover_json_response(request, r)
 
 
 
 
 @router.get("/modifier-groups/{modifier_group_id}")
 async def get_modifier_group(
+    request: Request,
     modifier_group_id: str,
     merchant_id: str = Query(..., description="Clover merchant ID"),
-    db: Session = Depends(get_db),
+    mirror: bool = Query(False, description="Serve from the local catalog mirror once it has synced"),
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client),
 ):
     """Get a specific modifier group for a merchant."""
-    access_token = MerchantHelper.get_merchant_token(db, merchant_id)
+    access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
     if not access_token:
         raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
 
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{merchant_id}/modifier_groups/{modifier_group_id}/modifiers"
+    if mirror and await AsyncCatalogHelper.is_synced(db, merchant_id, "modifier_groups"):
+        return _mirror_response(request, await AsyncCatalogHelper.list_modifiers(db, merchant_id, modifier_group_id))
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=_build_headers(access_token))
-        if r.status_code >= 400:
-            raise HTTPException(status_code=r.status_code, detail=r.text)
-        return r.json()
+    url = f"/v3/merchants/{merchant_id}/modifier_groups/{modifier_group_id}/modifiers"
+
+    r = await clover.get(url, access_token)
+    if r.status_code >= 400:
+        raise HTTPException(status_code=r.status_code, detail=r.text)
+    return clover_json_response(request, r)
 
 
 # Merchant-focused endpoints
@@ -113,52 +222,60 @@ merchant_router = APIRouter(prefix="/clover/merchant", tags=["Clover Merchant"])
 
 @router.get("/modifier-groups/{modifier_group_id}/modifiers/{modifier_id}")
 async def get_modifier(
+    request: Request,
     modifier_group_id: str,
     modifier_id: str,
     merchant_id: str = Query(..., description="Clover merchant ID"),
-    db: Session = Depends(get_db),
+    mirror: bool = Query(False, description="Serve from the local catalog mirror once it has synced"),
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client),
 ):
     """Get a specific modifier within a modifier group for a merchant."""
-    access_token = MerchantHelper.get_merchant_token(db, merchant_id)
+    access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
     if not access_token:
         raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
 
+    if mirror and await AsyncCatalogHelper.is_synced(db, merchant_id, "modifier_groups"):
+        modifier = await AsyncCatalogHelper.get_modifier(db, merchant_id, modifier_group_id, modifier_id)
+        if not modifier:
+            raise HTTPException(status_code=404, detail="Modifier not found in catalog mirror")
+        return _mirror_response(request, modifier)
+
     url = (
-        f"{CLOVER_BASE_URL}/v3/merchants/{merchant_id}/modifier_groups/"
+        f"/v3/merchants/{merchant_id}/modifier_groups/"
         f"{modifier_group_id}/modifiers/{modifier_id}"
     )
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=_build_headers(access_token))
-        if r.status_code >= 400:
-            raise HTTPException(status_code=r.status_code, detail=r.text)
-        return r.json()
+    r = await clover.get(url, access_token)
+    if r.status_code >= 400:
+        raise HTTPException(status_code=r.status_code, detail=r.text)
+    return clover_json_response(request, r)
 
 
 @merchant_router.get("/details")
 async def get_and_store_merchant_details(
     merchant_id: str = Query(..., description="Clover merchant ID"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client),
 ):
     """Get and store merchant details from Clover API"""
     try:
-        access_token = MerchantHelper.get_merchant_token(db, merchant_id)
+        access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
         if not access_token:
             raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
 
-        url = f"{CLOVER_BASE_URL}/v3/merchants/{merchant_id}/address"
+        url = f"/v3/merchants/{merchant_id}/address"
 
-        async with httpx.AsyncClient() as client:
-            r = await client.get(url, headers=_build_headers(access_token))
-            if r.status_code >= 400:
-                raise HTTPException(status_code=r.status_code, detail=r.text)
-            merchant_data = r.json()
+        r = await clover.get(url, access_token)
+        if r.status_code >= 400:
+            raise HTTPException(status_code=r.status_code, detail=r.text)
+        merchant_data = r.json()
 
 
         # Check if merchant detail already exists
-        existing_merchant = db.query(MerchantDetail).filter(
-            MerchantDetail.clover_merchant_id == merchant_id
-        ).first()
+        existing_merchant = (await db.execute(
+            select(MerchantDetail).where(MerchantDetail.clover_merchant_id == merchant_id).limit(1)
+        )).scalars().first()
 
         print("Raw merchant data:", merchant_data.get("address1"))  # Debug print
         if existing_merchant:
@@ -173,8 +290,8 @@ async def get_and_store_merchant_details(
             existing_merchant.currency = str(merchant_data.get("currency", "")) if merchant_data.get("currency") else None
             existing_merchant.timezone = str(merchant_data.get("timezone", "")) if merchant_data.get("timezone") else None
 
-            db.commit()
-            db.refresh(existing_merchant)
+            await db.commit()
+            await db.refresh(existing_merchant)
 
             return {
                 "success": True,
@@ -208,8 +325,8 @@ async def get_and_store_merchant_details(
             )
 
             db.add(new_merchant)
-            db.commit()
-            db.refresh(new_merchant)
+            await db.commit()
+            await db.refresh(new_merchant)
 
             return {
                 "success": True,
@@ -229,21 +346,21 @@ async def get_and_store_merchant_details(
             }
 
     except Exception as e:
-        db.rollback()  # Rollback in case of error
+        await db.rollback()  # Rollback in case of error
         print(f"Error storing merchant details: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to store merchant details: {str(e)}")
 
 # @merchant_router.get("/details")
 # async def get_and_store_merchant_details(
 #     merchant_id: str = Query(..., description="Clover merchant ID"),
-#     db: Session = Depends(get_db),
+#     db: AsyncSession = Depends(get_async_db),
 # ):
 #     # print("merchant_id",merchant_id)
-#     access_token = MerchantHelper.get_merchant_token(db, merchant_id)
+#     access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
 #     if not access_token:
 #         raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
 
-#     url = f"{CLOVER_BASE_URL}/v3/merchants/{merchant_id}"
+#     url = f"/v3/merchants/{merchant_id}"
 #     async with httpx.AsyncClient() as client:
 #         r = await client.get(url, headers=_build_headers(access_token))
 #         if r.status_code >= 400:
@@ -279,21 +396,22 @@ async def get_and_store_merchant_details(
 
 @merchant_router.get("/address")
 async def get_merchant_address(
+    request: Request,
     merchant_id: str = Query(..., description="Clover merchant ID"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client),
 ):
     """Get merchant address details specifically"""
-    access_token = MerchantHelper.get_merchant_token(db, merchant_id)
+    access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
     if not access_token:
         raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
 
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{merchant_id}/address"
+    url = f"/v3/merchants/{merchant_id}/address"
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=_build_headers(access_token))
-        if r.status_code >= 400:
-            raise HTTPException(status_code=r.status_code, detail=r.text)
-        merchant_data = r.json()
+    r = await clover.get(url, access_token)
+    if r.status_code >= 400:
+        raise HTTPException(status_code=r.status_code, detail=r.text)
+    merchant_data = r.json()
     print(merchant_data)
     # Extract only address-related fields
     address_data = {
@@ -309,45 +427,60 @@ async def get_merchant_address(
         "timezone": merchant_data.get("timezone")
     }
 
-    return {"success": True, "address_details": address_data}
+    # Served from the last good response while Clover is unavailable
+    return etag_json_response(request, {"success": True, "stale": is_stale(r), "address_details": address_data})
 
 
 @merchant_router.get("/properties")
 async def get_merchant_properties(
+    request: Request,
     merchant_id: str = Query(..., description="Clover merchant ID"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client),
 ):
-    access_token = MerchantHelper.get_merchant_token(db, merchant_id)
+    access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
     if not access_token:
         raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
 
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{merchant_id}/properties"
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=_build_headers(access_token))
-        if r.status_code >= 400:
-            raise HTTPException(status_code=r.status_code, detail=r.text)
-        return r.json()
+    url = f"/v3/merchants/{merchant_id}/properties"
+    r = await clover.get(url, access_token)
+    if r.status_code >= 400:
+        raise HTTPException(status_code=r.status_code, detail=r.text)
+    return clover_json_response(request, r)
 
 
 @router.get("/item-stocks")
 async def get_item_stocks(
+    request: Request,
     merchant_id: str = Query(..., description="Clover merchant ID"),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
     item_id: str | None = Query(None, description="Optional Clover item ID to filter"),
-    db: Session = Depends(get_db),
+    all_pages: bool = Query(False, alias="all", description="Stream every page, using limit as the page size"),
+    mirror: bool = Query(False, description="Serve from the local catalog mirror once it has synced"),
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client),
 ):
-    access_token = MerchantHelper.get_merchant_token(db, merchant_id)
+    access_token = await AsyncMerchantHelper.get_merchant_token(db, merchant_id)
     if not access_token:
         raise HTTPException(status_code=404, detail="Merchant token not found. Add the merchant first.")
 
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{merchant_id}/item_stocks"
+    if mirror and await AsyncCatalogHelper.is_synced(db, merchant_id, "item_stocks"):
+        page = await AsyncCatalogHelper.list_item_stocks(db, merchant_id, None if all_pages else limit, offset, item_id)
+        return _mirror_response(request, page)
+
+    url = f"/v3/merchants/{merchant_id}/item_stocks"
     params = {"limit": limit, "offset": offset}
     if item_id:
         params["itemId"] = item_id
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=_build_headers(access_token), params=params)
-        if r.status_code >= 400:
-            raise HTTPException(status_code=r.status_code, detail=r.text)
-        return r.json()
+    if all_pages:
+        return await stream_all_pages(clover, url, access_token, params=params, page_size=limit, offset=offset)
+
+    # Relay Clover's bytes untouched instead of parsing and re-serializing them
+    return await proxy_response(
+        clover, url, access_token,
+        params=params,
+        accept_encoding=request.headers.get("accept-encoding"),
+        if_none_match=request.headers.get("if-none-match"),
+    )
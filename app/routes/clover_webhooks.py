@@ -0,0 +1,45 @@
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from app.config.settings import settings
+from services.clover_webhooks import (
+    WebhookProcessor,
+    WebhookVerificationError,
+    get_webhook_processor,
+    parse_events,
+    verify_webhook,
+)
+
+router = APIRouter(prefix="/clover/webhooks", tags=["Clover Webhooks"])
+
+
+@router.post("")
+async def receive_webhook(
+    request: Request,
+    processor: WebhookProcessor = Depends(get_webhook_processor),
+):
+    """Clover change notifications: verify, share with the other workers, invalidate what's cached, queue re-fetches"""
+    body = await request.body()
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Webhook body is not valid JSON")
+
+    # Sent once when the webhook URL is saved in the Clover dashboard, before the app has
+    # an auth code to send (so it can't be verified); it carries nothing to act on
+    if isinstance(payload, dict) and "verificationCode" in payload and not payload.get("merchants"):
+        print(f"Clover webhook verification code: {payload['verificationCode']}")
+        return {"success": True}
+
+    try:
+        verify_webhook(
+            body,
+            request.headers,
+            auth_code=settings.CLOVER_WEBHOOK_AUTH_CODE,
+            signing_secret=settings.CLOVER_WEBHOOK_SIGNING_SECRET,
+        )
+    except WebhookVerificationError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+    return {"success": True, **(await processor.receive(parse_events(payload)))}
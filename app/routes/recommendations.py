@@ -7,6 +7,8 @@ from models.user import User as DBUser
 from models.recommendation import Recommendation as DBRecommendation
 from models.recommendation_schema import RecommendationCreate, RecommendationOut
 from services.clover_api import get_item_details, get_items_by_category
+from services.clover_client import CloverClient, get_clover_client
+from services.catalog_index import CatalogIndex, get_catalog_index
 
 # This is the corrected import statement
 from helpers.merchant_helper import get_current_merchant
@@ -21,7 +23,9 @@ async def create_recommendations_for_user(
     item_id: str,
     user_id: int,
     db: Session = Depends(get_db),
-    merchant: dict = Depends(get_current_merchant)
+    merchant: dict = Depends(get_current_merchant),
+    clover: CloverClient = Depends(get_clover_client),
+    catalog_index: CatalogIndex = Depends(get_catalog_index)
 ):
     """
     Generates and saves recommendations for a user based on a purchased item.
@@ -33,9 +37,11 @@ async def create_recommendations_for_user(
     try:
         # 1. Get details of the purchased item to find its category
         item = await get_item_details(
+            clover,
             merchant_id=merchant["merchant_id"],
             access_token=merchant["access_token"],
-            item_id=item_id
+            item_id=item_id,
+            index=catalog_index
         )
         
         categories = item.get("categories", {}).get("elements", [])
@@ -49,9 +55,11 @@ async def create_recommendations_for_user(
 
         # 2. Get all other items in the same category
         all_items_in_category = await get_items_by_category(
+            clover,
             merchant_id=merchant["merchant_id"],
             access_token=merchant["access_token"],
-            category_name=category_name
+            category_name=category_name,
+            index=catalog_index
         )
 
         # 3. Filter out the original item to create the final recommendation list
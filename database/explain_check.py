@@ -0,0 +1,96 @@
+"""
+EXPLAIN check for the hot queries
+
+Runs EXPLAIN for the query behind each hot helper and exits with status 1
+when MySQL has no index it could use and would scan the whole table (or
+the whole of an index). The statements come from the helpers' own query
+builders, so the check can't drift from what they run. Run it against a
+migrated database:
+
+    python -m database.explain_check
+
+A scan fails the check even when possible_keys lists an index: key=NULL
+means MySQL decided not to use it, and the query scans all the same. On a
+table with only a few rows that can be the optimizer's honest choice, so run
+the check against a database with realistic row counts.
+"""
+
+import sys
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.engine import Connection
+
+from database.database import engine
+from helpers.cart_helper import active_cart_by_session_query, cart_query, item_by_clover_id_query
+from helpers.catalog_helper import categories_query, category_items_query, item_query, items_query
+from helpers.merchant_helper import TOKEN_QUERY, merchant_by_clover_id_query
+from helpers.otp_helper import otp_lookup_query
+from models.cart import Cart, CartItem
+
+# EXPLAIN access types that read every row (ALL) or every index entry (index)
+FULL_SCANS = ("ALL", "index")
+
+
+def selectin_query(relationship: Any) -> Any:
+    """The query selectinload(relationship) runs for the children, built from the mapping itself"""
+    prop = relationship.property
+    (_, remote_column), = prop.local_remote_pairs
+    return select(prop.mapper.class_).where(remote_column.in_([1, 2]))
+
+
+def hot_queries() -> List[Tuple[str, Any, Dict[str, Any]]]:
+    """(label, statement, params) for each query to check: the helpers' own builders, with placeholder values"""
+    return [
+        ("MerchantHelper.get_merchant_token", TOKEN_QUERY, {"clover_id": "EXPLAIN"}),
+        ("MerchantHelper.get_merchant_by_clover_id", merchant_by_clover_id_query("EXPLAIN"), {}),
+        ("AsyncCartHelper.get_active_cart_by_session", active_cart_by_session_query("EXPLAIN"), {}),
+        ("AsyncCartHelper.get_cart_by_id", cart_query(1), {}),
+        ("AsyncCartHelper.get_cart_by_id (items)", selectin_query(Cart.items), {}),
+        ("AsyncCartHelper.get_cart_by_id (modifiers)", selectin_query(CartItem.modifiers), {}),
+        ("AsyncCartHelper.add_item_to_cart (existing item)", item_by_clover_id_query(1, "EXPLAIN"), {}),
+        ("AsyncCatalogHelper.list_items", items_query("EXPLAIN", 100), {}),
+        ("AsyncCatalogHelper.list_category_items", category_items_query("EXPLAIN", "EXPLAIN"), {}),
+        ("AsyncCatalogHelper.get_item", item_query("EXPLAIN", "EXPLAIN"), {}),
+        ("AsyncCatalogHelper.list_categories", categories_query("EXPLAIN", 100), {}),
+        ("auth verify-otp", otp_lookup_query("EXPLAIN", "000000"), {}),
+    ]
+
+
+def explain(conn: Connection, statement: Any, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if hasattr(statement, "compile") and not params:
+        sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+        return [dict(row) for row in conn.execute(text(f"EXPLAIN {sql}")).mappings()]
+    return [dict(row) for row in conn.execute(text(f"EXPLAIN {statement.text}"), params).mappings()]
+
+
+def verdict(rows: List[Dict[str, Any]]) -> str:
+    """FAIL if any plan row scans a whole table or index, whatever possible_keys offered; else ok"""
+    return "FAIL" if any(row.get("type") in FULL_SCANS for row in rows) else "ok"
+
+
+def check() -> int:
+    """Print every plan row; returns the number of queries that would do a full scan"""
+    failures = 0
+    with engine.connect() as conn:
+        for label, statement, params in hot_queries():
+            rows = explain(conn, statement, params)
+            result = verdict(rows)
+            failures += result == "FAIL"
+
+            print(f"{result:4}  {label}")
+            for row in rows:
+                print(
+                    f"        table={row.get('table')} type={row.get('type')} key={row.get('key')} "
+                    f"possible_keys={row.get('possible_keys')} rows={row.get('rows')} extra={row.get('Extra')}"
+                )
+    return failures
+
+
+if __name__ == "__main__":
+    if engine.dialect.name != "mysql":
+        print(f"EXPLAIN check only understands MySQL plans, not {engine.dialect.name}")
+        sys.exit(2)
+    failed = check()
+    print(f"{failed} quer{'y' if failed == 1 else 'ies'} without a usable index" if failed else "All hot queries use an index")
+    sys.exit(1 if failed else 0)
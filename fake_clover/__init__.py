@@ -0,0 +1 @@
+# Local stand-in for the Clover v3 API (see fake_clover/server.py)
@@ -0,0 +1,86 @@
+"""
+Record a fake_clover fixture from a real Clover merchant
+
+Pulls every endpoint the fake server serves (following pagination) and
+writes fake_clover/fixtures/{merchant_id}.json in the fixture format.
+
+    python -m fake_clover.record --merchant-id ABC123 --token $CLOVER_ACCESS_TOKEN
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+async def _get(client: httpx.AsyncClient, path: str, **params) -> Dict[str, Any]:
+    response = await client.get(path, params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+async def _get_all(client: httpx.AsyncClient, path: str, **params) -> List[Dict[str, Any]]:
+    elements: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        page = (await _get(client, path, limit=1000, offset=offset, **params)).get("elements", [])
+        elements.extend(page)
+        if len(page) < 1000:
+            return elements
+        offset += 1000
+
+
+async def record(base_url: str, merchant_id: str, token: str, order_limit: int) -> Dict[str, Any]:
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    prefix = f"/v3/merchants/{merchant_id}"
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=30.0) as client:
+        merchant, address, properties = await asyncio.gather(
+            _get(client, prefix),
+            _get(client, f"{prefix}/address"),
+            _get(client, f"{prefix}/properties"),
+        )
+        items, categories, modifier_groups, item_stocks = await asyncio.gather(
+            _get_all(client, f"{prefix}/items", expand="categories,modifierGroups"),
+            _get_all(client, f"{prefix}/categories"),
+            _get_all(client, f"{prefix}/modifier_groups", expand="modifiers"),
+            _get_all(client, f"{prefix}/item_stocks"),
+        )
+        orders = (await _get(client, f"{prefix}/orders", limit=order_limit, expand="lineItems")).get("elements", [])
+
+    return {
+        "merchant": merchant,
+        "address": address,
+        "properties": properties,
+        "categories": categories,
+        "items": items,
+        "modifier_groups": modifier_groups,
+        "item_stocks": item_stocks,
+        "orders": orders,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record a fake_clover fixture from a real Clover merchant")
+    parser.add_argument("--merchant-id", default=os.getenv("CLOVER_MERCHANT_ID"), required=os.getenv("CLOVER_MERCHANT_ID") is None)
+    parser.add_argument("--token", default=os.getenv("CLOVER_ACCESS_TOKEN"), required=os.getenv("CLOVER_ACCESS_TOKEN") is None)
+    parser.add_argument("--base-url", default=os.getenv("CLOVER_BASE_URL", "https://apisandbox.dev.clover.com"))
+    parser.add_argument("--orders", type=int, default=50, help="How many recent orders to keep")
+    args = parser.parse_args()
+
+    fixture = asyncio.run(record(args.base_url, args.merchant_id, args.token, args.orders))
+
+    path = FIXTURES_DIR / f"{args.merchant_id}.json"
+    with open(path, "w") as f:
+        json.dump(fixture, f, indent=2)
+    print(f"Wrote {path} ({len(fixture['items'])} items, {len(fixture['categories'])} categories)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Replay Clover webhook payloads against the app
+
+Posts each JSON file with the headers Clover would send, signed with the
+same settings the app verifies against (CLOVER_WEBHOOK_AUTH_CODE and/or
+CLOVER_WEBHOOK_SIGNING_SECRET). Sample payloads live in fake_clover/webhooks;
+capture real ones from the app log or Clover's dashboard.
+
+    python -m fake_clover.replay_webhook fake_clover/webhooks/inventory_update.json
+    python -m fake_clover.replay_webhook --merchant-id ABC123 fake_clover/webhooks/*.json
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.config.settings import Settings
+from services.clover_webhooks import AUTH_HEADER, SIGNATURE_HEADER, sign_webhook
+
+
+def _retarget(payload: Dict[str, Any], merchant_id: str) -> Dict[str, Any]:
+    """Point every event at one merchant, so the samples work against any fixture"""
+    if "merchants" not in payload:
+        return payload
+    events = [event for updates in payload["merchants"].values() for event in updates]
+    return {**payload, "merchants": {merchant_id: events}}
+
+
+def build_request(payload: Dict[str, Any], auth_code: Optional[str], signing_secret: Optional[str]):
+    body = json.dumps(payload).encode()
+    headers = {"Content-Type": "application/json"}
+    if auth_code:
+        headers[AUTH_HEADER] = auth_code
+    if signing_secret:
+        timestamp = int(time.time())
+        headers[SIGNATURE_HEADER] = f"t={timestamp},v1={sign_webhook(body, signing_secret, timestamp)}"
+    return body, headers
+
+
+def main() -> None:
+    settings = Settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("payloads", nargs="+", type=Path)
+    parser.add_argument("--url", default="http://localhost:8000/clover/webhooks")
+    parser.add_argument("--merchant-id", help="Rewrite every event to this merchant")
+    parser.add_argument("--auth-code", default=settings.CLOVER_WEBHOOK_AUTH_CODE)
+    parser.add_argument("--signing-secret", default=settings.CLOVER_WEBHOOK_SIGNING_SECRET)
+    args = parser.parse_args()
+
+    with httpx.Client(timeout=10.0) as client:
+        for path in args.payloads:
+            payload = json.loads(path.read_text())
+            if args.merchant_id:
+                payload = _retarget(payload, args.merchant_id)
+            body, headers = build_request(payload, args.auth_code, args.signing_secret)
+            response = client.post(args.url, content=body, headers=headers)
+            print(f"{path.name}: {response.status_code} {response.text}")
+
+
+if __name__ == "__main__":
+    main()
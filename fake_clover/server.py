@@ -0,0 +1,361 @@
+"""
+Local stand-in for the Clover v3 REST API
+
+Serves the endpoints this project calls from JSON fixture files, with
+configurable latency, random errors and 429 throttling, so routes can be
+benchmarked and load-tested without touching the Clover sandbox.
+
+Run it and point the app at it:
+
+    uvicorn fake_clover.server:app --port 9000
+    CLOVER_BASE_URL=http://localhost:9000 uvicorn main:app
+
+Environment variables (all optional):
+    FAKE_CLOVER_FIXTURES        directory of {merchant_id}.json fixtures (default: fake_clover/fixtures)
+    FAKE_CLOVER_LATENCY_MS      base latency added to every request (default: 0)
+    FAKE_CLOVER_JITTER_MS       random extra latency, 0..N ms (default: 0)
+    FAKE_CLOVER_ERROR_RATE      fraction of requests answered with a 500 (default: 0)
+    FAKE_CLOVER_THROTTLE_RATE   fraction of requests answered with a 429 (default: 0)
+    FAKE_CLOVER_RETRY_AFTER     Retry-After seconds sent with a 429 (default: 1)
+    FAKE_CLOVER_SYNTHETIC_ITEMS extra generated items per merchant, for big-menu tests (default: 0)
+
+The same knobs can be changed at runtime with PATCH /_fake/config
+(synthetic_items only applies to fixtures loaded afterwards; POST /_fake/reset
+reloads them). Record fixtures from a real merchant with fake_clover/record.py.
+"""
+
+import asyncio
+import copy
+import json
+import os
+import random
+import re
+import secrets
+import time
+from pathlib import Path as FilePath
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request, Body
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+FIXTURES_DIR = FilePath(os.getenv("FAKE_CLOVER_FIXTURES", FilePath(__file__).parent / "fixtures"))
+
+
+class FakeConfig(BaseModel):
+    latency_ms: float = float(os.getenv("FAKE_CLOVER_LATENCY_MS", "0"))
+    jitter_ms: float = float(os.getenv("FAKE_CLOVER_JITTER_MS", "0"))
+    error_rate: float = float(os.getenv("FAKE_CLOVER_ERROR_RATE", "0"))
+    throttle_rate: float = float(os.getenv("FAKE_CLOVER_THROTTLE_RATE", "0"))
+    retry_after: int = int(os.getenv("FAKE_CLOVER_RETRY_AFTER", "1"))
+    synthetic_items: int = int(os.getenv("FAKE_CLOVER_SYNTHETIC_ITEMS", "0"))
+
+
+class FakeConfigUpdate(BaseModel):
+    latency_ms: Optional[float] = None
+    jitter_ms: Optional[float] = None
+    error_rate: Optional[float] = None
+    throttle_rate: Optional[float] = None
+    retry_after: Optional[int] = None
+    synthetic_items: Optional[int] = None
+
+
+config = FakeConfig()
+stats = {"requests": 0, "errors_injected": 0, "throttled": 0}
+
+# Per-merchant data, loaded lazily from fixtures; orders created through the API live here too
+_merchants: Dict[str, Dict[str, Any]] = {}
+
+app = FastAPI(title="Fake Clover API", version="1.0.0")
+
+
+def _load_fixture(merchant_id: str) -> Dict[str, Any]:
+    path = FIXTURES_DIR / f"{merchant_id}.json"
+    if not path.exists():
+        path = FIXTURES_DIR / "default.json"
+    with open(path) as f:
+        data = json.load(f)
+
+    # Serve the default fixture under whatever merchant ID was asked for
+    data["merchant"]["id"] = merchant_id
+    data.setdefault("orders", [])
+    _add_synthetic_items(data, config.synthetic_items)
+    return data
+
+
+def _add_synthetic_items(data: Dict[str, Any], count: int) -> None:
+    """Pad the menu with generated items so paging and big-menu paths can be exercised"""
+    categories = data.get("categories") or [{"id": "SYNTHCAT", "name": "Synthetic"}]
+    now = int(time.time() * 1000)
+    for n in range(count):
+        category = categories[n % len(categories)]
+        item_id = f"SYNTH{n:06d}"
+        data["items"].append({
+            "id": item_id,
+            "hidden": False,
+            "name": f"Synthetic Item {n}",
+            "price": 100 + (n % 50) * 100,
+            "priceType": "FIXED",
+            "sku": f"SYN-{n:06d}",
+            "modifiedTime": now,
+            "categories": {"elements": [{"id": category["id"], "name": category["name"]}]},
+            "modifierGroups": {"elements": []},
+        })
+        data["item_stocks"].append({"item": {"id": item_id}, "stockCount": 100, "quantity": 100.0, "modifiedTime": now})
+
+
+def _merchant(merchant_id: str) -> Dict[str, Any]:
+    if merchant_id not in _merchants:
+        _merchants[merchant_id] = _load_fixture(merchant_id)
+    return _merchants[merchant_id]
+
+
+def _page(elements: List[Dict[str, Any]], limit: int, offset: int) -> Dict[str, Any]:
+    return {"elements": elements[offset:offset + limit]}
+
+
+def _filter_modified(elements: List[Dict[str, Any]], filter: Optional[str]) -> List[Dict[str, Any]]:
+    """Support Clover's filter=modifiedTime>=N (or >N), which the catalog sync and availability polling use"""
+    if not filter:
+        return elements
+    match = re.fullmatch(r"modifiedTime(>=|>)(\d+)", filter.replace(" ", ""))
+    if not match:
+        raise HTTPException(status_code=400, detail=f"Unsupported filter: {filter}")
+    op, since = match.group(1), int(match.group(2))
+    return [e for e in elements if (e.get("modifiedTime") or 0) > since or (op == ">=" and (e.get("modifiedTime") or 0) == since)]
+
+
+def _expand_item(item: Dict[str, Any], expand: str) -> Dict[str, Any]:
+    """Clover only embeds related objects when they are asked for with ?expand="""
+    expanded = {part.strip() for part in expand.split(",") if part.strip()}
+    item = copy.copy(item)
+    for field in ("categories", "modifierGroups", "tags", "itemStock"):
+        if field not in expanded:
+            item.pop(field, None)
+    return item
+
+
+def _find(elements: List[Dict[str, Any]], object_id: str, kind: str) -> Dict[str, Any]:
+    for element in elements:
+        if element.get("id") == object_id:
+            return element
+    raise HTTPException(status_code=404, detail=f"{kind} {object_id} not found")
+
+
+def _new_id() -> str:
+    return secrets.token_hex(7).upper()[:13]
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    """Latency, error and throttle injection for everything except the /_fake control endpoints"""
+    if request.url.path.startswith("/_fake"):
+        return await call_next(request)
+
+    stats["requests"] += 1
+    delay_ms = config.latency_ms + random.uniform(0, config.jitter_ms)
+    if delay_ms > 0:
+        await asyncio.sleep(delay_ms / 1000)
+
+    if random.random() < config.throttle_rate:
+        stats["throttled"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={"message": "Too Many Requests"},
+            headers={"Retry-After": str(config.retry_after)},
+        )
+    if random.random() < config.error_rate:
+        stats["errors_injected"] += 1
+        return JSONResponse(status_code=500, content={"message": "Injected failure"})
+
+    if request.url.path.startswith("/v3/") and not request.headers.get("authorization", "").startswith("Bearer "):
+        return JSONResponse(status_code=401, content={"message": "401 Unauthorized"})
+
+    return await call_next(request)
+
+
+# ---- control endpoints ----
+
+@app.get("/_fake/config")
+def get_config():
+    return {"config": config.model_dump(), "stats": stats}
+
+
+@app.patch("/_fake/config")
+def update_config(update: FakeConfigUpdate):
+    global config
+    config = config.model_copy(update=update.model_dump(exclude_none=True))
+    return {"config": config.model_dump()}
+
+
+@app.post("/_fake/reset")
+def reset():
+    """Drop in-memory state (created orders, synthetic items) and reload fixtures on next use"""
+    _merchants.clear()
+    for key in stats:
+        stats[key] = 0
+    return {"success": True}
+
+
+# ---- OAuth ----
+
+@app.post("/oauth/token")
+async def oauth_token(request: Request):
+    form = await request.form()
+    if not form.get("code") and not form.get("refresh_token"):
+        raise HTTPException(status_code=400, detail="code or refresh_token is required")
+    now = int(time.time())
+    return {
+        "access_token": f"fake-access-{_new_id()}",
+        "access_token_expiration": now + 3600,
+        "refresh_token": f"fake-refresh-{_new_id()}",
+        "refresh_token_expiration": now + 30 * 24 * 3600,
+    }
+
+
+# ---- merchant ----
+
+@app.get("/v3/merchants/{merchant_id}")
+def get_merchant(merchant_id: str):
+    return _merchant(merchant_id)["merchant"]
+
+
+@app.get("/v3/merchants/{merchant_id}/address")
+def get_address(merchant_id: str):
+    return _merchant(merchant_id)["address"]
+
+
+@app.get("/v3/merchants/{merchant_id}/properties")
+def get_properties(merchant_id: str):
+    return _merchant(merchant_id)["properties"]
+
+
+# ---- inventory ----
+
+@app.get("/v3/merchants/{merchant_id}/items")
+def list_items(merchant_id: str, limit: int = 100, offset: int = 0, expand: str = "", filter: Optional[str] = None):
+    items = [_expand_item(item, expand) for item in _filter_modified(_merchant(merchant_id)["items"], filter)]
+    return _page(items, limit, offset)
+
+
+@app.post("/v3/merchants/{merchant_id}/items")
+def create_item(merchant_id: str, item: Dict[str, Any] = Body(...)):
+    item = {**item, "id": _new_id(), "modifiedTime": int(time.time() * 1000)}
+    _merchant(merchant_id)["items"].append(item)
+    return item
+
+
+@app.get("/v3/merchants/{merchant_id}/items/{item_id}")
+def get_item(merchant_id: str, item_id: str, expand: str = ""):
+    data = _merchant(merchant_id)
+    item = _expand_item(_find(data["items"], item_id, "Item"), expand)
+    if "modifierGroups" in item:
+        # Like Clover, expanded groups come back in full but without their modifiers
+        groups = {g["id"]: g for g in data["modifier_groups"]}
+        item["modifierGroups"] = {"elements": [
+            {k: v for k, v in groups.get(ref["id"], ref).items() if k != "modifiers"}
+            for ref in item["modifierGroups"].get("elements", [])
+        ]}
+    return item
+
+
+@app.get("/v3/merchants/{merchant_id}/categories")
+def list_categories(merchant_id: str, limit: int = 100, offset: int = 0, filter: Optional[str] = None):
+    return _page(_filter_modified(_merchant(merchant_id)["categories"], filter), limit, offset)
+
+
+@app.get("/v3/merchants/{merchant_id}/categories/{category_id}/items")
+def list_category_items(merchant_id: str, category_id: str, limit: int = 100, offset: int = 0):
+    data = _merchant(merchant_id)
+    _find(data["categories"], category_id, "Category")
+    items = [
+        _expand_item(item, "")
+        for item in data["items"]
+        if any(c.get("id") == category_id for c in item.get("categories", {}).get("elements", []))
+    ]
+    return _page(items, limit, offset)
+
+
+@app.get("/v3/merchants/{merchant_id}/modifier_groups")
+def list_modifier_groups(merchant_id: str, limit: int = 100, offset: int = 0):
+    return _page(_merchant(merchant_id)["modifier_groups"], limit, offset)
+
+
+@app.get("/v3/merchants/{merchant_id}/modifier_groups/{group_id}/modifiers")
+def list_modifiers(merchant_id: str, group_id: str, limit: int = 100, offset: int = 0):
+    group = _find(_merchant(merchant_id)["modifier_groups"], group_id, "Modifier group")
+    return _page(group.get("modifiers", {}).get("elements", []), limit, offset)
+
+
+@app.get("/v3/merchants/{merchant_id}/modifier_groups/{group_id}/modifiers/{modifier_id}")
+def get_modifier(merchant_id: str, group_id: str, modifier_id: str):
+    group = _find(_merchant(merchant_id)["modifier_groups"], group_id, "Modifier group")
+    return _find(group.get("modifiers", {}).get("elements", []), modifier_id, "Modifier")
+
+
+@app.get("/v3/merchants/{merchant_id}/item_stocks")
+def list_item_stocks(merchant_id: str, limit: int = 100, offset: int = 0, itemId: Optional[str] = Query(None), filter: Optional[str] = None):
+    stocks = _filter_modified(_merchant(merchant_id)["item_stocks"], filter)
+    if itemId:
+        stocks = [s for s in stocks if s.get("item", {}).get("id") == itemId]
+    return _page(stocks, limit, offset)
+
+
+# ---- orders ----
+
+@app.get("/v3/merchants/{merchant_id}/orders")
+def list_orders(merchant_id: str, limit: int = 100, offset: int = 0):
+    return _page(_merchant(merchant_id)["orders"], limit, offset)
+
+
+@app.post("/v3/merchants/{merchant_id}/orders")
+def create_order(merchant_id: str, order: Dict[str, Any] = Body(default={})):
+    now = int(time.time() * 1000)
+    order = {
+        **order,
+        "id": _new_id(),
+        "state": order.get("state", "open"),
+        "total": 0,
+        "createdTime": now,
+        "modifiedTime": now,
+        "lineItems": {"elements": []},
+    }
+    _merchant(merchant_id)["orders"].append(order)
+    return order
+
+
+@app.get("/v3/merchants/{merchant_id}/orders/{order_id}")
+def get_order(merchant_id: str, order_id: str):
+    return _find(_merchant(merchant_id)["orders"], order_id, "Order")
+
+
+@app.post("/v3/merchants/{merchant_id}/orders/{order_id}/line_items")
+def add_line_item(merchant_id: str, order_id: str, line_item: Dict[str, Any] = Body(...)):
+    data = _merchant(merchant_id)
+    order = _find(data["orders"], order_id, "Order")
+    item_id = line_item.get("item", {}).get("id")
+    item = _find(data["items"], item_id, "Item") if item_id else {}
+
+    created = {
+        **line_item,
+        "id": _new_id(),
+        "name": line_item.get("name") or item.get("name"),
+        "price": line_item.get("price", item.get("price", 0)),
+        "modifications": {"elements": []},
+    }
+    order["lineItems"]["elements"].append(created)
+    order["total"] += created["price"] * max(1, int(line_item.get("unitQty", 1)))
+    order["modifiedTime"] = int(time.time() * 1000)
+    return created
+
+
+@app.post("/v3/merchants/{merchant_id}/orders/{order_id}/line_items/{line_item_id}/modifications")
+def add_modification(merchant_id: str, order_id: str, line_item_id: str, modification: Dict[str, Any] = Body(...)):
+    order = _find(_merchant(merchant_id)["orders"], order_id, "Order")
+    line_item = _find(order["lineItems"]["elements"], line_item_id, "Line item")
+
+    created = {**modification, "id": _new_id()}
+    line_item["modifications"]["elements"].append(created)
+    order["total"] += int(modification.get("amount", 0))
+    order["modifiedTime"] = int(time.time() * 1000)
+    return created
@@ -1,199 +1,240 @@
 # helpers/cart_helper.py
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import case, delete, func, or_, select, text, update
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional, Any, Tuple
 from models.cart import Cart, CartItem, CartItemModifier
+from services.item_availability import ItemUnavailableError, MerchantAvailability
 import httpx
 import os
 
 
-class CartHelper:
-    """Helper class for cart database operations"""
+class CartNotActiveError(ValueError):
+    """Raised when a cart that was converted or abandoned is changed"""
 
-    @staticmethod
-    def create_cart(
-        db: Session,
-        merchant_id: str,
-        # customer_id: str = None,
-        session_id: str = None
-    ) -> Cart:
-        """Create a new empty cart"""
-        cart = Cart(
-            clover_merchant_id=merchant_id,
-            # customer_id=customer_id,
-            session_id=session_id,
-            status="active"
-        )
-        db.add(cart)
-        db.commit()
-        db.refresh(cart)
-        return cart
+    def __init__(self, cart_id: int, status: Optional[str]):
+        self.cart_id = cart_id
+        self.status = status
+        super().__init__(f"Cart {cart_id} is {status}, not active")
 
-    @staticmethod
-    def get_cart_by_id(db: Session, cart_id: int) -> Optional[Cart]:
-        """Get cart by ID with items and modifiers"""
-        return db.query(Cart).filter(Cart.id == cart_id).first()
 
-    @staticmethod
-    def get_active_cart_by_session(db: Session, session_id: str) -> Optional[Cart]:
-        """Get active cart by session ID"""
-        return db.query(Cart).filter(
-            Cart.session_id == session_id,
-            Cart.status == "active"
-        ).first()
+def to_cents(amount: float) -> int:
+    """Dollars (as the API takes them) to integer cents, rounding half up"""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
 
-    @staticmethod
-    def add_item_to_cart(
-        db: Session,
-        cart_id: int,
-        clover_item_id: str,
-        name: str,
-        price: float,
-        quantity: int = 1,
-        notes: str = None
-    ) -> CartItem:
-        """Add an item to cart"""
-        # Check if item already exists in cart
-        existing_item = db.query(CartItem).filter(
-            CartItem.cart_id == cart_id,
-            CartItem.clover_item_id == clover_item_id
-        ).first()
-
-        if existing_item:
-            # Update quantity and totals
-            existing_item.quantity += quantity
-            existing_item.line_total = existing_item.price * existing_item.quantity
-            existing_item.updated_at = datetime.now()
-            db.commit()
-            db.refresh(existing_item)
-            CartHelper._update_cart_totals(db, cart_id)
-            return existing_item
-        else:
-            # Create new item
-            cart_item = CartItem(
-                cart_id=cart_id,
-                clover_item_id=clover_item_id,
-                name=name,
-                price=price,
-                quantity=quantity,
-                line_total=price * quantity,
-                notes=notes
-            )
-            db.add(cart_item)
-            db.commit()
-            db.refresh(cart_item)
-            CartHelper._update_cart_totals(db, cart_id)
-            return cart_item
 
-    @staticmethod
-    def update_item_quantity(
-        db: Session,
-        cart_item_id: int,
-        quantity: int
-    ) -> Optional[CartItem]:
-        """Update cart item quantity"""
-        cart_item = db.query(CartItem).filter(CartItem.id == cart_item_id).first()
-        if not cart_item:
-            return None
+# cart_query, active_cart_by_session_query and item_by_clover_id_query are also EXPLAINed
+# by database/explain_check.py, so the check sees the statements the helpers really run
 
-        if quantity <= 0:
-            # Remove item if quantity is 0 or negative
-            cart_id = cart_item.cart_id
-            db.delete(cart_item)
-            db.commit()
-            CartHelper._update_cart_totals(db, cart_id)
-            return None
+def cart_query(cart_id: int):
+    """Cart with its items and their modifiers loaded up front (no lazy loads under AsyncSession)"""
+    return select(Cart).where(Cart.id == cart_id).options(selectinload(Cart.items).selectinload(CartItem.modifiers))
 
-        cart_item.quantity = quantity
-        cart_item.line_total = cart_item.price * quantity
-        cart_item.updated_at = datetime.now()
-        db.commit()
-        db.refresh(cart_item)
-        CartHelper._update_cart_totals(db, cart_item.cart_id)
-        return cart_item
 
-    @staticmethod
-    def remove_item_from_cart(db: Session, cart_item_id: int) -> bool:
-        """Remove an item from cart"""
-        cart_item = db.query(CartItem).filter(CartItem.id == cart_item_id).first()
-        if not cart_item:
-            return False
+def active_cart_by_session_query(session_id: str):
+    return select(Cart).where(Cart.session_id == session_id, Cart.status == "active").limit(1)
 
-        cart_id = cart_item.cart_id
-        db.delete(cart_item)
-        db.commit()
-        CartHelper._update_cart_totals(db, cart_id)
-        return True
 
-    @staticmethod
-    def add_modifier_to_item(
-        db: Session,
-        cart_item_id: int,
-        clover_modifier_id: str,
-        clover_modifier_group_id: str,
-        name: str,
-        price: float = 0.0
-    ) -> CartItemModifier:
-        """Add a modifier to a cart item"""
-        modifier = CartItemModifier(
-            cart_item_id=cart_item_id,
-            clover_modifier_id=clover_modifier_id,
-            clover_modifier_group_id=clover_modifier_group_id,
-            name=name,
-            price=price
+# Cart totals are maintained incrementally: each mutation locks the cart row, touches
+# only the rows it changes and moves the totals by a delta in one UPDATE, so its cost
+# doesn't depend on how many items or modifiers the cart has. Deltas are computed only
+# from item rows read FOR UPDATE after that lock (_item_query, item_by_clover_id_query);
+# an item object from earlier in the session, or from before the lock, may be stale.
+# Tax and discount are 0 for now, so the total moves with the subtotal.
+# CartTotalsVerifier checks for drift.
+
+def _lock_cart_query(cart_id: int):
+    # Every mutation takes the cart row lock first, so mutations of one cart apply one after the other.
+    # The status comes with it: checked before the lock, a checkout could slip in between
+    return select(Cart.id, Cart.status).where(Cart.id == cart_id).with_for_update()
+
+
+def _lock_item_cart_query(cart_item_id: int):
+    # The item's cart, locked by the same statement that finds it (the cart isn't known yet).
+    # MySQL 8 locks only the cart row (FOR UPDATE OF); older servers lock the item row too
+    return (
+        select(CartItem.cart_id)
+        .join(Cart, Cart.id == CartItem.cart_id)
+        .where(CartItem.id == cart_item_id)
+        .with_for_update(of=Cart)
+    )
+
+
+# Item reads behind the cart lock are locking reads too: under REPEATABLE READ a plain
+# SELECT would still see the transaction's snapshot, not what the previous holder wrote.
+# populate_existing replaces whatever stale copy the session's identity map holds.
+
+def _item_query(cart_item_id: int):
+    return (
+        select(CartItem)
+        .where(CartItem.id == cart_item_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+
+
+def item_by_clover_id_query(cart_id: int, clover_item_id: str):
+    return (
+        select(CartItem)
+        .where(CartItem.cart_id == cart_id, CartItem.clover_item_id == clover_item_id)
+        .limit(1)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+
+
+def _totals_delta(cart_id: int, delta_cents: int):
+    return (
+        update(Cart)
+        .where(Cart.id == cart_id)
+        .values(
+            subtotal_cents=Cart.subtotal_cents + delta_cents,
+            total_cents=Cart.total_cents + delta_cents,
+            updated_at=datetime.now()
         )
-        db.add(modifier)
-        db.commit()
-        db.refresh(modifier)
+    )
 
-        # Update cart totals
-        cart_item = db.query(CartItem).filter(CartItem.id == cart_item_id).first()
-        if cart_item:
-            CartHelper._update_cart_totals(db, cart_item.cart_id)
 
-        return modifier
+def _unit_cents(cart_item: CartItem) -> int:
+    # Modifier costs apply per unit
+    return cart_item.price_cents + (cart_item.modifiers_cents or 0)
 
-    @staticmethod
-    def clear_cart(db: Session, cart_id: int) -> bool:
-        """Clear all items from cart"""
-        cart = db.query(Cart).filter(Cart.id == cart_id).first()
-        if not cart:
-            return False
 
-        # Delete all items (modifiers will be deleted via cascade)
-        db.query(CartItem).filter(CartItem.id == cart_id).delete()
-        db.commit()
-        CartHelper._update_cart_totals(db, cart_id)
-        return True
+def _new_item(cart_id: int, clover_item_id: str, name: str, price: float, quantity: int, notes: Optional[str]) -> CartItem:
+    price_cents = to_cents(price)
+    return CartItem(
+        cart_id=cart_id,
+        clover_item_id=clover_item_id,
+        name=name,
+        price_cents=price_cents,
+        quantity=quantity,
+        modifiers_cents=0,
+        line_total_cents=price_cents * quantity,
+        notes=notes
+    )
 
-    @staticmethod
-    def _update_cart_totals(db: Session, cart_id: int):
-        """Update cart totals based on items and modifiers"""
-        cart = db.query(Cart).filter(Cart.id == cart_id).first()
-        if not cart:
-            return
 
-        # Calculate subtotal from items
-        subtotal = 0.0
-        for item in cart.items:
-            item_total = item.line_total
-            # Add modifier costs
-            modifier_total = sum(mod.price for mod in item.modifiers)
-            item_total += (modifier_total * item.quantity)
-            subtotal += item_total
+def _set_quantity(cart_item: CartItem, quantity: int) -> int:
+    """Update the item (as read FOR UPDATE) in place; returns the change to the cart totals"""
+    delta_cents = (quantity - cart_item.quantity) * _unit_cents(cart_item)
+    cart_item.quantity = quantity
+    cart_item.line_total_cents = cart_item.price_cents * quantity
+    cart_item.updated_at = datetime.now()
+    return delta_cents
+
+
+def _delete_item_statements(cart_item_id: int):
+    return (
+        delete(CartItemModifier).where(CartItemModifier.cart_item_id == cart_item_id)
+        .execution_options(synchronize_session=False),
+        delete(CartItem).where(CartItem.id == cart_item_id).execution_options(synchronize_session=False),
+    )
+
+
+def _clear_statements(cart_id: int):
+    return (
+        delete(CartItemModifier)
+        .where(CartItemModifier.cart_item_id.in_(select(CartItem.id).where(CartItem.cart_id == cart_id)))
+        .execution_options(synchronize_session=False),
+        delete(CartItem).where(CartItem.cart_id == cart_id).execution_options(synchronize_session=False),
+        update(Cart).where(Cart.id == cart_id).values(subtotal_cents=0, total_cents=0, updated_at=datetime.now()),
+    )
+
+
+def _new_modifier(
+    cart_item: CartItem,
+    clover_modifier_id: str,
+    clover_modifier_group_id: str,
+    name: str,
+    price: float
+) -> Tuple[CartItemModifier, int]:
+    """The modifier to add and the change to the cart totals; updates the item's per-unit modifier cost"""
+    price_cents = to_cents(price)
+    modifier = CartItemModifier(
+        cart_item_id=cart_item.id,
+        clover_modifier_id=clover_modifier_id,
+        clover_modifier_group_id=clover_modifier_group_id,
+        name=name,
+        price_cents=price_cents
+    )
+    cart_item.modifiers_cents = (cart_item.modifiers_cents or 0) + price_cents
+    cart_item.updated_at = datetime.now()
+    return modifier, price_cents * cart_item.quantity
+
+
+def totals_drift_query(limit: Optional[int] = None):
+    """
+    One aggregate over the active carts: each cart whose stored totals (or whose items'
+    per-unit modifier costs) differ from what its rows add up to, with the expected subtotal
+    """
+    modifier_sums = (
+        select(CartItemModifier.cart_item_id, func.sum(CartItemModifier.price_cents).label("cents"))
+        .group_by(CartItemModifier.cart_item_id)
+        .subquery()
+    )
+    modifiers_cents = func.coalesce(modifier_sums.c.cents, 0)
+    expected_cents = func.coalesce(func.sum(CartItem.quantity * (CartItem.price_cents + modifiers_cents)), 0)
+    stale_items = func.coalesce(func.sum(case((CartItem.modifiers_cents != modifiers_cents, 1), else_=0)), 0)
+    query = (
+        select(
+            Cart.id.label("cart_id"),
+            Cart.clover_merchant_id.label("merchant_id"),
+            Cart.subtotal_cents,
+            Cart.total_cents,
+            expected_cents.label("expected_cents"),
+            stale_items.label("stale_items"),
+        )
+        .select_from(Cart)
+        .outerjoin(CartItem, CartItem.cart_id == Cart.id)
+        .outerjoin(modifier_sums, modifier_sums.c.cart_item_id == CartItem.id)
+        .where(Cart.status == "active")
+        .group_by(Cart.id, Cart.clover_merchant_id, Cart.subtotal_cents, Cart.total_cents)
+        .having(or_(Cart.subtotal_cents != expected_cents, Cart.total_cents != expected_cents, stale_items > 0))
+        .order_by(Cart.id)
+    )
+    return query.limit(limit) if limit else query
 
-        # For now, set tax and discount to 0 (can be enhanced later)
-        tax_amount = 0.0
-        discount_amount = 0.0
-        total_amount = subtotal + tax_amount - discount_amount
 
-        # Update cart
-        cart.subtotal = subtotal
-        cart.total_amount = total_amount
-        cart.updated_at = datetime.now()
+def repair_totals_statements(cart_ids: List[int]):
+    """Recompute the totals of these carts (and their items' modifier costs) from their rows"""
+    item_modifiers_cents = (
+        select(func.coalesce(func.sum(CartItemModifier.price_cents), 0))
+        .where(CartItemModifier.cart_item_id == CartItem.id)
+        .scalar_subquery()
+    )
+    # Summed from the modifier rows rather than modifiers_cents, so carts can be updated
+    # (and locked) before their items, the same order the mutations lock in
+    subtotal_cents = (
+        select(func.coalesce(func.sum(CartItem.quantity * (CartItem.price_cents + item_modifiers_cents)), 0))
+        .where(CartItem.cart_id == Cart.id)
+        .scalar_subquery()
+    )
+    return (
+        update(Cart)
+        .where(Cart.id.in_(cart_ids))
+        .values(subtotal_cents=subtotal_cents, total_cents=subtotal_cents)
+        .execution_options(synchronize_session=False),
+        update(CartItem)
+        .where(CartItem.cart_id.in_(cart_ids))
+        .values(modifiers_cents=item_modifiers_cents)
+        .execution_options(synchronize_session=False),
+    )
 
-        db.commit()
+
+class CartHelper:
+    """Helper class for cart reads on a sync Session (carts are changed through AsyncCartHelper)"""
+
+    @staticmethod
+    def get_cart_by_id(db: Session, cart_id: int) -> Optional[Cart]:
+        """Get cart by ID with items and modifiers"""
+        return db.query(Cart).filter(Cart.id == cart_id).first()
+
+    @staticmethod
+    def get_active_cart_by_session(db: Session, session_id: str) -> Optional[Cart]:
+        """Get active cart by session ID"""
+        return db.execute(active_cart_by_session_query(session_id)).scalars().first()
 
     @staticmethod
     def get_cart_summary(db: Session, cart_id: int) -> Optional[Dict]:
@@ -201,7 +242,11 @@ class CartHelper:
         cart = db.query(Cart).filter(Cart.id == cart_id).first()
         if not cart:
             return None
+        return CartHelper.summarize(cart)
 
+    @staticmethod
+    def summarize(cart: Cart) -> Dict:
+        """Cart as a dict with its items and modifiers (they must be loaded already under AsyncSession)"""
         items = []
         for item in cart.items:
             modifiers = [
@@ -253,3 +298,183 @@ class CartHelper:
                 cart_summaries.append(summary)
 
         return cart_summaries
+
+
+class AsyncCartHelper:
+    """CartHelper for AsyncSession, for async def routes (AsyncSessionLocal doesn't expire on commit)"""
+
+    @staticmethod
+    async def create_cart(db: AsyncSession, merchant_id: str, session_id: str = None) -> Cart:
+        """Create a new empty cart"""
+        cart = Cart(
+            clover_merchant_id=merchant_id,
+            session_id=session_id,
+            status="active",
+            subtotal_cents=0,
+            total_cents=0
+        )
+        db.add(cart)
+        await db.commit()
+        return cart
+
+    @staticmethod
+    async def get_cart_by_id(db: AsyncSession, cart_id: int, with_items: bool = True) -> Optional[Cart]:
+        """Get cart by ID, by default with items and modifiers"""
+        if not with_items:
+            return await db.get(Cart, cart_id)
+        return (await db.execute(cart_query(cart_id))).scalar_one_or_none()
+
+    @staticmethod
+    async def get_active_cart_by_session(db: AsyncSession, session_id: str) -> Optional[Cart]:
+        """Get active cart by session ID"""
+        return (await db.execute(active_cart_by_session_query(session_id))).scalars().first()
+
+    @staticmethod
+    async def add_item_to_cart(
+        db: AsyncSession,
+        cart_id: int,
+        clover_item_id: str,
+        name: str,
+        price: float,
+        quantity: int = 1,
+        notes: str = None,
+        availability: Optional[MerchantAvailability] = None
+    ) -> CartItem:
+        """
+        Add an item to cart; raises CartNotActiveError unless the cart is active, and with
+        availability, ItemUnavailableError if the cart would exceed stock
+        """
+        await AsyncCartHelper._lock_cart(db, cart_id, active_only=True)
+        cart_item = (await db.execute(item_by_clover_id_query(cart_id, clover_item_id))).scalars().first()
+
+        if availability is not None:
+            try:
+                availability.check(clover_item_id, quantity + (cart_item.quantity if cart_item else 0))
+            except ItemUnavailableError:
+                await db.rollback()  # release the cart lock
+                raise
+
+        if cart_item:
+            delta_cents = _set_quantity(cart_item, cart_item.quantity + quantity)
+        else:
+            cart_item = _new_item(cart_id, clover_item_id, name, price, quantity, notes)
+            db.add(cart_item)
+            delta_cents = cart_item.line_total_cents
+
+        await db.execute(_totals_delta(cart_id, delta_cents))
+        await db.commit()
+        return cart_item
+
+    @staticmethod
+    async def update_item_quantity(db: AsyncSession, cart_item_id: int, quantity: int) -> Optional[CartItem]:
+        """Update cart item quantity (0 or less removes it)"""
+        cart_item = await AsyncCartHelper._lock_item(db, cart_item_id)
+        if not cart_item:
+            return None
+
+        if quantity <= 0:
+            await AsyncCartHelper._delete_item(db, cart_item)
+            return None
+
+        await db.execute(_totals_delta(cart_item.cart_id, _set_quantity(cart_item, quantity)))
+        await db.commit()
+        return cart_item
+
+    @staticmethod
+    async def remove_item_from_cart(db: AsyncSession, cart_item_id: int) -> bool:
+        """Remove an item from cart"""
+        cart_item = await AsyncCartHelper._lock_item(db, cart_item_id)
+        if not cart_item:
+            return False
+
+        await AsyncCartHelper._delete_item(db, cart_item)
+        return True
+
+    @staticmethod
+    async def add_modifier_to_item(
+        db: AsyncSession,
+        cart_item_id: int,
+        clover_modifier_id: str,
+        clover_modifier_group_id: str,
+        name: str,
+        price: float = 0.0
+    ) -> CartItemModifier:
+        """Add a modifier to a cart item"""
+        cart_item = await AsyncCartHelper._lock_item(db, cart_item_id)
+        if not cart_item:
+            raise ValueError(f"Cart item {cart_item_id} not found")
+
+        modifier, delta_cents = _new_modifier(cart_item, clover_modifier_id, clover_modifier_group_id, name, price)
+        db.add(modifier)
+        await db.execute(_totals_delta(cart_item.cart_id, delta_cents))
+        await db.commit()
+        return modifier
+
+    @staticmethod
+    async def clear_cart(db: AsyncSession, cart_id: int) -> bool:
+        """Clear all items from cart"""
+        if (await db.execute(_lock_cart_query(cart_id))).scalar() is None:
+            return False
+
+        for statement in _clear_statements(cart_id):
+            await db.execute(statement)
+        await db.commit()
+        return True
+
+    @staticmethod
+    async def _lock_cart(db: AsyncSession, cart_id: int, active_only: bool = False) -> None:
+        cart = (await db.execute(_lock_cart_query(cart_id))).first()
+        if cart is None:
+            raise ValueError(f"Cart {cart_id} not found")
+        if active_only and cart.status != "active":
+            await db.rollback()  # release the cart lock
+            raise CartNotActiveError(cart_id, cart.status)
+
+    @staticmethod
+    async def _lock_item(db: AsyncSession, cart_item_id: int) -> Optional[CartItem]:
+        """The item, read after locking its cart (None if it's gone)"""
+        if (await db.execute(_lock_item_cart_query(cart_item_id))).scalar() is None:
+            return None
+        return (await db.execute(_item_query(cart_item_id))).scalars().first()
+
+    @staticmethod
+    async def _delete_item(db: AsyncSession, cart_item: CartItem) -> None:
+        for statement in _delete_item_statements(cart_item.id):
+            await db.execute(statement)
+        await db.execute(_totals_delta(cart_item.cart_id, -cart_item.quantity * _unit_cents(cart_item)))
+        db.expunge(cart_item)
+        await db.commit()
+
+    @staticmethod
+    async def get_cart_summary(db: AsyncSession, cart_id: int) -> Optional[Dict]:
+        """Get cart summary with all details"""
+        cart = (await db.execute(cart_query(cart_id))).scalar_one_or_none()
+        if not cart:
+            return None
+        return CartHelper.summarize(cart)
+
+    @staticmethod
+    async def get_carts_by_customer(db: AsyncSession, customer_id: str) -> List[Dict]:
+        """Get all carts for a specific customer"""
+        result = await db.execute(
+            select(Cart)
+            .where(Cart.customer_id == customer_id)
+            .order_by(Cart.created_at.desc())
+            .options(selectinload(Cart.items).selectinload(CartItem.modifiers))
+        )
+        return [CartHelper.summarize(cart) for cart in result.scalars().all()]
+
+    @staticmethod
+    async def find_totals_drift(db: AsyncSession, limit: Optional[int] = None) -> List[Dict]:
+        """Active carts whose stored totals don't match their items (one aggregate query)"""
+        rows = (await db.execute(totals_drift_query(limit))).mappings().all()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    async def repair_totals(db: AsyncSession, cart_ids: List[int]) -> None:
+        """Recompute these carts' totals from their rows"""
+        if not cart_ids:
+            return
+        for statement in repair_totals_statements(cart_ids):
+            await db.execute(statement)
+        await db.commit()
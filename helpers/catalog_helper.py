@@ -0,0 +1,310 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable, Set, Type
+from models.catalog import (
+    CatalogItem,
+    CatalogCategory,
+    CatalogItemCategory,
+    CatalogModifierGroup,
+    CatalogModifier,
+    CatalogItemStock,
+    CatalogSyncState,
+)
+
+# Related objects Clover only embeds when asked for with ?expand=
+ITEM_EXPANSIONS = ("categories", "modifierGroups", "tags", "itemStock")
+
+
+def _ids(elements: Iterable[Dict[str, Any]]) -> List[str]:
+    return [e["id"] for e in elements if e.get("id")]
+
+
+def _chunks(values: List[str], size: int = 500) -> Iterable[List[str]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _sync_state_query(merchant_id: str, entity: str):
+    return select(CatalogSyncState).where(
+        CatalogSyncState.merchant_id == merchant_id,
+        CatalogSyncState.entity == entity,
+    ).limit(1)
+
+
+# Mirror reads behind the catalog routes (also EXPLAINed by database/explain_check.py)
+
+def items_query(merchant_id: str, limit: Optional[int] = None, offset: int = 0):
+    return select(CatalogItem.data).where(
+        CatalogItem.merchant_id == merchant_id
+    ).order_by(CatalogItem.clover_id).offset(offset).limit(limit)
+
+
+def category_items_query(merchant_id: str, category_id: str):
+    return select(CatalogItem.data).join(
+        CatalogItemCategory,
+        (CatalogItemCategory.merchant_id == CatalogItem.merchant_id)
+        & (CatalogItemCategory.item_id == CatalogItem.clover_id),
+    ).where(
+        CatalogItemCategory.merchant_id == merchant_id,
+        CatalogItemCategory.category_id == category_id,
+    ).order_by(CatalogItem.clover_id)
+
+
+def item_query(merchant_id: str, item_id: str):
+    return select(CatalogItem.data).where(
+        CatalogItem.merchant_id == merchant_id,
+        CatalogItem.clover_id == item_id,
+    ).limit(1)
+
+
+def categories_query(merchant_id: str, limit: Optional[int] = None, offset: int = 0):
+    return select(CatalogCategory.data).where(
+        CatalogCategory.merchant_id == merchant_id
+    ).order_by(CatalogCategory.sort_order, CatalogCategory.clover_id).offset(offset).limit(limit)
+
+
+def _strip_expansions(data: Dict[str, Any], expand: str) -> Dict[str, Any]:
+    wanted = {part.strip() for part in expand.split(",") if part.strip()}
+    return {k: v for k, v in data.items() if k not in ITEM_EXPANSIONS or k in wanted}
+
+
+class CatalogHelper:
+    """Helper class for the local Clover catalog mirror"""
+
+    # ---- sync state ----
+
+    @staticmethod
+    def get_sync_state(db: Session, merchant_id: str, entity: str) -> Optional[CatalogSyncState]:
+        return db.execute(_sync_state_query(merchant_id, entity)).scalars().first()
+
+    @staticmethod
+    def get_or_create_sync_state(db: Session, merchant_id: str, entity: str) -> CatalogSyncState:
+        state = CatalogHelper.get_sync_state(db, merchant_id, entity)
+        if not state:
+            state = CatalogSyncState(merchant_id=merchant_id, entity=entity)
+            db.add(state)
+            db.flush()
+        return state
+
+    @staticmethod
+    def is_synced(db: Session, merchant_id: str, entity: str) -> bool:
+        """True once a full load of this entity has completed for the merchant"""
+        state = CatalogHelper.get_sync_state(db, merchant_id, entity)
+        return bool(state and state.last_full_sync_at)
+
+    # ---- upserts (one page of Clover elements at a time) ----
+
+    @staticmethod
+    def _existing(db: Session, model: Type, merchant_id: str, key_column: str, keys: List[str]) -> Dict[str, Any]:
+        column = getattr(model, key_column)
+        rows = db.query(model).filter(model.merchant_id == merchant_id, column.in_(keys)).all() if keys else []
+        return {getattr(row, key_column): row for row in rows}
+
+    @staticmethod
+    def _upsert(db: Session, model: Type, merchant_id: str, key_column: str, rows: Dict[str, Dict[str, Any]]) -> None:
+        existing = CatalogHelper._existing(db, model, merchant_id, key_column, list(rows))
+        for key, values in rows.items():
+            row = existing.get(key)
+            if row is None:
+                db.add(model(merchant_id=merchant_id, **{key_column: key}, **values))
+            else:
+                for column, value in values.items():
+                    setattr(row, column, value)
+
+    @staticmethod
+    def upsert_categories(db: Session, merchant_id: str, categories: List[Dict[str, Any]]) -> None:
+        CatalogHelper._upsert(db, CatalogCategory, merchant_id, "clover_id", {
+            c["id"]: {
+                "name": c.get("name"),
+                "sort_order": c.get("sortOrder"),
+                "modified_time": c.get("modifiedTime"),
+                "data": c,
+            }
+            for c in categories if c.get("id")
+        })
+
+    @staticmethod
+    def upsert_items(db: Session, merchant_id: str, items: List[Dict[str, Any]]) -> None:
+        """Upsert items (fetched with expand=categories) and rebuild their category links"""
+        CatalogHelper._upsert(db, CatalogItem, merchant_id, "clover_id", {
+            i["id"]: {
+                "name": i.get("name"),
+                "price": i.get("price") or 0,
+                "price_type": i.get("priceType"),
+                "sku": i.get("sku"),
+                "hidden": bool(i.get("hidden", False)),
+                "available": i.get("available"),
+                "modified_time": i.get("modifiedTime"),
+                "data": i,
+            }
+            for i in items if i.get("id")
+        })
+
+        item_ids = _ids(items)
+        if item_ids:
+            db.query(CatalogItemCategory).filter(
+                CatalogItemCategory.merchant_id == merchant_id,
+                CatalogItemCategory.item_id.in_(item_ids),
+            ).delete(synchronize_session=False)
+        links = {
+            (item["id"], category["id"])
+            for item in items if item.get("id")
+            for category in (item.get("categories") or {}).get("elements", []) if category.get("id")
+        }
+        db.add_all(
+            CatalogItemCategory(merchant_id=merchant_id, item_id=item_id, category_id=category_id)
+            for item_id, category_id in links
+        )
+
+    @staticmethod
+    def upsert_modifier_groups(db: Session, merchant_id: str, groups: List[Dict[str, Any]]) -> Set[str]:
+        """Upsert modifier groups (fetched with expand=modifiers) and their modifiers; returns modifier IDs seen"""
+        modifiers: Dict[str, Dict[str, Any]] = {}
+        for group in groups:
+            for modifier in (group.get("modifiers") or {}).get("elements", []):
+                if modifier.get("id"):
+                    modifiers[modifier["id"]] = {
+                        "modifier_group_id": group["id"],
+                        "name": modifier.get("name"),
+                        "price": modifier.get("price") or 0,
+                        "available": modifier.get("available"),
+                        "data": modifier,
+                    }
+
+        CatalogHelper._upsert(db, CatalogModifierGroup, merchant_id, "clover_id", {
+            g["id"]: {
+                "name": g.get("name"),
+                "min_required": g.get("minRequired"),
+                "max_allowed": g.get("maxAllowed"),
+                "modified_time": g.get("modifiedTime"),
+                "data": g,
+            }
+            for g in groups if g.get("id")
+        })
+        CatalogHelper._upsert(db, CatalogModifier, merchant_id, "clover_id", modifiers)
+        return set(modifiers)
+
+    @staticmethod
+    def upsert_item_stocks(db: Session, merchant_id: str, stocks: List[Dict[str, Any]]) -> None:
+        CatalogHelper._upsert(db, CatalogItemStock, merchant_id, "item_id", {
+            s["item"]["id"]: {
+                "stock_count": s.get("stockCount"),
+                "quantity": s.get("quantity"),
+                "modified_time": s.get("modifiedTime"),
+                "data": s,
+            }
+            for s in stocks if (s.get("item") or {}).get("id")
+        })
+
+    @staticmethod
+    def delete_ids(db: Session, model: Type, merchant_id: str, ids: Iterable[str], key_column: str = "clover_id") -> int:
+        """Drop rows by Clover ID (items and categories also lose their item-category links)"""
+        column = getattr(model, key_column)
+        ids = list(ids)
+        link_column = {CatalogItem: CatalogItemCategory.item_id, CatalogCategory: CatalogItemCategory.category_id}.get(model)
+        for chunk in _chunks(ids):
+            db.query(model).filter(model.merchant_id == merchant_id, column.in_(chunk)).delete(synchronize_session=False)
+            if link_column is not None:
+                db.query(CatalogItemCategory).filter(
+                    CatalogItemCategory.merchant_id == merchant_id,
+                    link_column.in_(chunk),
+                ).delete(synchronize_session=False)
+        return len(ids)
+
+    @staticmethod
+    def delete_missing(db: Session, model: Type, merchant_id: str, keep: Set[str], key_column: str = "clover_id") -> int:
+        """After a full load, drop rows Clover no longer returns"""
+        column = getattr(model, key_column)
+        current = {key for (key,) in db.query(column).filter(model.merchant_id == merchant_id)}
+        return CatalogHelper.delete_ids(db, model, merchant_id, current - keep, key_column)
+
+    @staticmethod
+    def mark_synced(db: Session, state: CatalogSyncState, watermark: Optional[int], full: bool, count: int) -> None:
+        now = datetime.utcnow()
+        if watermark is not None:
+            state.watermark = max(state.watermark or 0, watermark)
+        state.last_synced_at = now
+        if full:
+            state.last_full_sync_at = now
+        state.object_count = count
+
+
+class AsyncCatalogHelper:
+    """Catalog mirror reads for async def routes (AsyncSession), in Clover's response shape"""
+
+    @staticmethod
+    async def get_sync_state(db: AsyncSession, merchant_id: str, entity: str) -> Optional[CatalogSyncState]:
+        return (await db.execute(_sync_state_query(merchant_id, entity))).scalars().first()
+
+    @staticmethod
+    async def list_sync_states(db: AsyncSession, merchant_id: Optional[str] = None) -> List[CatalogSyncState]:
+        query = select(CatalogSyncState)
+        if merchant_id:
+            query = query.where(CatalogSyncState.merchant_id == merchant_id)
+        result = await db.execute(query.order_by(CatalogSyncState.merchant_id, CatalogSyncState.entity))
+        return list(result.scalars())
+
+    @staticmethod
+    async def is_synced(db: AsyncSession, merchant_id: str, entity: str) -> bool:
+        """True once a full load of this entity has completed for the merchant"""
+        state = await AsyncCatalogHelper.get_sync_state(db, merchant_id, entity)
+        return bool(state and state.last_full_sync_at)
+
+    @staticmethod
+    async def _data(db: AsyncSession, query) -> List[Dict[str, Any]]:
+        return [data for (data,) in (await db.execute(query)).all()]
+
+    @staticmethod
+    async def list_items(db: AsyncSession, merchant_id: str, limit: Optional[int], offset: int, expand: str = "") -> Dict[str, Any]:
+        rows = await AsyncCatalogHelper._data(db, items_query(merchant_id, limit, offset))
+        return {"elements": [_strip_expansions(data, expand) for data in rows]}
+
+    @staticmethod
+    async def list_category_items(db: AsyncSession, merchant_id: str, category_id: str, expand: str = "") -> Dict[str, Any]:
+        rows = await AsyncCatalogHelper._data(db, category_items_query(merchant_id, category_id))
+        return {"elements": [_strip_expansions(data, expand) for data in rows]}
+
+    @staticmethod
+    async def get_item(db: AsyncSession, merchant_id: str, item_id: str, expand: str = "") -> Optional[Dict[str, Any]]:
+        rows = await AsyncCatalogHelper._data(db, item_query(merchant_id, item_id))
+        return _strip_expansions(rows[0], expand) if rows else None
+
+    @staticmethod
+    async def list_categories(db: AsyncSession, merchant_id: str, limit: Optional[int], offset: int) -> Dict[str, Any]:
+        rows = await AsyncCatalogHelper._data(db, categories_query(merchant_id, limit, offset))
+        return {"elements": rows}
+
+    @staticmethod
+    async def list_modifier_groups(db: AsyncSession, merchant_id: str, limit: Optional[int], offset: int) -> Dict[str, Any]:
+        rows = await AsyncCatalogHelper._data(db, select(CatalogModifierGroup.data).where(
+            CatalogModifierGroup.merchant_id == merchant_id
+        ).order_by(CatalogModifierGroup.clover_id).offset(offset).limit(limit))
+        # Clover leaves modifiers out unless ?expand=modifiers
+        return {"elements": [{k: v for k, v in data.items() if k != "modifiers"} for data in rows]}
+
+    @staticmethod
+    async def list_modifiers(db: AsyncSession, merchant_id: str, modifier_group_id: str) -> Dict[str, Any]:
+        rows = await AsyncCatalogHelper._data(db, select(CatalogModifier.data).where(
+            CatalogModifier.merchant_id == merchant_id,
+            CatalogModifier.modifier_group_id == modifier_group_id,
+        ).order_by(CatalogModifier.clover_id))
+        return {"elements": rows}
+
+    @staticmethod
+    async def get_modifier(db: AsyncSession, merchant_id: str, modifier_group_id: str, modifier_id: str) -> Optional[Dict[str, Any]]:
+        rows = await AsyncCatalogHelper._data(db, select(CatalogModifier.data).where(
+            CatalogModifier.merchant_id == merchant_id,
+            CatalogModifier.modifier_group_id == modifier_group_id,
+            CatalogModifier.clover_id == modifier_id,
+        ).limit(1))
+        return rows[0] if rows else None
+
+    @staticmethod
+    async def list_item_stocks(db: AsyncSession, merchant_id: str, limit: Optional[int], offset: int, item_id: Optional[str] = None) -> Dict[str, Any]:
+        query = select(CatalogItemStock.data).where(CatalogItemStock.merchant_id == merchant_id)
+        if item_id:
+            query = query.where(CatalogItemStock.item_id == item_id)
+        rows = await AsyncCatalogHelper._data(db, query.order_by(CatalogItemStock.item_id).offset(offset).limit(limit))
+        return {"elements": rows}
@@ -1,13 +1,100 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, text
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple
 from models.merchant import Merchant
 from models.merchant_detail import MerchantDetail
 from models.merchant_token import MerchantToken
+from helpers.merchant_token_cache import MerchantTokenCache
+from app.config.settings import Settings
 import json
 
 
+# Shared by MerchantHelper / AsyncMerchantHelper.get_merchant_token (and database/explain_check.py)
+TOKEN_QUERY = text("""
+    SELECT mt.token
+    FROM merchant_tokens mt
+    JOIN merchants m ON mt.merchant_id = m.id
+    WHERE m.clover_merchant_id = :clover_id
+""")
+
+ALL_TOKENS_QUERY = text("""
+    SELECT m.clover_merchant_id, mt.token
+    FROM merchant_tokens mt
+    JOIN merchants m ON mt.merchant_id = m.id
+""")
+
+
+def merchant_by_clover_id_query(clover_merchant_id: str):
+    """Shared by MerchantHelper / AsyncMerchantHelper.get_merchant_by_clover_id (and database/explain_check.py)"""
+    return select(Merchant).where(Merchant.clover_merchant_id == clover_merchant_id).limit(1)
+
+
+def _safe_extract_string(data: dict, key: str, max_length: int = None) -> Optional[str]:
+    """Safely extract a string value from merchant data"""
+    value = data.get(key)
+    if value is None:
+        return None
+
+    # If it's already a string, use it
+    if isinstance(value, str):
+        return value[:max_length] if max_length and len(value) > max_length else value
+
+    # If it's a dict or list, convert to JSON string (for complex fields)
+    if isinstance(value, (dict, list)):
+        try:
+            json_str = json.dumps(value)
+            return json_str[:max_length] if max_length and len(json_str) > max_length else json_str
+        except (TypeError, ValueError):
+            return str(value)[:max_length] if max_length else str(value)
+
+    # For other types, convert to string
+    str_value = str(value)
+    return str_value[:max_length] if max_length and len(str_value) > max_length else str_value
+
+
+def _merchant_detail_fields(merchant_data: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """MerchantDetail columns from Clover merchant data"""
+    return {
+        "name": _safe_extract_string(merchant_data, "name", 255),
+        "currency": _safe_extract_string(merchant_data, "currency", 16),
+        "timezone": _safe_extract_string(merchant_data, "timezone", 64),
+        "email": _safe_extract_string(merchant_data, "email", 255),
+        # Note: Clover API uses "address1" not "address"
+        "address": _safe_extract_string(merchant_data, "address1", 255) or _safe_extract_string(merchant_data, "address", 255),
+        "city": _safe_extract_string(merchant_data, "city", 100),
+        "state": _safe_extract_string(merchant_data, "state", 100),
+        "country": _safe_extract_string(merchant_data, "country", 100),
+        # Note: Clover API uses "zip" not "postal_code"
+        "postal_code": _safe_extract_string(merchant_data, "zip", 20) or _safe_extract_string(merchant_data, "postal_code", 20),
+    }
+
+
+def _apply_token(
+    token: MerchantToken,
+    access_token: str,
+    refresh_token: Optional[str],
+    expires_at: Optional[datetime],
+    refresh_token_expires_at: Optional[datetime]
+) -> None:
+    token.token = access_token
+    token.token_type = "bearer"
+    token.expires_at = expires_at
+    token.refreshed_at = datetime.utcnow()
+    # Keep the old refresh token when only the access token changed
+    if refresh_token:
+        token.refresh_token = refresh_token
+        token.refresh_token_expires_at = refresh_token_expires_at
+
+
+_settings = Settings()
+token_cache = MerchantTokenCache(
+    ttl=_settings.MERCHANT_TOKEN_CACHE_TTL,
+    negative_ttl=_settings.MERCHANT_TOKEN_NEGATIVE_TTL,
+    max_entries=_settings.MERCHANT_TOKEN_CACHE_SIZE,
+)
+
 
 class MerchantHelper:
     """Helper class for merchant database operations"""
@@ -15,9 +102,7 @@ class MerchantHelper:
     @staticmethod
     def get_merchant_by_clover_id(db: Session, clover_merchant_id: str) -> Optional[Merchant]:
         """Get merchant by Clover merchant ID"""
-        return db.query(Merchant).filter(
-            Merchant.clover_merchant_id == clover_merchant_id
-        ).first()
+        return db.execute(merchant_by_clover_id_query(clover_merchant_id)).scalars().first()
 
     @staticmethod
     def create_merchant(db: Session, clover_merchant_id: str, name: str = None, email: str = None) -> Merchant:
@@ -44,8 +129,15 @@ class MerchantHelper:
         return merchant
 
     @staticmethod
-    def store_or_update_token(db: Session, merchant_id: int, access_token: str) -> None:
-        """Store or update merchant access token"""
+    def store_or_update_token(
+        db: Session,
+        merchant_id: int,
+        access_token: str,
+        refresh_token: Optional[str] = None,
+        expires_at: Optional[datetime] = None,
+        refresh_token_expires_at: Optional[datetime] = None
+    ) -> None:
+        """Store or update merchant access token (and refresh token / expiry for expiring OAuth tokens)"""
         # Check if token exists
         existing_token = db.query(MerchantToken).filter(
             MerchantToken.merchant_id == merchant_id
@@ -53,19 +145,19 @@ class MerchantHelper:
 
         if existing_token:
             # Update existing token
-            existing_token.token = access_token
-            existing_token.token_type = "bearer"
+            _apply_token(existing_token, access_token, refresh_token, expires_at, refresh_token_expires_at)
         else:
             # Create new token
-            token = MerchantToken(
-                merchant_id=merchant_id,
-                token=access_token,
-                token_type="bearer"
-            )
+            token = MerchantToken(merchant_id=merchant_id)
+            _apply_token(token, access_token, refresh_token, expires_at, refresh_token_expires_at)
             db.add(token)
 
         db.commit()
 
+        clover_merchant_id = db.query(Merchant.clover_merchant_id).filter(Merchant.id == merchant_id).scalar()
+        if clover_merchant_id:
+            token_cache.invalidate(clover_merchant_id)
+
     # @staticmethod
     # def store_or_update_merchant_details(db: Session, clover_merchant_id: str, merchant_data: Dict[str, Any]) -> None:
     #     """Store or update merchant detailed information"""
@@ -108,30 +200,6 @@ class MerchantHelper:
     @staticmethod
     def store_or_update_merchant_details(db: Session, clover_merchant_id: str, merchant_data: Dict[str, Any]) -> None:
         """Store or update merchant detailed information"""
-
-        def safe_extract_string(data: dict, key: str, max_length: int = None) -> str:
-            """Safely extract a string value from merchant data"""
-            value = data.get(key)
-            if value is None:
-                return None
-
-            # If it's already a string, use it
-            if isinstance(value, str):
-                return value[:max_length] if max_length and len(value) > max_length else value
-
-            # If it's a dict or list, convert to JSON string (for complex fields)
-            if isinstance(value, (dict, list)):
-                import json
-                try:
-                    json_str = json.dumps(value)
-                    return json_str[:max_length] if max_length and len(json_str) > max_length else json_str
-                except (TypeError, ValueError):
-                    return str(value)[:max_length] if max_length else str(value)
-
-            # For other types, convert to string
-            str_value = str(value)
-            return str_value[:max_length] if max_length and len(str_value) > max_length else str_value
-
         print("Merchant detail data:", merchant_data)
 
         # Debug: Print each field and its type to identify problematic ones
@@ -148,37 +216,15 @@ class MerchantHelper:
             MerchantDetail.clover_merchant_id == clover_merchant_id
         ).first()
 
+        fields = _merchant_detail_fields(merchant_data)
         if existing_detail:
             # Update existing details with safe extraction
-            existing_detail.name = safe_extract_string(merchant_data, "name", 255)
-            existing_detail.currency = safe_extract_string(merchant_data, "currency", 16)
-            existing_detail.timezone = safe_extract_string(merchant_data, "timezone", 64)
-            existing_detail.email = safe_extract_string(merchant_data, "email", 255)
-
-            # Note: Clover API uses "address1" not "address"
-            existing_detail.address = safe_extract_string(merchant_data, "address1", 255) or safe_extract_string(merchant_data, "address", 255)
-            existing_detail.city = safe_extract_string(merchant_data, "city", 100)
-            existing_detail.state = safe_extract_string(merchant_data, "state", 100)
-            existing_detail.country = safe_extract_string(merchant_data, "country", 100)
-
-            # Note: Clover API uses "zip" not "postal_code"
-            existing_detail.postal_code = safe_extract_string(merchant_data, "zip", 20) or safe_extract_string(merchant_data, "postal_code", 20)
+            for key, value in fields.items():
+                setattr(existing_detail, key, value)
             existing_detail.updated_at = datetime.now()
         else:
             # Create new details with safe extraction
-            detail = MerchantDetail(
-                clover_merchant_id=clover_merchant_id,
-                name=safe_extract_string(merchant_data, "name", 255),
-                currency=safe_extract_string(merchant_data, "currency", 16),
-                timezone=safe_extract_string(merchant_data, "timezone", 64),
-                email=safe_extract_string(merchant_data, "email", 255),
-                address=safe_extract_string(merchant_data, "address1", 255) or safe_extract_string(merchant_data, "address", 255),
-                city=safe_extract_string(merchant_data, "city", 100),
-                state=safe_extract_string(merchant_data, "state", 100),
-                country=safe_extract_string(merchant_data, "country", 100),
-                postal_code=safe_extract_string(merchant_data, "zip", 20) or safe_extract_string(merchant_data, "postal_code", 20)
-            )
-            db.add(detail)
+            db.add(MerchantDetail(clover_merchant_id=clover_merchant_id, **fields))
 
         try:
             db.commit()
@@ -190,18 +236,23 @@ class MerchantHelper:
 
     @staticmethod
     def get_merchant_token(db: Session, clover_merchant_id: str) -> Optional[str]:
-        """Get merchant access token"""
-        result = db.execute(
-            text("""
-                SELECT mt.token
-                FROM merchant_tokens mt
-                JOIN merchants m ON mt.merchant_id = m.id
-                WHERE m.clover_merchant_id = :clover_id
-            """),
-            {"clover_id": clover_merchant_id}
-        ).fetchone()
+        """Get merchant access token (cached, see token_cache)"""
+        found, token = token_cache.get(clover_merchant_id)
+        if found:
+            return token
 
-        return result[0] if result else None
+        result = db.execute(TOKEN_QUERY, {"clover_id": clover_merchant_id}).fetchone()
+
+        token = result[0] if result else None
+        token_cache.put(clover_merchant_id, token)
+        return token
+
+    @staticmethod
+    def list_merchant_tokens(db: Session) -> List[Tuple[str, str]]:
+        """(clover merchant ID, access token) for every merchant with a stored token"""
+        result = db.execute(ALL_TOKENS_QUERY).fetchall()
+
+        return [(row[0], row[1]) for row in result]
 
     @staticmethod
     def get_total_merchants_count(db: Session) -> int:
@@ -214,7 +265,10 @@ class MerchantHelper:
         db: Session,
         clover_merchant_id: str,
         merchant_data: Dict[str, Any],
-        access_token: str
+        access_token: str,
+        refresh_token: Optional[str] = None,
+        expires_at: Optional[datetime] = None,
+        refresh_token_expires_at: Optional[datetime] = None
     ) -> int:
         """Complete merchant storage workflow"""
         try:
@@ -237,7 +291,9 @@ class MerchantHelper:
                 )
 
             # 2. Store/Update token
-            MerchantHelper.store_or_update_token(db, merchant.id, access_token)
+            MerchantHelper.store_or_update_token(
+                db, merchant.id, access_token, refresh_token, expires_at, refresh_token_expires_at
+            )
             print("Before merchat detail")
             # 3. Store/Update detailed information
             MerchantHelper.store_or_update_merchant_details(db, clover_merchant_id, merchant_data)
@@ -247,3 +303,167 @@ class MerchantHelper:
         except Exception as e:
             db.rollback()
             raise Exception(f"Failed to store merchant data: {str(e)}")
+
+        finally:
+            # Also drops a cached "no such merchant" from before the merchant existed
+            token_cache.invalidate(clover_merchant_id)
+
+
+class AsyncMerchantHelper:
+    """MerchantHelper for AsyncSession, for async def routes; shares MerchantHelper's token cache"""
+
+    @staticmethod
+    async def get_merchant_by_clover_id(db: AsyncSession, clover_merchant_id: str) -> Optional[Merchant]:
+        """Get merchant by Clover merchant ID"""
+        return (await db.execute(merchant_by_clover_id_query(clover_merchant_id))).scalars().first()
+
+    @staticmethod
+    async def store_or_update_token(
+        db: AsyncSession,
+        merchant_id: int,
+        access_token: str,
+        refresh_token: Optional[str] = None,
+        expires_at: Optional[datetime] = None,
+        refresh_token_expires_at: Optional[datetime] = None
+    ) -> None:
+        """Store or update merchant access token (and refresh token / expiry for expiring OAuth tokens)"""
+        existing_token = (await db.execute(
+            select(MerchantToken).where(MerchantToken.merchant_id == merchant_id).limit(1)
+        )).scalars().first()
+
+        if existing_token:
+            _apply_token(existing_token, access_token, refresh_token, expires_at, refresh_token_expires_at)
+        else:
+            token = MerchantToken(merchant_id=merchant_id)
+            _apply_token(token, access_token, refresh_token, expires_at, refresh_token_expires_at)
+            db.add(token)
+
+        await db.commit()
+
+        clover_merchant_id = await db.scalar(select(Merchant.clover_merchant_id).where(Merchant.id == merchant_id))
+        if clover_merchant_id:
+            token_cache.invalidate(clover_merchant_id)
+
+    @staticmethod
+    async def store_or_update_merchant_details(db: AsyncSession, clover_merchant_id: str, merchant_data: Dict[str, Any]) -> None:
+        """Store or update merchant detailed information"""
+        existing_detail = (await db.execute(
+            select(MerchantDetail).where(MerchantDetail.clover_merchant_id == clover_merchant_id).limit(1)
+        )).scalars().first()
+
+        fields = _merchant_detail_fields(merchant_data)
+        if existing_detail:
+            for key, value in fields.items():
+                setattr(existing_detail, key, value)
+            existing_detail.updated_at = datetime.now()
+        else:
+            db.add(MerchantDetail(clover_merchant_id=clover_merchant_id, **fields))
+
+        try:
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise Exception(f"Database commit failed: {str(e)}")
+
+    @staticmethod
+    async def get_merchant_token(db: AsyncSession, clover_merchant_id: str) -> Optional[str]:
+        """Get merchant access token (cached, see token_cache)"""
+        found, token = token_cache.get(clover_merchant_id)
+        if found:
+            return token
+
+        result = (await db.execute(TOKEN_QUERY, {"clover_id": clover_merchant_id})).fetchone()
+
+        token = result[0] if result else None
+        token_cache.put(clover_merchant_id, token)
+        return token
+
+    @staticmethod
+    async def list_merchant_tokens(db: AsyncSession) -> List[Tuple[str, str]]:
+        """(clover merchant ID, access token) for every merchant with a stored token"""
+        result = (await db.execute(ALL_TOKENS_QUERY)).fetchall()
+        return [(row[0], row[1]) for row in result]
+
+    @staticmethod
+    async def get_token_record(
+        db: AsyncSession,
+        clover_merchant_id: str,
+        for_update: bool = False
+    ) -> Optional[Tuple[int, MerchantToken]]:
+        """
+        (internal merchant ID, MerchantToken row) for a Clover merchant, bypassing the token cache.
+        With for_update, the token row stays locked until the session's transaction ends.
+        """
+        query = (
+            select(Merchant.id, MerchantToken)
+            .join(MerchantToken, MerchantToken.merchant_id == Merchant.id)
+            .where(Merchant.clover_merchant_id == clover_merchant_id)
+            .limit(1)
+        )
+        if for_update:
+            query = query.with_for_update(of=MerchantToken).execution_options(populate_existing=True)
+        row = (await db.execute(query)).first()
+        return (row[0], row[1]) if row else None
+
+    @staticmethod
+    async def list_expiring_tokens(db: AsyncSession, before: datetime) -> List[str]:
+        """Clover merchant IDs whose access token expires before `before` and can be refreshed"""
+        result = await db.execute(
+            select(Merchant.clover_merchant_id)
+            .join(MerchantToken, MerchantToken.merchant_id == Merchant.id)
+            .where(
+                MerchantToken.expires_at.is_not(None),
+                MerchantToken.expires_at < before,
+                MerchantToken.refresh_token.is_not(None),
+            )
+            .order_by(MerchantToken.expires_at)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_total_merchants_count(db: AsyncSession) -> int:
+        """Get total number of merchants"""
+        return await db.scalar(text("SELECT COUNT(*) FROM merchants")) or 0
+
+    @staticmethod
+    async def store_complete_merchant_data(
+        db: AsyncSession,
+        clover_merchant_id: str,
+        merchant_data: Dict[str, Any],
+        access_token: str,
+        refresh_token: Optional[str] = None,
+        expires_at: Optional[datetime] = None,
+        refresh_token_expires_at: Optional[datetime] = None
+    ) -> int:
+        """Complete merchant storage workflow"""
+        try:
+            merchant = await AsyncMerchantHelper.get_merchant_by_clover_id(db, clover_merchant_id)
+            if merchant:
+                if merchant_data.get("name"):
+                    merchant.name = merchant_data.get("name")
+                if merchant_data.get("email"):
+                    merchant.email = merchant_data.get("email")
+            else:
+                merchant = Merchant(
+                    clover_merchant_id=clover_merchant_id,
+                    name=merchant_data.get("name"),
+                    email=merchant_data.get("email")
+                )
+                db.add(merchant)
+            await db.commit()
+            await db.refresh(merchant)
+
+            await AsyncMerchantHelper.store_or_update_token(
+                db, merchant.id, access_token, refresh_token, expires_at, refresh_token_expires_at
+            )
+            await AsyncMerchantHelper.store_or_update_merchant_details(db, clover_merchant_id, merchant_data)
+
+            return merchant.id
+
+        except Exception as e:
+            await db.rollback()
+            raise Exception(f"Failed to store merchant data: {str(e)}")
+
+        finally:
+            # Also drops a cached "no such merchant" from before the merchant existed
+            token_cache.invalidate(clover_merchant_id)
@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Cached value for "no token stored for this merchant"
+_MISSING = object()
+
+
+class MerchantTokenCache:
+    """
+    TTL cache of clover_merchant_id -> access token in front of the
+    merchant_tokens JOIN merchants lookup. Unknown merchants are cached too
+    (for a shorter time) so bad IDs don't cost a query each. It is per process:
+    writes through MerchantHelper invalidate this worker's entry, other
+    workers pick the change up when their entry expires.
+    """
+
+    def __init__(self, ttl: float = 300.0, negative_ttl: float = 30.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()  # -> (token or _MISSING, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, clover_merchant_id: str) -> Tuple[bool, Optional[str]]:
+        """(found, token); found with token None means the merchant is known to have no token"""
+        with self._lock:
+            entry = self._entries.get(clover_merchant_id)
+            if entry is None or entry[1] <= time.monotonic():
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(clover_merchant_id)
+            if entry[0] is _MISSING:
+                self.negative_hits += 1
+                return True, None
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, clover_merchant_id: str, token: Optional[str]) -> None:
+        if self.ttl <= 0:
+            return
+        ttl = self.ttl if token is not None else self.negative_ttl
+        with self._lock:
+            self._entries[clover_merchant_id] = (_MISSING if token is None else token, time.monotonic() + ttl)
+            self._entries.move_to_end(clover_merchant_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, clover_merchant_id: Optional[str] = None) -> None:
+        """Forget one merchant, or everything"""
+        with self._lock:
+            if clover_merchant_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(clover_merchant_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "ttl": self.ttl,
+                "negative_ttl": self.negative_ttl,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else None,
+            }
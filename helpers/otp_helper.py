@@ -0,0 +1,8 @@
+from sqlalchemy import select
+
+from models.otp import OTP
+
+
+def otp_lookup_query(mobile_number: str, otp_code: str):
+    """The verify-otp lookup (routers/auth.py); also EXPLAINed by database/explain_check.py"""
+    return select(OTP).where(OTP.mobile_number == mobile_number, OTP.otp_code == otp_code).limit(1)
@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.webhook import CloverChange
+
+
+class AsyncWebhookHelper:
+    """The shared log of Clover webhook events (clover_changes), for AsyncSession"""
+
+    @staticmethod
+    async def add_changes(db: AsyncSession, changes: List[CloverChange]) -> List[int]:
+        """Insert without committing (the caller does); returns the new row IDs"""
+        db.add_all(changes)
+        await db.flush()
+        return [change.id for change in changes]
+
+    @staticmethod
+    async def database_now(db: AsyncSession) -> datetime:
+        """The database's clock, which stamped created_at (so hosts' clocks don't need to agree)"""
+        return await db.scalar(select(func.now()))
+
+    @staticmethod
+    async def changes_since(db: AsyncSession, since: datetime) -> List[CloverChange]:
+        result = await db.execute(
+            select(CloverChange).where(CloverChange.created_at >= since).order_by(CloverChange.id)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def delete_changes_before(db: AsyncSession, cutoff: datetime) -> int:
+        result = await db.execute(delete(CloverChange).where(CloverChange.created_at < cutoff))
+        await db.commit()
+        return result.rowcount
@@ -1,16 +1,21 @@
-from fastapi import FastAPI, Query, HTTPException, Path, Header, Depends
+from fastapi import FastAPI, Query, HTTPException, Path, Header, Depends, Request
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from openai import OpenAI
 import os
+import asyncio
 from urllib.parse import urlencode
 import secrets
 from typing import Optional,Dict, Any
 from datetime import datetime
+from contextlib import asynccontextmanager
+from functools import partial
 import httpx
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from database.database import get_db
-from helpers.merchant_helper import MerchantHelper
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.database import get_async_db
+from helpers.merchant_helper import AsyncMerchantHelper
 from models.merchant_token import MerchantToken
 from routers import ai, auth, pizzas
 from routers.users import router as users_router
@@ -19,24 +24,153 @@ from app.routes.userCart import router as userCart
 from app.routes.clover_data import router as clover_data_router, merchant_router as clover_merchant_router
 from app.routes.cart import router as cart_router
 from app.routes.clover_cart import router as clover_cart_router
+from app.routes.clover_admin import router as clover_admin_router
+from app.routes.clover_webhooks import router as clover_webhooks_router
 from app.routes.user_preferences import router as user_preferences_router
 from app.routes import recommendations
+from services.clover_client import CloverClient, get_clover_client
+from services.circuit_breaker import CircuitOpenError
+from services.catalog_sync import run_catalog_sync_loop
+from services.catalog_index import CatalogIndex
+from services.catalog_snapshot import SnapshotStore
+from services.item_availability import ItemAvailability, run_availability_poll_loop
+from services.clover_webhooks import WebhookProcessor
+from services.catalog_warmup import CatalogWarmer
+from services.token_refresh import TokenRefresher, parse_token_response
+from services.cart_totals import CartTotalsVerifier
+from services.leader import LeaderElection
+from utils.json_response import MsgspecJSONResponse
+from utils.compression import CompressionMiddleware
+from services.clover_api import stream_all_pages
 
 from utils.merchant_extractor import (
     extract_merchant_details,
     get_merchant_summary,
     validate_merchant_response,
     extract_inventory_items,
-    extract_orders
+    extract_orders,
+    clean_order
 )
-from app.config.settings import Settings # Re-add this import
+from app.config.settings import settings # Re-add this import
 
-from database.database import Base, engine # Re-add this import
+from database.database import Base, engine, async_engine # Re-add this import
 
 # Create all tables if they don't exist
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title=Settings().APP_NAME, version=Settings().APP_VERSION)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared resources on startup and release them on shutdown"""
+    # One pooled Clover client for the whole app (keep-alive + HTTP/2)
+    app.state.clover_client = CloverClient.from_settings(settings)
+    # Expiring merchant tokens: refreshed ahead of time, and on demand when Clover answers 401
+    app.state.token_refresher = TokenRefresher(
+        refresh_ahead_seconds=settings.CLOVER_TOKEN_REFRESH_AHEAD_SECONDS,
+        interval_seconds=settings.CLOVER_TOKEN_REFRESH_INTERVAL_SECONDS,
+        concurrency=settings.CLOVER_TOKEN_REFRESH_CONCURRENCY,
+    )
+    app.state.clover_client.on_unauthorized = app.state.token_refresher.on_unauthorized
+    app.state.cart_totals_verifier = CartTotalsVerifier(
+        interval_seconds=settings.CART_TOTALS_VERIFY_INTERVAL_SECONDS,
+        repair=settings.CART_TOTALS_REPAIR,
+    )
+    # With several workers, one builds catalog snapshots and the rest mmap them
+    snapshots = None
+    if settings.CLOVER_CATALOG_SNAPSHOT_DIR:
+        snapshots = SnapshotStore(settings.CLOVER_CATALOG_SNAPSHOT_DIR, retry_seconds=settings.SCHEDULER_LEADER_RETRY_SECONDS)
+    # Category lookups for recommendations and catalog search, answered from memory
+    app.state.catalog_index = CatalogIndex(
+        refresh_seconds=settings.CLOVER_CATALOG_INDEX_REFRESH_SECONDS,
+        full_rebuild_seconds=settings.CLOVER_CATALOG_INDEX_FULL_REBUILD_SECONDS,
+        snapshots=snapshots,
+        snapshot_max_age_seconds=settings.CLOVER_CATALOG_SNAPSHOT_MAX_AGE_SECONDS,
+    )
+    # Stock levels for add-to-cart checks and the availability endpoint
+    app.state.item_availability = ItemAvailability(full_reload_seconds=settings.CLOVER_AVAILABILITY_FULL_RELOAD_SECONDS)
+    # Webhooks invalidate the above as Clover reports changes
+    app.state.webhook_processor = WebhookProcessor(
+        app.state.clover_client,
+        app.state.catalog_index,
+        app.state.item_availability,
+        debounce_seconds=settings.CLOVER_WEBHOOK_DEBOUNCE_SECONDS,
+        full_sync_hours=settings.CLOVER_CATALOG_FULL_SYNC_HOURS,
+        change_poll_seconds=settings.CLOVER_WEBHOOK_CHANGE_POLL_SECONDS,
+        change_retention_seconds=settings.CLOVER_WEBHOOK_CHANGE_RETENTION_SECONDS,
+    )
+    webhook_worker = asyncio.create_task(app.state.webhook_processor.run())
+    # Clover calls one worker; the others hear about the change through the database
+    webhook_changes = None
+    if settings.CLOVER_WEBHOOK_CHANGE_POLL_SECONDS > 0:
+        webhook_changes = asyncio.create_task(app.state.webhook_processor.run_change_poll())
+    # Warm every merchant's catalog so the first request after a deploy isn't cold
+    app.state.catalog_warmer = CatalogWarmer(
+        app.state.clover_client,
+        app.state.catalog_index,
+        app.state.item_availability,
+        interval_seconds=settings.CLOVER_WARMUP_INTERVAL_SECONDS,
+        spread_seconds=settings.CLOVER_WARMUP_SPREAD_SECONDS,
+        jitter_seconds=settings.CLOVER_WARMUP_JITTER_SECONDS,
+        concurrency=settings.CLOVER_WARMUP_CONCURRENCY,
+    )
+    # The schedulers below run in one worker only, elected through the database
+    app.state.scheduler_leader = LeaderElection(async_engine, retry_seconds=settings.SCHEDULER_LEADER_RETRY_SECONDS)
+    if settings.CLOVER_WARMUP_INTERVAL_SECONDS > 0:
+        if snapshots is None:
+            app.state.scheduler_leader.add_job(app.state.catalog_warmer.run)
+        else:
+            # The snapshot leader warms, since its warm-up writes the snapshots other workers read
+            snapshots.add_job(app.state.catalog_warmer.run)
+    snapshot_election = asyncio.create_task(snapshots.run()) if snapshots else None
+    # A refresh token can only be spent once (refreshes also lock the token row, see TokenRefresher)
+    if settings.CLOVER_TOKEN_REFRESH_INTERVAL_SECONDS > 0:
+        app.state.scheduler_leader.add_job(app.state.token_refresher.run)
+    # One worker is enough to check the shared database
+    if settings.CART_TOTALS_VERIFY_INTERVAL_SECONDS > 0:
+        app.state.scheduler_leader.add_job(app.state.cart_totals_verifier.run)
+    # Keep the local catalog mirror up to date; one worker syncing is enough (and concurrent
+    # upserts of the same rows would only collide)
+    if settings.CLOVER_CATALOG_SYNC_INTERVAL > 0:
+        app.state.scheduler_leader.add_job(partial(run_catalog_sync_loop, app.state.clover_client, settings))
+    leader_election = asyncio.create_task(app.state.scheduler_leader.run())
+
+    availability_poll = None
+    if settings.CLOVER_AVAILABILITY_POLL_SECONDS > 0:
+        availability_poll = asyncio.create_task(
+            run_availability_poll_loop(app.state.clover_client, app.state.item_availability, settings)
+        )
+    try:
+        yield
+    finally:
+        webhook_worker.cancel()
+        if webhook_changes:
+            webhook_changes.cancel()
+        if snapshot_election:
+            snapshot_election.cancel()
+        leader_election.cancel()
+        await asyncio.gather(leader_election, return_exceptions=True)  # let it stop before giving the lock up
+        await app.state.scheduler_leader.release()
+        if availability_poll:
+            availability_poll.cancel()
+        if snapshots:
+            snapshots.release()
+        await app.state.clover_client.aclose()
+        await async_engine.dispose()
+
+
+app = FastAPI(title=settings.APP_NAME, version=settings.APP_VERSION, lifespan=lifespan)
+# gzip/brotli for everything that isn't already compressed (cached catalog bodies come precompressed)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
+
+@app.exception_handler(CircuitOpenError)
+async def clover_circuit_open_handler(request: Request, exc: CircuitOpenError):
+    """Clover is failing for this merchant/endpoint and nothing is cached: tell the caller when to retry"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "merchant_id": exc.merchant_id, "endpoint": exc.endpoint},
+        headers={"Retry-After": str(max(1, int(exc.retry_in)))},
+    )
 
 # Load environment variables
 load_dotenv()
@@ -52,6 +186,10 @@ merchant_tokens: Dict[str, str] = {}
 class MerchantToken(BaseModel):
     merchant_id: str
     access_token: str
+    # Expiring OAuth tokens, as Clover's token endpoint returns them (expirations in unix seconds)
+    refresh_token: Optional[str] = None
+    access_token_expiration: Optional[int] = None
+    refresh_token_expiration: Optional[int] = None
 
 # Include routers (this connects all your route files)
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
@@ -60,6 +198,8 @@ app.include_router(clover_data_router)
 app.include_router(clover_merchant_router)
 app.include_router(cart_router)
 app.include_router(clover_cart_router)
+app.include_router(clover_admin_router)
+app.include_router(clover_webhooks_router)
 app.include_router(user_preferences_router)
 app.include_router(users_router) # This is a placeholder for your users router. Make sure the endpoints inside it don't conflict with any other routers.
 app.include_router(userCart)
@@ -70,7 +210,7 @@ def read_root():
     return {"message": "Welcome to FAST API!"}
 
 @app.get("/merchant")
-async def get_merchant_details():
+async def get_merchant_details(clover: CloverClient = Depends(get_clover_client)):
     """Get merchant details - Mobile app calls this"""
     if not CLOVER_ACCESS_TOKEN or not CLOVER_MERCHANT_ID:
         raise HTTPException(
@@ -79,55 +219,45 @@ async def get_merchant_details():
         )
 
     # Call Clover API
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{CLOVER_MERCHANT_ID}"
-    headers = {
-        "Authorization": f"Bearer {CLOVER_ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            return {
-                "success": True,
-                "data": response.json()
-            }
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Clover API error: {e.response.text}"
-            )
+    url = f"/v3/merchants/{CLOVER_MERCHANT_ID}"
+    try:
+        response = await clover.get(url, CLOVER_ACCESS_TOKEN)
+        response.raise_for_status()
+        return {
+            "success": True,
+            "data": response.json()
+        }
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Clover API error: {e.response.text}"
+        )
 
 # ... (Rest of your code is correct, no need to copy)
 
 @app.get("/merchant/properties")
-async def get_merchant_properties():
+async def get_merchant_properties(clover: CloverClient = Depends(get_clover_client)):
     """Get merchant properties"""
 
     if not CLOVER_ACCESS_TOKEN or not CLOVER_MERCHANT_ID:
         raise HTTPException(status_code=500, detail="Clover credentials not configured")
 
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{CLOVER_MERCHANT_ID}/properties"
-    headers = {
-        "Authorization": f"Bearer {CLOVER_ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
+    url = f"/v3/merchants/{CLOVER_MERCHANT_ID}/properties"
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
+    try:
+        response = await clover.get(url, CLOVER_ACCESS_TOKEN)
+        response.raise_for_status()
 
-            return {
-                "success": True,
-                "data": response.json()
-            }
+        return {
+            "success": True,
+            "data": response.json()
+        }
 
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Clover API error: {e.response.text}"
-            )
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Clover API error: {e.response.text}"
+        )
 
 
 async def store_merchant_in_db(
@@ -356,73 +486,76 @@ async def store_merchant_in_db(
 #             )
 
 @app.post("/merchants/add")
-async def add_merchant_token(merchant: MerchantToken, db: Session = Depends(get_db)):
+async def add_merchant_token(
+    merchant: MerchantToken,
+    db: AsyncSession = Depends(get_async_db),
+    clover: CloverClient = Depends(get_clover_client)
+):
     """Add a merchant and their access token with database storage"""
 
     # Test if the token works first
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{merchant.merchant_id}"
-    headers = {
-        "Authorization": f"Bearer {merchant.access_token}",
-        "Content-Type": "application/json"
-    }
-
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            merchant_data = response.json()
-
-            # DEBUG: Print the merchant data structure
-            # print("=== MERCHANT DATA DEBUG ===")
-            # print(f"Full merchant_data type: {type(merchant_data)}")
-            # print(f"Full merchant_data: {merchant_data}")
-
-            # Check each field and its type
-            for key, value in merchant_data.items():
-                print(f"Field '{key}': Type={type(value).__name__}, Value={repr(value)}")
-                if isinstance(value, dict):
-                    print(f"  -> DICT DETECTED in field '{key}': {value}")
-                elif isinstance(value, list):
-                    print(f"  -> LIST DETECTED in field '{key}': {value}")
-
-            # Validate the response
-            if not validate_merchant_response(merchant_data):
-                raise HTTPException(status_code=400, detail="Invalid merchant data received")
-
-
-            # Store in database using helper (this is where the error occurs)
-            merchant_id = MerchantHelper.store_complete_merchant_data(
-                db,
-                merchant.merchant_id,
-                merchant_data,
-                merchant.access_token
-            )
+    url = f"/v3/merchants/{merchant.merchant_id}"
+
+    try:
+        response = await clover.get(url, merchant.access_token)
+        response.raise_for_status()
+        merchant_data = response.json()
+
+        # DEBUG: Print the merchant data structure
+        # print("=== MERCHANT DATA DEBUG ===")
+        # print(f"Full merchant_data type: {type(merchant_data)}")
+        # print(f"Full merchant_data: {merchant_data}")
+
+        # Check each field and its type
+        for key, value in merchant_data.items():
+            print(f"Field '{key}': Type={type(value).__name__}, Value={repr(value)}")
+            if isinstance(value, dict):
+                print(f"  -> DICT DETECTED in field '{key}': {value}")
+            elif isinstance(value, list):
+                print(f"  -> LIST DETECTED in field '{key}': {value}")
+
+        # Validate the response
+        if not validate_merchant_response(merchant_data):
+            raise HTTPException(status_code=400, detail="Invalid merchant data received")
+
+
+        # Store in database using helper (this is where the error occurs)
+        _, refresh_token, expires_at, refresh_token_expires_at = parse_token_response(merchant.model_dump())
+        merchant_id = await AsyncMerchantHelper.store_complete_merchant_data(
+            db,
+            merchant.merchant_id,
+            merchant_data,
+            merchant.access_token,
+            refresh_token,
+            expires_at,
+            refresh_token_expires_at
+        )
 
-            # Extract clean merchant summary for response
-            summary = get_merchant_summary(merchant_data)
+        # Extract clean merchant summary for response
+        summary = get_merchant_summary(merchant_data)
 
-            # Get total merchants count
-            total_count = MerchantHelper.get_total_merchants_count(db)
+        # Get total merchants count
+        total_count = await AsyncMerchantHelper.get_total_merchants_count(db)
 
-            return {
-                "success": True,
-                "message": f"✅ Merchant {merchant.merchant_id} added successfully",
-                "merchant_info": summary,
-                "database_id": merchant_id,
-                "total_merchants": total_count
-            }
+        return {
+            "success": True,
+            "message": f"✅ Merchant {merchant.merchant_id} added successfully",
+            "merchant_info": summary,
+            "database_id": merchant_id,
+            "total_merchants": total_count
+        }
 
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid token for merchant {merchant.merchant_id}: {e.response.text}"
-            )
-        except Exception as e:
-            print(f"Full error details: {str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Database error: {str(e)}"
-            )
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid token for merchant {merchant.merchant_id}: {e.response.text}"
+        )
+    except Exception as e:
+        print(f"Full error details: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
 
 
 # @app.get("/inventory/items")
@@ -457,9 +590,9 @@ async def add_merchant_token(merchant: MerchantToken, db: Session = Depends(get_
 
 
 @app.get("/merchants/{clover_merchant_id}/token")
-async def get_merchant_token(clover_merchant_id: str, db: Session = Depends(get_db)):
+async def get_merchant_token(clover_merchant_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get merchant access token"""
-    token = MerchantHelper.get_merchant_token(db, clover_merchant_id)
+    token = await AsyncMerchantHelper.get_merchant_token(db, clover_merchant_id)
     if not token:
         raise HTTPException(status_code=404, detail="Merchant token not found")
 
@@ -476,111 +609,107 @@ async def get_merchant_token(clover_merchant_id: str, db: Session = Depends(get_
 #     return merchant_tokens[merchant_id]
 
 @app.get("/merchants/{merchant_id}")
-async def get_merchant_details_endpoint(merchant_id: str = Path(..., description="Merchant ID")):
+async def get_merchant_details_endpoint(
+    merchant_id: str = Path(..., description="Merchant ID"),
+    clover: CloverClient = Depends(get_clover_client)
+):
     """Get merchant details for specific merchant"""
 
     access_token = await get_merchant_token(merchant_id)
 
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{merchant_id}"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
+    url = f"/v3/merchants/{merchant_id}"
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            raw_data = response.json()
+    try:
+        response = await clover.get(url, access_token)
+        response.raise_for_status()
+        # Decode the raw bytes straight into typed structs
+        cleaned_data = extract_merchant_details(response.content)
 
-            # Extract only relevant merchant details using our utility function
-            cleaned_data = extract_merchant_details(raw_data)
+        return MsgspecJSONResponse({
+            "success": True,
+            "merchant_id": merchant_id,
+            "merchant_details": cleaned_data
+        })
 
-            return {
-                "success": True,
-                "merchant_id": merchant_id,
-                "merchant_details": cleaned_data
-            }
-
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Clover API error for merchant {merchant_id}: {e.response.text}"
-            )
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Clover API error for merchant {merchant_id}: {e.response.text}"
+        )
 
 @app.get("/merchants/{merchant_id}/inventory/items")
 async def get_inventory_items(
     merchant_id: str = Path(..., description="Merchant ID"),
-    limit: Optional[int] = 100
+    limit: Optional[int] = 100,
+    clover: CloverClient = Depends(get_clover_client)
 ):
     """Get inventory items for specific merchant"""
 
     access_token = get_merchant_token(merchant_id)
 
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{merchant_id}/items"
+    url = f"/v3/merchants/{merchant_id}/items"
     params = {"limit": limit}
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            raw_data = response.json()
 
-            # Extract and clean inventory data
-            cleaned_data = extract_inventory_items(raw_data)
+    try:
+        response = await clover.get(url, access_token, params=params)
+        response.raise_for_status()
+        # Extract and clean inventory data (decoded straight from the raw bytes)
+        cleaned_data = extract_inventory_items(response.content)
 
-            return {
-                "success": True,
-                "merchant_id": merchant_id,
-                "inventory": cleaned_data
-            }
+        return MsgspecJSONResponse({
+            "success": True,
+            "merchant_id": merchant_id,
+            "inventory": cleaned_data
+        })
 
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Clover API error for merchant {merchant_id}: {e.response.text}"
-            )
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Clover API error for merchant {merchant_id}: {e.response.text}"
+        )
 
 @app.get("/merchants/{merchant_id}/orders")
 async def get_orders(
     merchant_id: str = Path(..., description="Merchant ID"),
-    limit: Optional[int] = 100
+    limit: Optional[int] = 100,
+    all_pages: bool = Query(False, alias="all", description="Stream every page, using limit as the page size"),
+    clover: CloverClient = Depends(get_clover_client)
 ):
     """Get orders for specific merchant"""
 
     access_token = get_merchant_token(merchant_id)
 
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{merchant_id}/orders"
+    url = f"/v3/merchants/{merchant_id}/orders"
     params = {"limit": limit}
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            raw_data = response.json()
+    if all_pages:
+        # Streams {"success", "merchant_id", "orders": [...], "total_orders"} page by page
+        return await stream_all_pages(
+            clover, url, access_token,
+            page_size=limit,
+            key="orders",
+            envelope={"success": True, "merchant_id": merchant_id},
+            count_key="total_orders",
+            transform=clean_order
+        )
 
-            # Extract and clean orders data
-            cleaned_data = extract_orders(raw_data)
+    try:
+        response = await clover.get(url, access_token, params=params)
+        response.raise_for_status()
+        # Extract and clean orders data (decoded straight from the raw bytes)
+        cleaned_data = extract_orders(response.content)
 
-            return {
-                "success": True,
-                "merchant_id": merchant_id,
-                "orders": cleaned_data
-            }
+        return MsgspecJSONResponse({
+            "success": True,
+            "merchant_id": merchant_id,
+            "orders": cleaned_data
+        })
 
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Clover API error for merchant {merchant_id}: {e.response.text}"
-            )
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Clover API error for merchant {merchant_id}: {e.response.text}"
+        )
 
 @app.delete("/merchants/{merchant_id}")
 async def remove_merchant(merchant_id: str = Path(..., description="Merchant ID")):
@@ -602,68 +731,58 @@ if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
 @app.get("/orders")
-async def get_orders(limit: Optional[int] = 100):
+async def get_orders(limit: Optional[int] = 100, clover: CloverClient = Depends(get_clover_client)):
     """Get orders"""
 
     if not CLOVER_ACCESS_TOKEN or not CLOVER_MERCHANT_ID:
         raise HTTPException(status_code=500, detail="Clover credentials not configured")
 
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{CLOVER_MERCHANT_ID}/orders"
+    url = f"/v3/merchants/{CLOVER_MERCHANT_ID}/orders"
     params = {"limit": limit}
-    headers = {
-        "Authorization": f"Bearer {CLOVER_ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers, params=params)
-            response.raise_for_status()
+    try:
+        response = await clover.get(url, CLOVER_ACCESS_TOKEN, params=params)
+        response.raise_for_status()
 
-            return {
-                "success": True,
-                "data": response.json()
-            }
+        return {
+            "success": True,
+            "data": response.json()
+        }
 
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Clover API error: {e.response.text}"
-            )
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Clover API error: {e.response.text}"
+        )
 
 @app.post("/orders")
-async def create_order(order_data: dict):
+async def create_order(order_data: dict, clover: CloverClient = Depends(get_clover_client)):
     """Create a new Clover order"""
 
     if not CLOVER_ACCESS_TOKEN or not CLOVER_MERCHANT_ID:
         raise HTTPException(status_code=500, detail="Clover credentials not configured")
 
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{CLOVER_MERCHANT_ID}/orders"
-    headers = {
-        "Authorization": f"Bearer {CLOVER_ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
+    url = f"/v3/merchants/{CLOVER_MERCHANT_ID}/orders"
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(url, headers=headers, json=order_data)
-            response.raise_for_status()
+    try:
+        response = await clover.post(url, CLOVER_ACCESS_TOKEN, json=order_data)
+        response.raise_for_status()
 
-            return {
-                "success": True,
-                "data": response.json()
-            }
+        return {
+            "success": True,
+            "data": response.json()
+        }
 
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Clover API error: {e.response.text}"
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Clover API error: {e.response.text}"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 @app.get("/test-connection")
-async def test_clover_connection():
+async def test_clover_connection(clover: CloverClient = Depends(get_clover_client)):
     """Test if Clover connection is working"""
 
     if not CLOVER_ACCESS_TOKEN or not CLOVER_MERCHANT_ID:
@@ -677,31 +796,26 @@ async def test_clover_connection():
         }
 
     # Test connection
-    url = f"{CLOVER_BASE_URL}/v3/merchants/{CLOVER_MERCHANT_ID}"
-    headers = {
-        "Authorization": f"Bearer {CLOVER_ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
+    url = f"/v3/merchants/{CLOVER_MERCHANT_ID}"
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
+    try:
+        response = await clover.get(url, CLOVER_ACCESS_TOKEN)
+        response.raise_for_status()
 
-            return {
-                "success": True,
-                "message": "✅ Clover connection working!",
-                "merchant_id": CLOVER_MERCHANT_ID,
-                "token_status": "Valid"
-            }
+        return {
+            "success": True,
+            "message": "✅ Clover connection working!",
+            "merchant_id": CLOVER_MERCHANT_ID,
+            "token_status": "Valid"
+        }
 
-        except httpx.HTTPStatusError as e:
-            return {
-                "success": False,
-                "message": "❌ Clover connection failed",
-                "error": e.response.text,
-                "status_code": e.response.status_code
-            }
+    except httpx.HTTPStatusError as e:
+        return {
+            "success": False,
+            "message": "❌ Clover connection failed",
+            "error": e.response.text,
+            "status_code": e.response.status_code
+        }
 
 if __name__ == "__main__":
     import uvicorn
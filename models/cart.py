@@ -1,5 +1,5 @@
 # models/cart.py
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Float, Boolean, func
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Text, Float, Boolean, Index, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database.database import Base
@@ -7,6 +7,9 @@ from database.database import Base
 
 class Cart(Base):
     __tablename__ = 'carts'
+    __table_args__ = (
+        Index('ix_carts_session_status', 'session_id', 'status'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     clover_merchant_id = Column(String(64), nullable=False)
@@ -14,8 +17,10 @@ class Cart(Base):
 
     # Basic cart info
     status = Column(String(20), default="active")  # active, converted, abandoned
-    subtotal = Column(Float, default=0.0)
-    total_amount = Column(Float, default=0.0)
+
+    # Money is kept in integer cents; mutations apply deltas (see AsyncCartHelper)
+    subtotal_cents = Column(BigInteger, nullable=False, default=0, server_default="0")
+    total_cents = Column(BigInteger, nullable=False, default=0, server_default="0")
 
     # Timestamps
     created_at = Column(DateTime, server_default=func.now())
@@ -26,9 +31,20 @@ class Cart(Base):
     items = relationship("CartItem", back_populates="cart", cascade="all, delete-orphan")
     orders = relationship("Order", back_populates="cart")
 
+    @property
+    def subtotal(self) -> float:
+        return (self.subtotal_cents or 0) / 100
+
+    @property
+    def total_amount(self) -> float:
+        return (self.total_cents or 0) / 100
+
 
 class CartItem(Base):
     __tablename__ = 'cart_items'
+    __table_args__ = (
+        Index('ix_cart_items_cart_item', 'cart_id', 'clover_item_id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     cart_id = Column(Integer, ForeignKey('carts.id'), nullable=False)
@@ -38,11 +54,12 @@ class CartItem(Base):
 
     # Item details
     name = Column(String(255), nullable=False)
-    price = Column(Float, nullable=False)  # Unit price
+    price_cents = Column(Integer, nullable=False)  # Unit price
     quantity = Column(Integer, default=1)
 
     # Calculated totals
-    line_total = Column(Float, nullable=False)  # price * quantity
+    modifiers_cents = Column(Integer, nullable=False, default=0, server_default="0")  # Sum of modifier prices, per unit
+    line_total_cents = Column(Integer, nullable=False)  # price_cents * quantity
 
     # Metadata
     notes = Column(Text, nullable=True)
@@ -53,12 +70,20 @@ class CartItem(Base):
     cart = relationship("Cart", back_populates="items")
     modifiers = relationship("CartItemModifier", back_populates="cart_item", cascade="all, delete-orphan")
 
+    @property
+    def price(self) -> float:
+        return self.price_cents / 100
+
+    @property
+    def line_total(self) -> float:
+        return self.line_total_cents / 100
+
 
 class CartItemModifier(Base):
     __tablename__ = 'cart_item_modifiers'
 
     id = Column(Integer, primary_key=True, index=True)
-    cart_item_id = Column(Integer, ForeignKey('cart_items.id'), nullable=False)
+    cart_item_id = Column(Integer, ForeignKey('cart_items.id'), nullable=False, index=True)
 
     # Clover modifier details
     clover_modifier_id = Column(String(64), nullable=False)
@@ -66,7 +91,7 @@ class CartItemModifier(Base):
 
     # Modifier details
     name = Column(String(255), nullable=False)
-    price = Column(Float, default=0.0)  # Additional cost
+    price_cents = Column(Integer, nullable=False, default=0, server_default="0")  # Additional cost
 
     # Metadata
     created_at = Column(DateTime, server_default=func.now())
@@ -74,10 +99,17 @@ class CartItemModifier(Base):
     # Relationships
     cart_item = relationship("CartItem", back_populates="modifiers")
 
+    @property
+    def price(self) -> float:
+        return (self.price_cents or 0) / 100
+
 
 # Order Management Models
 class Order(Base):
     __tablename__ = 'orders'
+    __table_args__ = (
+        Index('ix_orders_merchant_created', 'clover_merchant_id', 'created_at'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     cart_id = Column(Integer, ForeignKey('carts.id'), nullable=False)
@@ -0,0 +1,127 @@
+# models/catalog.py
+"""
+Local mirror of each merchant's Clover catalog, kept up to date by
+services/catalog_sync.py. `data` holds the Clover object as received so the
+mirror can answer in Clover's own shape; the other columns are what we
+filter and sort on.
+"""
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, Boolean, Float, DateTime, JSON,
+    UniqueConstraint, Index, PrimaryKeyConstraint, func,
+)
+from database.database import Base
+
+
+class CatalogItem(Base):
+    __tablename__ = 'catalog_items'
+    __table_args__ = (
+        UniqueConstraint('merchant_id', 'clover_id', name='uq_catalog_items_merchant_item'),
+        Index('ix_catalog_items_merchant_modified', 'merchant_id', 'modified_time'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    merchant_id = Column(String(64), nullable=False)
+    clover_id = Column(String(64), nullable=False)
+    name = Column(String(255), nullable=True)
+    price = Column(BigInteger, nullable=False, default=0)  # cents, as Clover sends it
+    price_type = Column(String(32), nullable=True)
+    sku = Column(String(100), nullable=True)
+    hidden = Column(Boolean, nullable=False, default=False)
+    available = Column(Boolean, nullable=True)
+    modified_time = Column(BigInteger, nullable=True)  # Clover modifiedTime (ms)
+    data = Column(JSON, nullable=False)
+    synced_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class CatalogCategory(Base):
+    __tablename__ = 'catalog_categories'
+    __table_args__ = (
+        UniqueConstraint('merchant_id', 'clover_id', name='uq_catalog_categories_merchant_category'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    merchant_id = Column(String(64), nullable=False)
+    clover_id = Column(String(64), nullable=False)
+    name = Column(String(255), nullable=True)
+    sort_order = Column(Integer, nullable=True)
+    modified_time = Column(BigInteger, nullable=True)
+    data = Column(JSON, nullable=False)
+    synced_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class CatalogItemCategory(Base):
+    __tablename__ = 'catalog_item_categories'
+    __table_args__ = (
+        PrimaryKeyConstraint('merchant_id', 'item_id', 'category_id'),
+        Index('ix_catalog_item_categories_category', 'merchant_id', 'category_id'),
+    )
+
+    merchant_id = Column(String(64), nullable=False)
+    item_id = Column(String(64), nullable=False)
+    category_id = Column(String(64), nullable=False)
+
+
+class CatalogModifierGroup(Base):
+    __tablename__ = 'catalog_modifier_groups'
+    __table_args__ = (
+        UniqueConstraint('merchant_id', 'clover_id', name='uq_catalog_modifier_groups_merchant_group'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    merchant_id = Column(String(64), nullable=False)
+    clover_id = Column(String(64), nullable=False)
+    name = Column(String(255), nullable=True)
+    min_required = Column(Integer, nullable=True)
+    max_allowed = Column(Integer, nullable=True)
+    modified_time = Column(BigInteger, nullable=True)
+    data = Column(JSON, nullable=False)
+    synced_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class CatalogModifier(Base):
+    __tablename__ = 'catalog_modifiers'
+    __table_args__ = (
+        UniqueConstraint('merchant_id', 'clover_id', name='uq_catalog_modifiers_merchant_modifier'),
+        Index('ix_catalog_modifiers_group', 'merchant_id', 'modifier_group_id'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    merchant_id = Column(String(64), nullable=False)
+    clover_id = Column(String(64), nullable=False)
+    modifier_group_id = Column(String(64), nullable=False)
+    name = Column(String(255), nullable=True)
+    price = Column(BigInteger, nullable=False, default=0)
+    available = Column(Boolean, nullable=True)
+    data = Column(JSON, nullable=False)
+
+
+class CatalogItemStock(Base):
+    __tablename__ = 'catalog_item_stocks'
+    __table_args__ = (
+        UniqueConstraint('merchant_id', 'item_id', name='uq_catalog_item_stocks_merchant_item'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    merchant_id = Column(String(64), nullable=False)
+    item_id = Column(String(64), nullable=False)
+    stock_count = Column(BigInteger, nullable=True)
+    quantity = Column(Float, nullable=True)
+    modified_time = Column(BigInteger, nullable=True)
+    data = Column(JSON, nullable=False)
+    synced_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class CatalogSyncState(Base):
+    """Per merchant + entity sync watermark (highest Clover modifiedTime seen)"""
+    __tablename__ = 'catalog_sync_state'
+    __table_args__ = (
+        UniqueConstraint('merchant_id', 'entity', name='uq_catalog_sync_state_merchant_entity'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    merchant_id = Column(String(64), nullable=False)
+    entity = Column(String(32), nullable=False)
+    watermark = Column(BigInteger, nullable=True)
+    last_full_sync_at = Column(DateTime, nullable=True)
+    last_synced_at = Column(DateTime, nullable=True)
+    object_count = Column(Integer, nullable=True)
@@ -0,0 +1,132 @@
+"""
+Typed Clover API payloads
+
+msgspec Structs for the Clover v3 objects we read. Decoding straight from
+response bytes into these is several times faster than json.loads + walking
+dicts, and unknown fields are skipped without being materialized. Field
+names are snake_case here and camelCase on the wire.
+"""
+
+from typing import Generic, List, Optional, TypeVar
+
+import msgspec
+
+T = TypeVar("T")
+
+
+class CloverStruct(msgspec.Struct, rename="camel", omit_defaults=True):
+    """Base for Clover payloads: camelCase on the wire, missing fields default"""
+
+
+class Ref(CloverStruct):
+    """A nested {"id", "href"} reference to another Clover object"""
+    id: Optional[str] = None
+    href: Optional[str] = None
+    name: Optional[str] = None
+
+
+class Elements(CloverStruct, Generic[T]):
+    """Clover's list envelope: {"elements": [...], "href": ...}"""
+    elements: List[T] = []
+    href: Optional[str] = None
+
+
+class Category(CloverStruct):
+    id: Optional[str] = None
+    name: Optional[str] = None
+    sort_order: Optional[int] = None
+    modified_time: Optional[int] = None
+    deleted: bool = False
+
+
+class Modifier(CloverStruct):
+    id: Optional[str] = None
+    name: Optional[str] = None
+    price: int = 0
+    available: Optional[bool] = None
+    modifier_group: Optional[Ref] = None
+    modified_time: Optional[int] = None
+
+
+class ModifierGroup(CloverStruct):
+    id: Optional[str] = None
+    name: Optional[str] = None
+    min_required: Optional[int] = None
+    max_allowed: Optional[int] = None
+    show_by_default: Optional[bool] = None
+    modifiers: Optional[Elements[Modifier]] = None
+    modified_time: Optional[int] = None
+    deleted: bool = False
+
+
+class ItemStock(CloverStruct):
+    item: Optional[Ref] = None
+    stock_count: Optional[int] = None
+    quantity: Optional[float] = None
+    modified_time: Optional[int] = None
+
+
+class Item(CloverStruct):
+    id: Optional[str] = None
+    name: Optional[str] = None
+    price: int = 0
+    price_type: Optional[str] = None
+    sku: Optional[str] = None
+    code: Optional[str] = None
+    hidden: bool = False
+    available: Optional[bool] = None
+    categories: Optional[Elements[Category]] = None
+    modifier_groups: Optional[Elements[ModifierGroup]] = None
+    item_stock: Optional[ItemStock] = None
+    modified_time: Optional[int] = None
+    deleted: bool = False
+
+
+class LineItem(CloverStruct):
+    id: Optional[str] = None
+    name: Optional[str] = None
+    price: int = 0
+    unit_qty: Optional[int] = None
+    item: Optional[Ref] = None
+    modifications: Optional[Elements[Ref]] = None
+
+
+class Order(CloverStruct):
+    id: Optional[str] = None
+    state: Optional[str] = None
+    total: int = 0
+    tax_amount: int = 0
+    created_time: Optional[int] = None
+    modified_time: Optional[int] = None
+    employee: Optional[Ref] = None
+    device: Optional[Ref] = None
+    line_items: Optional[Elements[LineItem]] = None
+
+
+class Merchant(CloverStruct):
+    id: Optional[str] = None
+    name: Optional[str] = None
+    created_time: Optional[int] = None
+    merchant_plan: Optional[Ref] = None
+    reseller: Optional[Ref] = None
+    owner: Optional[Ref] = None
+    # Sub-resource links on the merchant object
+    address: Optional[Ref] = None
+    orders: Optional[Ref] = None
+    payments: Optional[Ref] = None
+    tenders: Optional[Ref] = None
+    tax_rates: Optional[Ref] = None
+    printers: Optional[Ref] = None
+    modifier_groups: Optional[Ref] = None
+    order_types: Optional[Ref] = None
+    opening_hours: Optional[Ref] = msgspec.field(default=None, name="opening_hours")
+    shifts: Optional[Ref] = None
+
+
+# Reusable decoders; build once, they cache the type's parsing plan
+merchant_decoder = msgspec.json.Decoder(Merchant)
+item_page_decoder = msgspec.json.Decoder(Elements[Item])
+category_page_decoder = msgspec.json.Decoder(Elements[Category])
+modifier_group_page_decoder = msgspec.json.Decoder(Elements[ModifierGroup])
+item_stock_page_decoder = msgspec.json.Decoder(Elements[ItemStock])
+order_page_decoder = msgspec.json.Decoder(Elements[Order])
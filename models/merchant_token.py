@@ -10,9 +10,15 @@ class MerchantToken(Base):
     __table_args__ = {'extend_existing': True}
 
     id = Column(Integer, primary_key=True, index=True)
-    merchant_id = Column(Integer, ForeignKey('merchants.id'), nullable=False)
+    merchant_id = Column(Integer, ForeignKey('merchants.id'), nullable=False, index=True)
     token = Column(Text, nullable=False)
     token_type = Column(String(100), default="api")
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Expiring OAuth tokens (NULL expires_at: the token doesn't expire); times are UTC
+    refresh_token = Column(Text, nullable=True)
+    expires_at = Column(DateTime, nullable=True, index=True)
+    refresh_token_expires_at = Column(DateTime, nullable=True)
+    refreshed_at = Column(DateTime, nullable=True)
+
     merchant = relationship("Merchant", back_populates="tokens")
@@ -0,0 +1,23 @@
+# models/webhook.py
+"""
+Clover webhook events as received, shared by every worker: the one Clover
+called records them and the others poll this table to drop what their own
+caches and indexes hold for the changed objects (see services/clover_webhooks.py).
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Index, func
+from database.database import Base
+
+
+class CloverChange(Base):
+    __tablename__ = 'clover_changes'
+    __table_args__ = (
+        Index('ix_clover_changes_created_at', 'created_at'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)  # workers apply changes in id order
+    merchant_id = Column(String(64), nullable=False)
+    object_type = Column(String(8), nullable=False)     # objectId prefix, e.g. "I"
+    object_id = Column(String(64), nullable=False)
+    type = Column(String(16), nullable=False)           # CREATE / UPDATE / DELETE
+    ts = Column(BigInteger, nullable=True)               # Clover event time (ms)
+    created_at = Column(DateTime, server_default=func.now())
@@ -100,6 +100,7 @@ from database.database import SessionLocal
 from models.user import User
 from models.user_schema import MobileLogin, OTPVerify, OTPVerifyRequest, RegisterRequest
 from models.otp import OTP
+from helpers.otp_helper import otp_lookup_query
 from datetime import datetime, timedelta
 from dependencies import get_current_user_simple as get_current_user
 from typing import Optional
@@ -142,10 +143,7 @@ def send_otp(data: MobileLogin, db: Session = Depends(get_db)):
 
 @router.post("/verify-otp")
 def verify_otp(request: OTPVerifyRequest, db: Session = Depends(get_db)):
-    otp_entry = db.query(OTP).filter(
-        OTP.mobile_number == request.mobile,
-        OTP.otp_code == request.otp
-    ).first()
+    otp_entry = db.execute(otp_lookup_query(request.mobile, request.otp)).scalars().first()
 
     if not otp_entry:
         raise HTTPException(status_code=400, detail="Invalid OTP")
@@ -0,0 +1,87 @@
+"""
+Cart totals drift check
+
+Cart mutations keep carts.subtotal_cents / total_cents (and each item's
+modifiers_cents) up to date by applying deltas, never by re-summing the cart
+(see AsyncCartHelper). Anything that writes cart rows some other way, or a bug in
+a delta, leaves them drifted for good, so CartTotalsVerifier periodically
+recomputes every active cart's totals with one aggregate query and reports
+the carts that differ. With repair on, it also resets those carts' totals
+from their rows.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+
+from database.database import AsyncSessionLocal
+from helpers.cart_helper import AsyncCartHelper
+
+
+class CartTotalsVerifier:
+    def __init__(self, interval_seconds: float = 900.0, repair: bool = False, report_limit: int = 100):
+        self.interval_seconds = interval_seconds
+        self.repair = repair
+        self.report_limit = report_limit
+        self.runs = 0
+        self.drifted_carts = 0
+        self.repaired_carts = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    async def verify(self, repair: Optional[bool] = None) -> Dict[str, Any]:
+        """One pass over the active carts; returns (and keeps) the report"""
+        repair = self.repair if repair is None else repair
+        started = time.monotonic()
+        async with AsyncSessionLocal() as db:
+            drift = await AsyncCartHelper.find_totals_drift(db)
+            if repair and drift:
+                await AsyncCartHelper.repair_totals(db, [row["cart_id"] for row in drift])
+
+        self.runs += 1
+        self.drifted_carts += len(drift)
+        if repair:
+            self.repaired_carts += len(drift)
+        for row in drift[:self.report_limit]:
+            print(
+                f"Cart {row['cart_id']} totals drifted: subtotal {row['subtotal_cents']} / total {row['total_cents']} "
+                f"cents, items add up to {row['expected_cents']} ({row['stale_items']} items with stale modifier sums)"
+            )
+
+        self.last_run = {
+            "finished_at": datetime.utcnow().isoformat(),
+            "duration_ms": round((time.monotonic() - started) * 1000, 1),
+            "drifted": len(drift),
+            "repaired": len(drift) if repair else 0,
+            "carts": drift[:self.report_limit],
+        }
+        return self.last_run
+
+    async def run(self) -> None:
+        """Background task: verify every interval"""
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.verify()
+            except Exception as e:
+                print(f"Cart totals check failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "repair": self.repair,
+            "runs": self.runs,
+            "drifted_carts": self.drifted_carts,
+            "repaired_carts": self.repaired_carts,
+            "last_run": self.last_run,
+        }
+
+
+def get_cart_totals_verifier(request: Request) -> CartTotalsVerifier:
+    """
+    Dependency that returns the app-wide CartTotalsVerifier.
+    Use with Depends(get_cart_totals_verifier) in your routes.
+    """
+    return request.app.state.cart_totals_verifier
@@ -0,0 +1,318 @@
+"""
+In-memory catalog index per merchant
+
+Maps normalized category name -> category ID -> item IDs, plus the items
+themselves, so category lookups and item details don't need Clover at all
+once a merchant's index is warm. It also carries the typeahead search index
+(services/catalog_search.py) over item names, SKUs and category names.
+
+An index older than the refresh interval is still served while a background
+task refreshes it (one per merchant at a time). Refreshes are incremental:
+categories are re-read (there are few), items only with
+modifiedTime >= the newest one seen, and applied in place. Every
+full_rebuild_seconds the index is rebuilt from scratch instead, which is what
+drops items deleted in Clover.
+
+With a SnapshotStore (several workers), the snapshot leader also writes
+every build to a snapshot file; it keeps the in-memory index for incremental
+refreshes and its warm-up keeps the files current. The other workers serve
+from the mmap'd snapshot and don't keep their own copy, as long as it is
+younger than snapshot_max_age_seconds and was built after the merchant was
+last invalidated here (e.g. by a webhook). Otherwise, say while no worker
+leads, they fall back to an index of their own, built from Clover like
+without snapshots, until a fresh snapshot appears.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+from fastapi import Request
+
+from services.catalog_search import SearchIndex, tokenize, top_matches
+from services.clover_api import iter_pages
+from services.clover_client import CloverClient
+
+if TYPE_CHECKING:
+    from services.catalog_snapshot import MerchantSnapshot, SnapshotStore
+
+INDEX_PAGE_SIZE = 1000
+
+# Field weights for search: a hit on the item's own name beats a hit on its category
+NAME_WEIGHT = 1.0
+SKU_WEIGHT = 0.9
+CATEGORY_WEIGHT = 0.6
+
+
+def normalize_name(name: Optional[str]) -> str:
+    return " ".join((name or "").split()).casefold()
+
+
+class CatalogReads:
+    """
+    Lookups shared by the in-memory index and mmap'd snapshots (services/catalog_snapshot.py).
+    Needs category_ids, category_names, category_items, item_search, category_search and item().
+    """
+
+    category_ids: Dict[str, str]
+    category_names: Dict[str, str]
+    category_items: Dict[str, List[str]]
+    item_search: SearchIndex
+    category_search: SearchIndex
+
+    def item(self, item_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def category_id(self, name: str) -> Optional[str]:
+        return self.category_ids.get(normalize_name(name))
+
+    def items_in_category(self, category_id: str) -> List[Dict[str, Any]]:
+        """Items shaped like Clover's /categories/{id}/items (no expansions)"""
+        items = []
+        for item_id in self.category_items.get(category_id, []):
+            item = self.item(item_id)
+            if item is not None:
+                items.append({k: v for k, v in item.items() if k != "categories"})
+        return items
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Visible items matching every word of the query (as a prefix, or close to it), best first"""
+        term_scores = []
+        for term in tokenize(query):
+            scores = self.item_search.match(term)
+            for category_id, score in self.category_search.match(term).items():
+                for item_id in self.category_items.get(category_id, []):
+                    if item_id in self.item_search and score > scores.get(item_id, 0.0):
+                        scores[item_id] = score
+            term_scores.append(scores)
+
+        results = []
+        for item_id, score in top_matches(term_scores, limit):
+            item = self.item(item_id) or {}
+            results.append({
+                "id": item_id,
+                "name": item.get("name"),
+                "sku": item.get("sku"),
+                "price": item.get("price"),
+                "categories": [
+                    {"id": c["id"], "name": self.category_names.get(c["id"], c.get("name"))}
+                    for c in (item.get("categories") or {}).get("elements", []) if c.get("id")
+                ],
+                "score": round(score, 3),
+            })
+        return results
+
+
+@dataclass
+class MerchantCatalogIndex(CatalogReads):
+    category_ids: Dict[str, str] = field(default_factory=dict)           # normalized name -> category ID
+    category_names: Dict[str, str] = field(default_factory=dict)         # category ID -> name
+    category_items: Dict[str, List[str]] = field(default_factory=dict)   # category ID -> item IDs
+    items: Dict[str, Dict[str, Any]] = field(default_factory=dict)       # item ID -> item (categories expanded)
+    item_search: SearchIndex = field(default_factory=SearchIndex)
+    category_search: SearchIndex = field(default_factory=SearchIndex)
+    watermark: Optional[int] = None                                      # newest item modifiedTime seen
+    built_at: float = field(default_factory=time.monotonic)
+    refreshed_at: float = field(default_factory=time.monotonic)
+
+    def age(self) -> float:
+        return time.monotonic() - self.refreshed_at
+
+    def item(self, item_id: str) -> Optional[Dict[str, Any]]:
+        return self.items.get(item_id)
+
+    # ---- incremental updates ----
+
+    def upsert_category(self, category: Dict[str, Any]) -> None:
+        category_id = category["id"]
+        old_name = self.category_names.get(category_id)
+        if old_name is not None and self.category_ids.get(normalize_name(old_name)) == category_id:
+            del self.category_ids[normalize_name(old_name)]
+        name = category.get("name") or ""
+        # First category wins on duplicate names, same as the old linear scan
+        self.category_ids.setdefault(normalize_name(name), category_id)
+        self.category_names[category_id] = name
+        self.category_items.setdefault(category_id, [])
+        self.category_search.add(category_id, [(name, CATEGORY_WEIGHT)])
+
+    def remove_category(self, category_id: str) -> None:
+        name = self.category_names.pop(category_id, None)
+        if name is not None and self.category_ids.get(normalize_name(name)) == category_id:
+            del self.category_ids[normalize_name(name)]
+        self.category_items.pop(category_id, None)
+        self.category_search.remove(category_id)
+
+    def upsert_item(self, item: Dict[str, Any]) -> None:
+        item_id = item["id"]
+        self._unlink(item_id)
+        self.items[item_id] = item
+        for category in (item.get("categories") or {}).get("elements", []):
+            if category.get("id"):
+                self.category_items.setdefault(category["id"], []).append(item_id)
+        if item.get("hidden"):
+            self.item_search.remove(item_id)
+        else:
+            self.item_search.add(item_id, [(item.get("name"), NAME_WEIGHT), (item.get("sku"), SKU_WEIGHT)])
+        modified = item.get("modifiedTime")
+        if modified and (self.watermark is None or modified > self.watermark):
+            self.watermark = modified
+
+    def remove_item(self, item_id: str) -> None:
+        self._unlink(item_id)
+        self.items.pop(item_id, None)
+        self.item_search.remove(item_id)
+
+    def _unlink(self, item_id: str) -> None:
+        old = self.items.get(item_id)
+        for category in ((old or {}).get("categories") or {}).get("elements", []):
+            linked = self.category_items.get(category.get("id"))
+            if linked and item_id in linked:
+                linked.remove(item_id)
+
+
+class CatalogIndex:
+    """Per-merchant MerchantCatalogIndex, built on first use and refreshed in the background"""
+
+    def __init__(
+        self,
+        refresh_seconds: float = 300.0,
+        full_rebuild_seconds: float = 3600.0,
+        snapshots: Optional["SnapshotStore"] = None,
+        snapshot_max_age_seconds: float = 1800.0,
+    ):
+        self.refresh_seconds = refresh_seconds
+        self.full_rebuild_seconds = full_rebuild_seconds
+        self.snapshots = snapshots
+        self.snapshot_max_age_seconds = snapshot_max_age_seconds
+        self._indexes: Dict[str, MerchantCatalogIndex] = {}
+        self._invalidated: Dict[str, float] = {}  # merchant ID -> unix time of the last invalidate()
+        self._builds: Dict[str, asyncio.Task] = {}
+        self.builds = 0
+        self.incremental_refreshes = 0
+
+    async def get(self, client: CloverClient, merchant_id: str, access_token: str) -> CatalogReads:
+        if self.snapshots is not None and not self.snapshots.is_leader:
+            snapshot = self.snapshots.open(merchant_id)
+            if snapshot is not None and self._snapshot_usable(merchant_id, snapshot):
+                self._indexes.pop(merchant_id, None)  # back on the shared snapshot; drop any fallback copy
+                return snapshot
+
+        index = self._indexes.get(merchant_id)
+        if index is None:
+            return await self._build(client, merchant_id, access_token)
+        if index.age() >= self.refresh_seconds:
+            # Serve what we have; the refresh lands when it's done
+            self._start_build(client, merchant_id, access_token)
+        return index
+
+    def peek(self, merchant_id: str) -> Optional[MerchantCatalogIndex]:
+        return self._indexes.get(merchant_id)
+
+    def is_loaded(self, merchant_id: str) -> bool:
+        """Whether this merchant has an index here or a snapshot on disk (i.e. is worth refreshing)"""
+        if merchant_id in self._indexes:
+            return True
+        return self.snapshots is not None and os.path.exists(self.snapshots.path(merchant_id))
+
+    def refresh(self, client: CloverClient, merchant_id: str, access_token: str) -> asyncio.Task:
+        """Refresh a merchant's index in the background (e.g. after a menu change); await the task to wait for it"""
+        return self._start_build(client, merchant_id, access_token)
+
+    def invalidate(self, merchant_id: str) -> None:
+        """
+        The merchant's catalog changed in Clover: stop serving snapshots built before now from this worker.
+        The in-memory index stays; refresh() brings it up to date incrementally.
+        """
+        self._invalidated[merchant_id] = time.time()
+        if self.snapshots is not None:
+            self.snapshots.forget(merchant_id)
+
+    def _snapshot_usable(self, merchant_id: str, snapshot: "MerchantSnapshot") -> bool:
+        return (
+            snapshot.age() <= self.snapshot_max_age_seconds
+            and snapshot.built_at >= self._invalidated.get(merchant_id, 0.0)
+        )
+
+    def _start_build(self, client: CloverClient, merchant_id: str, access_token: str) -> asyncio.Task:
+        task = self._builds.get(merchant_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._load(client, merchant_id, access_token))
+            self._builds[merchant_id] = task
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # don't warn about unretrieved errors
+        return task
+
+    async def _build(self, client: CloverClient, merchant_id: str, access_token: str) -> MerchantCatalogIndex:
+        return await asyncio.shield(self._start_build(client, merchant_id, access_token))
+
+    async def _load(self, client: CloverClient, merchant_id: str, access_token: str) -> MerchantCatalogIndex:
+        current = self._indexes.get(merchant_id)
+        incremental = (
+            current is not None
+            and current.watermark is not None
+            and time.monotonic() - current.built_at < self.full_rebuild_seconds
+        )
+        index = current if incremental else MerchantCatalogIndex()
+
+        seen = set()
+        async for page in iter_pages(client, f"/v3/merchants/{merchant_id}/categories", access_token, page_size=INDEX_PAGE_SIZE, cache=False):
+            for category in page:
+                if category.get("id"):
+                    seen.add(category["id"])
+                    index.upsert_category(category)
+        for category_id in set(index.category_names) - seen:
+            index.remove_category(category_id)
+
+        params = {"expand": "categories"}
+        if incremental:
+            params["filter"] = f"modifiedTime>={index.watermark}"
+        async for page in iter_pages(
+            client, f"/v3/merchants/{merchant_id}/items", access_token,
+            params=params, page_size=INDEX_PAGE_SIZE, cache=False,
+        ):
+            for item in page:
+                if item.get("id"):
+                    index.upsert_item(item)
+
+        index.refreshed_at = time.monotonic()
+        if incremental:
+            self.incremental_refreshes += 1
+        else:
+            index.built_at = index.refreshed_at
+            self._indexes[merchant_id] = index
+            self.builds += 1
+
+        if self.snapshots is not None and self.snapshots.is_leader:
+            try:
+                self.snapshots.write(merchant_id, index)
+            except OSError as e:
+                print(f"Could not write catalog snapshot for {merchant_id}: {str(e)}")
+        return index
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "builds": self.builds,
+            "incremental_refreshes": self.incremental_refreshes,
+            "refresh_seconds": self.refresh_seconds,
+            "full_rebuild_seconds": self.full_rebuild_seconds,
+            "snapshots": self.snapshots.stats() if self.snapshots is not None else None,
+            "merchants": {
+                merchant_id: {
+                    "categories": len(index.category_names),
+                    "items": len(index.items),
+                    "searchable_items": len(index.item_search),
+                    "age": round(index.age(), 1),
+                    "rebuilding": merchant_id in self._builds and not self._builds[merchant_id].done(),
+                }
+                for merchant_id, index in self._indexes.items()
+            },
+        }
+
+
+def get_catalog_index(request: Request) -> CatalogIndex:
+    """
+    Dependency that returns the app-wide CatalogIndex.
+    Use with Depends(get_catalog_index) in your routes.
+    """
+    return request.app.state.catalog_index
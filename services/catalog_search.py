@@ -0,0 +1,128 @@
+"""
+Typeahead search over a merchant's catalog
+
+SearchIndex maps tokens to documents. Prefix matches come from a sorted
+token list (bisect), typo-tolerant matches from a trigram -> token map, so a
+query only touches the tokens it could match instead of every item. Documents
+are added and removed one at a time, which is how CatalogIndex keeps it up to
+date between rebuilds.
+"""
+
+import heapq
+import re
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Score for a token match, before field weights
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.7
+FUZZY_SCORE = 0.5
+# Trigram similarity (Jaccard) below this isn't a match
+MIN_SIMILARITY = 0.4
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall((text or "").casefold())
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Prefix + trigram index of tokens -> doc ID -> field weight"""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._tokens: List[str] = []  # sorted, for prefix scans
+        self._grams: Dict[str, Set[str]] = {}
+        self._docs: Dict[str, Dict[str, float]] = {}  # doc ID -> its tokens, for removal
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._docs
+
+    def add(self, doc_id: str, fields: Iterable[Tuple[Optional[str], float]]) -> None:
+        """(Re)index a document from (text, weight) pairs; a token keeps its best weight"""
+        self.remove(doc_id)
+        tokens: Dict[str, float] = {}
+        for text, weight in fields:
+            for token in tokenize(text):
+                tokens[token] = max(tokens.get(token, 0.0), weight)
+        for token, weight in tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                insort(self._tokens, token)
+                for gram in trigrams(token):
+                    self._grams.setdefault(gram, set()).add(token)
+            postings[doc_id] = weight
+        self._docs[doc_id] = tokens
+
+    def remove(self, doc_id: str) -> None:
+        for token in self._docs.pop(doc_id, {}):
+            postings = self._postings[token]
+            postings.pop(doc_id, None)
+            if postings:
+                continue
+            del self._postings[token]
+            del self._tokens[bisect_left(self._tokens, token)]
+            for gram in trigrams(token):
+                tokens = self._grams.get(gram)
+                if tokens is not None:
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._grams[gram]
+
+    def _prefixed(self, term: str) -> Iterable[str]:
+        for i in range(bisect_left(self._tokens, term), len(self._tokens)):
+            if not self._tokens[i].startswith(term):
+                break
+            yield self._tokens[i]
+
+    def _similar(self, term: str) -> Iterable[Tuple[str, float]]:
+        grams = trigrams(term)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for token in self._grams.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        for token, count in shared.items():
+            similarity = count / (len(grams) + len(token) + 1 - count)  # padded token has len + 1 trigrams
+            if similarity >= MIN_SIMILARITY:
+                yield token, similarity
+
+    def match(self, term: str) -> Dict[str, float]:
+        """Best score per doc ID for one query term"""
+        scores: Dict[str, float] = {}
+
+        def hit(token: str, score: float) -> None:
+            for doc_id, weight in self._postings[token].items():
+                if score * weight > scores.get(doc_id, 0.0):
+                    scores[doc_id] = score * weight
+
+        for token in self._prefixed(term):
+            if token == term:
+                hit(token, EXACT_SCORE)
+            else:
+                # "mar" should rank "margherita" below an exact "mar", but above a typo match
+                hit(token, PREFIX_SCORE + (EXACT_SCORE - PREFIX_SCORE) * len(term) / len(token) / 2)
+        if len(term) >= 3:
+            for token, similarity in self._similar(term):
+                hit(token, FUZZY_SCORE * similarity)
+        return scores
+
+
+def top_matches(term_scores: List[Dict[str, float]], limit: int) -> List[Tuple[str, float]]:
+    """Docs matching every term, best summed score first (ties by doc ID, so results are stable)"""
+    if not term_scores:
+        return []
+    candidates = set(term_scores[0])
+    for scores in term_scores[1:]:
+        candidates &= scores.keys()
+    ranked = ((doc_id, sum(scores[doc_id] for scores in term_scores)) for doc_id in candidates)
+    return heapq.nsmallest(limit, ranked, key=lambda pair: (-pair[1], pair[0]))
@@ -0,0 +1,249 @@
+"""
+Memory-mapped catalog snapshots
+
+With several uvicorn workers each would otherwise hold its own copy of every
+merchant's catalog index. Instead one worker (the leader, whoever holds the
+lock file) builds the index and writes it to {dir}/{merchant_id}.snap; the
+others mmap that file read-only and decode single items out of it on demand,
+so the item bodies live once in the page cache however many workers run.
+Only the leader writes. The others keep trying for the lock every
+retry_seconds (run()), so when the leader exits another worker takes over
+and starts the leader-only jobs, i.e. the warm-up that keeps the files current.
+
+File layout (little-endian):
+
+    header   magic "CCAT", format version, reserved, snapshot version (ns),
+             built_at (unix seconds), meta offset, meta length
+    items    each item's JSON, back to back
+    meta     msgpack SnapshotMeta: categories, category -> item IDs,
+             item ID -> (offset, length), and name/SKU for search
+
+Writes go to a temp file in the same directory and are swapped in with
+os.replace, so readers see either the old file or the new one, never half a
+file. Readers notice a swap by the file's inode / mtime changing and map the
+new one; the old mapping stays valid until nothing references it.
+"""
+
+import asyncio
+import os
+import re
+import struct
+import time
+from functools import cached_property
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import mmap
+import msgspec
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every worker builds its own
+    fcntl = None
+
+from services.catalog_index import CATEGORY_WEIGHT, NAME_WEIGHT, SKU_WEIGHT, CatalogReads, MerchantCatalogIndex, normalize_name
+from services.catalog_search import SearchIndex
+
+MAGIC = b"CCAT"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHQdQQ")
+
+_FILENAME_UNSAFE = re.compile(r"[^A-Za-z0-9_-]")
+
+
+class SnapshotMeta(msgspec.Struct, array_like=True):
+    merchant_id: str
+    watermark: Optional[int]
+    categories: Dict[str, str]                        # category ID -> name, in index order
+    category_items: Dict[str, List[str]]
+    items: Dict[str, Tuple[int, int]]                 # item ID -> (offset, length) of its JSON
+    searchable: Dict[str, Tuple[Optional[str], Optional[str]]]  # visible item ID -> (name, sku)
+
+
+_meta_decoder = msgspec.msgpack.Decoder(SnapshotMeta)
+_meta_encoder = msgspec.msgpack.Encoder()
+
+
+class MerchantSnapshot(CatalogReads):
+    """Read-only view of one snapshot file; answers the same lookups as MerchantCatalogIndex"""
+
+    def __init__(self, path: str, mapping: mmap.mmap, version: int, built_at: float, meta: SnapshotMeta):
+        self.path = path
+        self._mapping = mapping
+        self.version = version
+        self.built_at = built_at
+        self.meta = meta
+        self.category_names = meta.categories
+        self.category_items = meta.category_items
+        self.category_ids: Dict[str, str] = {}
+        for category_id, name in meta.categories.items():
+            self.category_ids.setdefault(normalize_name(name), category_id)
+
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    def __len__(self) -> int:
+        return len(self.meta.items)
+
+    def item(self, item_id: str) -> Optional[Dict[str, Any]]:
+        location = self.meta.items.get(item_id)
+        if location is None:
+            return None
+        offset, length = location
+        return msgspec.json.decode(self._mapping[offset:offset + length])
+
+    # Search indexes are built per worker on first search, from names / SKUs only
+
+    @cached_property
+    def item_search(self) -> SearchIndex:
+        index = SearchIndex()
+        for item_id, (name, sku) in self.meta.searchable.items():
+            index.add(item_id, [(name, NAME_WEIGHT), (sku, SKU_WEIGHT)])
+        return index
+
+    @cached_property
+    def category_search(self) -> SearchIndex:
+        index = SearchIndex()
+        for category_id, name in self.meta.categories.items():
+            index.add(category_id, [(name, CATEGORY_WEIGHT)])
+        return index
+
+
+class SnapshotStore:
+    """Writes and maps per-merchant snapshot files in one directory"""
+
+    def __init__(self, directory: str, retry_seconds: float = 30.0):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.retry_seconds = retry_seconds
+        self.is_leader = False
+        self.elections = 0
+        self._lock_file = None
+        self._jobs: List[Callable[[], Awaitable[None]]] = []
+        self._tasks: List[asyncio.Task] = []
+        self._mapped: Dict[str, Tuple[tuple, MerchantSnapshot]] = {}
+        self.writes = 0
+        self.maps = 0
+
+    def path(self, merchant_id: str) -> str:
+        return os.path.join(self.directory, f"{_FILENAME_UNSAFE.sub('_', merchant_id)}.snap")
+
+    def acquire_leadership(self) -> bool:
+        """Try to become the worker that builds and writes snapshots; the lock is held until release()"""
+        if self.is_leader:
+            return True
+        if fcntl is None:
+            self.is_leader = True
+            return True
+        lock_file = open(os.path.join(self.directory, ".leader.lock"), "a")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self.is_leader = True
+        return True
+
+    def add_job(self, job: Callable[[], Awaitable[None]]) -> None:
+        """A background job (coroutine function) to run only while this worker is the snapshot leader"""
+        self._jobs.append(job)
+
+    async def run(self) -> None:
+        """Background task: take the lock file as soon as it's free, then start the leader-only jobs"""
+        while not self.acquire_leadership():
+            await asyncio.sleep(self.retry_seconds)
+        self.elections += 1
+        self._tasks = [asyncio.create_task(job()) for job in self._jobs]
+
+    def release(self) -> None:
+        """Stop the leader-only jobs and give the lock file up so another worker can take over"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._lock_file is not None:
+            self._lock_file.close()  # closing drops the flock
+            self._lock_file = None
+        self.is_leader = False
+
+    def write(self, merchant_id: str, index: MerchantCatalogIndex) -> int:
+        """Serialize a merchant's index and atomically replace its snapshot; returns the new version"""
+        if not self.is_leader:
+            raise RuntimeError("Only the snapshot leader writes catalog snapshots")
+        path = self.path(merchant_id)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        version = time.time_ns()
+        locations: Dict[str, Tuple[int, int]] = {}
+        searchable: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+
+        with open(tmp_path, "wb") as f:
+            f.write(b"\0" * HEADER.size)
+            offset = HEADER.size
+            for item_id, item in index.items.items():
+                data = msgspec.json.encode(item)
+                f.write(data)
+                locations[item_id] = (offset, len(data))
+                offset += len(data)
+                if item_id in index.item_search:
+                    searchable[item_id] = (item.get("name"), item.get("sku"))
+
+            meta = _meta_encoder.encode(SnapshotMeta(
+                merchant_id=merchant_id,
+                watermark=index.watermark,
+                categories=dict(index.category_names),
+                category_items={cid: list(ids) for cid, ids in index.category_items.items()},
+                items=locations,
+                searchable=searchable,
+            ))
+            f.write(meta)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, version, time.time(), offset, len(meta)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.writes += 1
+        return version
+
+    def open(self, merchant_id: str) -> Optional[MerchantSnapshot]:
+        """The merchant's current snapshot, remapped if the file was swapped since last time"""
+        path = self.path(merchant_id)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        current = self._mapped.get(merchant_id)
+        if current is not None and current[0] == (st.st_ino, st.st_mtime_ns, st.st_size):
+            return current[1]
+
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())  # the file we actually opened, in case it was swapped again
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, format_version, _, version, built_at, meta_offset, meta_length = HEADER.unpack_from(mapping, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            mapping.close()
+            print(f"Ignoring catalog snapshot {path}: unknown format")
+            return None
+
+        snapshot = MerchantSnapshot(
+            path, mapping, version, built_at,
+            _meta_decoder.decode(mapping[meta_offset:meta_offset + meta_length]),
+        )
+        self._mapped[merchant_id] = ((st.st_ino, st.st_mtime_ns, st.st_size), snapshot)
+        self.maps += 1
+        return snapshot
+
+    def forget(self, merchant_id: str) -> None:
+        """Drop this worker's mapping of a merchant's snapshot (the next open() maps the file again)"""
+        self._mapped.pop(merchant_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "is_leader": self.is_leader,
+            "elections": self.elections,
+            "writes": self.writes,
+            "maps": self.maps,
+            "mapped": {
+                merchant_id: {"version": snapshot.version, "items": len(snapshot), "age": round(snapshot.age(), 1)}
+                for merchant_id, (_, snapshot) in self._mapped.items()
+            },
+        }
@@ -0,0 +1,175 @@
+"""
+Catalog mirror sync
+
+Pulls a merchant's catalog from Clover into the catalog_* tables. The first
+run (and one every CLOVER_CATALOG_FULL_SYNC_HOURS after) is a full load that
+also drops objects Clover no longer returns; in between, items and
+categories are fetched with filter=modifiedTime>={watermark} so only what
+changed comes back. Modifier groups and item stocks are small and their
+children don't reliably bump modifiedTime, so those are always fully loaded.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config.settings import Settings
+from database.database import SessionLocal
+from helpers.catalog_helper import CatalogHelper
+from helpers.merchant_helper import MerchantHelper
+from models.catalog import CatalogCategory, CatalogItem, CatalogItemStock, CatalogModifier, CatalogModifierGroup
+from services.clover_api import iter_pages
+from services.clover_client import CloverClient
+
+SYNC_PAGE_SIZE = 1000
+
+# entity -> (Clover path suffix, extra params, incremental?)
+ENTITIES: Dict[str, tuple] = {
+    "categories": ("categories", {}, True),
+    "items": ("items", {"expand": "categories"}, True),
+    "modifier_groups": ("modifier_groups", {"expand": "modifiers"}, False),
+    "item_stocks": ("item_stocks", {}, False),
+}
+
+# Within one worker only; the background loop runs in the scheduler leader alone (see main.py)
+_locks: Dict[str, asyncio.Lock] = {}
+
+
+def _needs_full_load(db: Session, merchant_id: str, entity: str, full_sync_hours: float) -> bool:
+    state = CatalogHelper.get_sync_state(db, merchant_id, entity)
+    if not state or not state.last_full_sync_at or state.watermark is None:
+        return True
+    return datetime.utcnow() - state.last_full_sync_at >= timedelta(hours=full_sync_hours)
+
+
+def _start_entity(db: Session, merchant_id: str, entity: str, full: bool, full_sync_hours: float):
+    _, _, incremental = ENTITIES[entity]
+    full = full or not incremental or _needs_full_load(db, merchant_id, entity, full_sync_hours)
+    return full, CatalogHelper.get_or_create_sync_state(db, merchant_id, entity)
+
+
+def _store_page(db: Session, merchant_id: str, entity: str, page: list) -> set:
+    """Upsert one page and commit; returns the modifier IDs seen (modifier groups only)"""
+    modifiers_seen: set = set()
+    if entity == "categories":
+        CatalogHelper.upsert_categories(db, merchant_id, page)
+    elif entity == "items":
+        CatalogHelper.upsert_items(db, merchant_id, page)
+    elif entity == "modifier_groups":
+        modifiers_seen = CatalogHelper.upsert_modifier_groups(db, merchant_id, page)
+    else:
+        CatalogHelper.upsert_item_stocks(db, merchant_id, page)
+    db.commit()
+    return modifiers_seen
+
+
+def _finish_entity(db: Session, merchant_id: str, entity: str, state, full: bool, seen: set, modifiers_seen: set,
+                   newest: Optional[int], count: int) -> int:
+    removed = 0
+    if full:
+        if entity == "categories":
+            removed = CatalogHelper.delete_missing(db, CatalogCategory, merchant_id, seen)
+        elif entity == "items":
+            removed = CatalogHelper.delete_missing(db, CatalogItem, merchant_id, seen)
+        elif entity == "modifier_groups":
+            removed = CatalogHelper.delete_missing(db, CatalogModifierGroup, merchant_id, seen)
+            removed += CatalogHelper.delete_missing(db, CatalogModifier, merchant_id, modifiers_seen)
+        else:
+            removed = CatalogHelper.delete_missing(db, CatalogItemStock, merchant_id, seen, key_column="item_id")
+
+    CatalogHelper.mark_synced(db, state, newest, full, count)
+    db.commit()
+    return removed
+
+
+async def sync_entity(
+    client: CloverClient,
+    db: Session,
+    merchant_id: str,
+    access_token: str,
+    entity: str,
+    full: bool = False,
+    full_sync_hours: float = 24.0,
+) -> Dict[str, Any]:
+    """
+    Sync one entity; commits once per page so a long full load doesn't hold one huge transaction.
+    The (sync) database work runs in a worker thread so it doesn't block the event loop.
+    """
+    suffix, extra_params, _ = ENTITIES[entity]
+    full, state = await asyncio.to_thread(_start_entity, db, merchant_id, entity, full, full_sync_hours)
+
+    params = dict(extra_params)
+    if not full:
+        params["filter"] = f"modifiedTime>={state.watermark}"
+
+    seen: set = set()
+    modifiers_seen: set = set()
+    newest: Optional[int] = None
+    count = 0
+
+    path = f"/v3/merchants/{merchant_id}/{suffix}"
+    # Bypass the HTTP cache: sync wants current data and its big pages would only crowd it
+    async for page in iter_pages(client, path, access_token, params=params, page_size=SYNC_PAGE_SIZE, cache=False):
+        modifiers_seen |= await asyncio.to_thread(_store_page, db, merchant_id, entity, page)
+
+        for element in page:
+            key = (element.get("item") or {}).get("id") if entity == "item_stocks" else element.get("id")
+            if key:
+                seen.add(key)
+            modified = element.get("modifiedTime")
+            if modified and (newest is None or modified > newest):
+                newest = modified
+        count += len(page)
+
+    removed = await asyncio.to_thread(
+        _finish_entity, db, merchant_id, entity, state, full, seen, modifiers_seen, newest, count
+    )
+    return {"mode": "full" if full else "incremental", "fetched": count, "removed": removed, "watermark": state.watermark}
+
+
+async def sync_merchant_catalog(
+    client: CloverClient,
+    db: Session,
+    merchant_id: str,
+    access_token: str,
+    full: bool = False,
+    full_sync_hours: float = 24.0,
+    entities: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Sync every catalog entity for one merchant (or just `entities`, e.g. what a webhook named);
+    overlapping syncs of the same merchant wait for each other.
+    """
+    wanted = set(entities) if entities is not None else set(ENTITIES)
+    lock = _locks.setdefault(merchant_id, asyncio.Lock())
+    async with lock:
+        result = {}
+        for entity in [entity for entity in ENTITIES if entity in wanted]:
+            try:
+                result[entity] = await sync_entity(client, db, merchant_id, access_token, entity, full, full_sync_hours)
+            except Exception as e:
+                await asyncio.to_thread(db.rollback)
+                result[entity] = {"error": str(e)}
+        return result
+
+
+async def run_catalog_sync_loop(client: CloverClient, settings: Settings) -> None:
+    """Background task: sync every merchant with a stored token, forever (run by the scheduler leader)"""
+    while True:
+        db = SessionLocal()
+        try:
+            for merchant_id, access_token in await asyncio.to_thread(MerchantHelper.list_merchant_tokens, db):
+                result = await sync_merchant_catalog(
+                    client, db, merchant_id, access_token,
+                    full_sync_hours=settings.CLOVER_CATALOG_FULL_SYNC_HOURS,
+                )
+                errors = {entity: r["error"] for entity, r in result.items() if "error" in r}
+                if errors:
+                    print(f"Catalog sync for {merchant_id} had errors: {errors}")
+        except Exception as e:
+            print(f"Catalog sync loop error: {str(e)}")
+        finally:
+            await asyncio.to_thread(db.close)
+        await asyncio.sleep(settings.CLOVER_CATALOG_SYNC_INTERVAL)
@@ -0,0 +1,126 @@
+"""
+Catalog warm-up scheduler
+
+At startup, and every interval after, loads the in-memory catalog data
+(catalog index and item availability) for every merchant in the merchants
+table, so a merchant's first menu / search / add-to-cart after a deploy
+doesn't wait on Clover. Merchants are spread evenly over spread_seconds,
+each with up to jitter_seconds of random extra delay, and at most
+`concurrency` warm at once, so a deploy doesn't hit Clover with every
+merchant's full catalog in the same second.
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Request
+
+from database.database import AsyncSessionLocal
+from helpers.merchant_helper import AsyncMerchantHelper
+from services.catalog_index import CatalogIndex
+from services.clover_client import CloverClient
+from services.item_availability import ItemAvailability
+
+
+class CatalogWarmer:
+    def __init__(
+        self,
+        client: CloverClient,
+        catalog_index: CatalogIndex,
+        item_availability: ItemAvailability,
+        interval_seconds: float = 900.0,
+        spread_seconds: float = 60.0,
+        jitter_seconds: float = 5.0,
+        concurrency: int = 4,
+    ):
+        self.client = client
+        self.catalog_index = catalog_index
+        self.item_availability = item_availability
+        self.interval_seconds = interval_seconds
+        self.spread_seconds = spread_seconds
+        self.jitter_seconds = jitter_seconds
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.status: Dict[str, Dict[str, Any]] = {}
+        self.cycles = 0
+        self.cycle_started_at: Optional[datetime] = None
+
+    def _delays(self, count: int) -> List[float]:
+        step = self.spread_seconds / count if count else 0.0
+        return [i * step + random.uniform(0, self.jitter_seconds) for i in range(count)]
+
+    async def warm_merchant(self, merchant_id: str, access_token: str) -> Dict[str, Any]:
+        """Load / refresh one merchant's in-memory catalog data now"""
+        status = self.status.setdefault(merchant_id, {"runs": 0, "failures": 0})
+        async with self._semaphore:
+            status["state"] = "warming"
+            status["last_started_at"] = datetime.utcnow().isoformat()
+            started = time.monotonic()
+            try:
+                if self.catalog_index.peek(merchant_id) is None:
+                    await self.catalog_index.get(self.client, merchant_id, access_token)
+                else:
+                    await asyncio.shield(self.catalog_index.refresh(self.client, merchant_id, access_token))
+                await self.item_availability.poll(self.client, merchant_id, access_token)
+                status["state"] = "ok"
+                status["last_error"] = None
+                status["last_success_at"] = datetime.utcnow().isoformat()
+            except Exception as e:
+                status["state"] = "error"
+                status["failures"] += 1
+                status["last_error"] = str(e)
+            finally:
+                status["runs"] += 1
+                status["last_duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+        return status
+
+    async def _warm_later(self, delay: float, merchant_id: str, access_token: str) -> None:
+        self.status.setdefault(merchant_id, {"runs": 0, "failures": 0})["state"] = "scheduled"
+        await asyncio.sleep(delay)
+        await self.warm_merchant(merchant_id, access_token)
+
+    async def warm_all(self, merchants: List[Tuple[str, str]]) -> None:
+        """One staggered pass over (merchant ID, token) pairs"""
+        self.cycle_started_at = datetime.utcnow()
+        merchants = list(merchants)
+        random.shuffle(merchants)  # so the same merchants aren't always last
+        await asyncio.gather(*(
+            self._warm_later(delay, merchant_id, access_token)
+            for delay, (merchant_id, access_token) in zip(self._delays(len(merchants)), merchants)
+        ))
+        self.cycles += 1
+
+    async def run(self) -> None:
+        """Background task: warm every merchant at startup, then every interval"""
+        while True:
+            started = time.monotonic()
+            try:
+                async with AsyncSessionLocal() as db:
+                    merchants = await AsyncMerchantHelper.list_merchant_tokens(db)
+            except Exception as e:
+                print(f"Catalog warm-up: could not load merchants: {str(e)}")
+                merchants = []
+            await self.warm_all(merchants)
+            await asyncio.sleep(max(0.0, self.interval_seconds - (time.monotonic() - started)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cycles": self.cycles,
+            "cycle_started_at": self.cycle_started_at.isoformat() if self.cycle_started_at else None,
+            "interval_seconds": self.interval_seconds,
+            "spread_seconds": self.spread_seconds,
+            "jitter_seconds": self.jitter_seconds,
+            "concurrency": self.concurrency,
+            "merchants": self.status,
+        }
+
+
+def get_catalog_warmer(request: Request) -> CatalogWarmer:
+    """
+    Dependency that returns the app-wide CatalogWarmer.
+    Use with Depends(get_catalog_warmer) in your routes.
+    """
+    return request.app.state.catalog_warmer
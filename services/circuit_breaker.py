@@ -0,0 +1,141 @@
+"""
+Circuit breakers for Clover calls
+
+Each (merchant, endpoint) pair gets its own breaker. Once too many recent
+calls fail or run slow, the breaker opens and calls fail fast instead of
+tying up workers until the HTTP timeout; after a cool-down a single probe
+is let through to see whether Clover has recovered.
+
+The last good response for reads is kept in services.http_cache so routes
+can keep serving it (flagged as stale) while a breaker is open.
+"""
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import httpx
+
+# Header added to responses served from the cache while Clover is failing
+STALE_HEADER = "X-Clover-Stale"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Clover while a breaker is open"""
+
+    def __init__(self, merchant_id: str, endpoint: str, retry_in: float):
+        self.merchant_id = merchant_id
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        super().__init__(f"Clover circuit open for merchant {merchant_id} ({endpoint}); retry in {retry_in:.0f}s")
+
+
+class CircuitBreaker:
+    """Count-based rolling window breaker: closed -> open -> half_open -> closed"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_ratio: float = 0.5,
+        min_calls: int = 10,
+        window: int = 20,
+        slow_call_seconds: float = 3.0,
+        open_seconds: float = 30.0,
+    ):
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True = failed or slow
+        self._probe_started: Optional[float] = None
+
+    def allow_request(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self.opened_at >= self.open_seconds:
+            self.state = self.HALF_OPEN
+            self._probe_started = None
+        if self.state == self.HALF_OPEN:
+            # Let one probe through while everyone else keeps failing fast; a probe
+            # that never reported back (e.g. cancelled) is replaced after a cool-down
+            if self._probe_started is None or now - self._probe_started >= self.open_seconds:
+                self._probe_started = now
+                return True
+        return False
+
+    def retry_in(self) -> float:
+        return max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+
+    def record(self, success: bool, elapsed: float) -> None:
+        bad = not success or elapsed >= self.slow_call_seconds
+
+        if self.state == self.HALF_OPEN:
+            self._probe_started = None
+            if bad:
+                self._open()
+            else:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            return
+
+        self._outcomes.append(bad)
+        if (
+            self.state == self.CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and sum(self._outcomes) / len(self._outcomes) >= self.failure_ratio
+        ):
+            self._open()
+
+    def release(self) -> None:
+        """An admitted call ended without an outcome (e.g. cancelled): let the next one probe"""
+        if self.state == self.HALF_OPEN:
+            self._probe_started = None
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._outcomes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "recent_calls": len(self._outcomes),
+            "recent_failures": sum(self._outcomes),
+            "times_opened": self.times_opened,
+            "retry_in": round(self.retry_in(), 1) if self.state == self.OPEN else 0,
+        }
+
+
+class CircuitBreakerRegistry:
+    """Breakers keyed by (merchant ID, endpoint)"""
+
+    def __init__(self, **breaker_options):
+        self._options = breaker_options
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+    def get(self, merchant_id: str, endpoint: str) -> CircuitBreaker:
+        key = (merchant_id, endpoint)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(**self._options)
+            self._breakers[key] = breaker
+        return breaker
+
+    def stats(self, merchant_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        result: Dict[str, Dict[str, Any]] = {}
+        for (mid, endpoint), breaker in self._breakers.items():
+            if merchant_id is None or mid == merchant_id:
+                result.setdefault(mid, {})[endpoint] = breaker.stats()
+        return result
+
+
+def is_stale(response: httpx.Response) -> bool:
+    return response.headers.get(STALE_HEADER) == "true"
@@ -1,108 +1,308 @@
+import asyncio
+import json
 import httpx
+import msgspec
 from fastapi import HTTPException
-from typing import Dict, Any, List
+from fastapi.responses import Response, StreamingResponse
+from typing import Dict, Any, List, AsyncIterator, Callable, Optional, TYPE_CHECKING
 
-async def get_all_categories(merchant_id: str, access_token: str) -> List[Dict[str, Any]]:
+from services.circuit_breaker import CircuitOpenError
+from services.clover_client import CloverClient
+from services.http_cache import etag_matches
+
+if TYPE_CHECKING:
+    from services.catalog_index import CatalogIndex
+
+# Upstream headers worth passing on when proxying a Clover body untouched
+PASSTHROUGH_HEADERS = ("content-type", "content-encoding", "content-length", "etag", "x-clover-stale", "age")
+
+def _circuit_open(e: CircuitOpenError) -> HTTPException:
+    # Same answer as main.py's CircuitOpenError handler, for routes that catch exceptions themselves
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, int(e.retry_in)))})
+
+
+async def get_all_categories(client: CloverClient, merchant_id: str, access_token: str) -> List[Dict[str, Any]]:
     """
     Fetches all item categories from Clover for a given merchant.
     """
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    base_url = "https://sandbox.dev.clover.com/v3/merchants"
+    try:
+        response = await client.get(f"/v3/merchants/{merchant_id}/categories", access_token)
+        response.raise_for_status()
+        return response.json().get("elements", [])
+    except HTTPException:
+        raise
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Clover API error: {e.response.text}")
+    except CircuitOpenError as e:
+        raise _circuit_open(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(f"{base_url}/{merchant_id}/categories", headers=headers)
-            response.raise_for_status()
-            return response.json().get("elements", [])
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Clover API error: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-
-async def get_items_by_category(merchant_id: str, access_token: str, category_name: str) -> List[Dict[str, Any]]:
+async def get_items_by_category(
+    client: CloverClient,
+    merchant_id: str,
+    access_token: str,
+    category_name: str,
+    index: Optional["CatalogIndex"] = None,
+) -> List[Dict[str, Any]]:
     """
     Fetches all items from Clover belonging to a specific category.
+    With a CatalogIndex the lookup is answered from memory once the merchant is indexed.
     """
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    base_url = "https://sandbox.dev.clover.com/v3/merchants"
-
     category_id = None
-    async with httpx.AsyncClient() as client:
-        try:
-            # First, get all available categories
-            categories = await get_all_categories(merchant_id, access_token)
-            
-            # Find the ID of the category that matches the requested name
-            for category in categories:
-                if category.get("name", "").lower() == category_name.lower():
-                    category_id = category.get("id")
-                    break
-            
-            if not category_id:
-                raise HTTPException(status_code=404, detail=f"Category '{category_name}' not found.")
+    try:
+        if index:
+            merchant_index = await index.get(client, merchant_id, access_token)
+            category_id = merchant_index.category_id(category_name)
+            if category_id:
+                return merchant_index.items_in_category(category_id)
+            # Unknown name: maybe a category added since the last build, so ask Clover
+
+        # First, get all available categories
+        categories = await get_all_categories(client, merchant_id, access_token)
+
+        # Find the ID of the category that matches the requested name
+        for category in categories:
+            if category.get("name", "").lower() == category_name.lower():
+                category_id = category.get("id")
+                break
 
-            # Then, fetch all items for that specific category ID
-            item_response = await client.get(
-                f"{base_url}/{merchant_id}/categories/{category_id}/items", 
-                headers=headers
-            )
-            item_response.raise_for_status()
-            items = item_response.json().get("elements", [])
-            return items
+        if not category_id:
+            raise HTTPException(status_code=404, detail=f"Category '{category_name}' not found.")
 
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Clover API error: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+        # Then, fetch all items for that specific category ID
+        item_response = await client.get(
+            f"/v3/merchants/{merchant_id}/categories/{category_id}/items",
+            access_token
+        )
+        item_response.raise_for_status()
+        items = item_response.json().get("elements", [])
+        if index:
+            index.refresh(client, merchant_id, access_token)
+        return items
 
+    except HTTPException:
+        raise
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Clover API error: {e.response.text}")
+    except CircuitOpenError as e:
+        raise _circuit_open(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-async def get_item_details(merchant_id: str, access_token: str, item_id: str) -> Dict[str, Any]:
+
+async def get_item_details(
+    client: CloverClient,
+    merchant_id: str,
+    access_token: str,
+    item_id: str,
+    index: Optional["CatalogIndex"] = None,
+) -> Dict[str, Any]:
     """
     Fetches the details of a single item from Clover, including its category.
+    With a CatalogIndex the item is answered from memory once the merchant is indexed.
     """
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
     # To get category info, we must expand it in the request
-    url = f"https://sandbox.dev.clover.com/v3/merchants/{merchant_id}/items/{item_id}?expand=categories"
+    url = f"/v3/merchants/{merchant_id}/items/{item_id}"
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Clover API error: {e.response.text}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    try:
+        if index:
+            item = (await index.get(client, merchant_id, access_token)).item(item_id)
+            if item:
+                return item
+
+        response = await client.get(url, access_token, params={"expand": "categories"})
+        response.raise_for_status()
+        return response.json()
+    except HTTPException:
+        raise
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Clover API error: {e.response.text}")
+    except CircuitOpenError as e:
+        raise _circuit_open(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+
+async def get_item_full(client: CloverClient, merchant_id: str, access_token: str, item_id: str) -> Dict[str, Any]:
+    """
+    One item with its categories, stock and modifier groups, each group carrying its modifiers.
+    Uses expand for everything Clover embeds; modifiers it leaves out are fetched per group, concurrently.
+    """
+    base = f"/v3/merchants/{merchant_id}"
+    response = await client.get(f"{base}/items/{item_id}", access_token, params={"expand": "categories,modifierGroups,itemStock"})
+    if response.status_code >= 400:
+        raise HTTPException(status_code=response.status_code, detail=response.text)
+    item = response.json()
+
+    groups = [g for g in (item.get("modifierGroups") or {}).get("elements", []) if g.get("id")]
+    missing = [g for g in groups if "modifiers" not in g]
+
+    async def modifiers_of(group: Dict[str, Any]) -> List[Dict[str, Any]]:
+        modifiers: List[Dict[str, Any]] = []
+        async for page in iter_pages(client, f"{base}/modifier_groups/{group['id']}/modifiers", access_token, page_size=1000):
+            modifiers.extend(page)
+        return modifiers
+
+    try:
+        resolved = await asyncio.gather(*(modifiers_of(g) for g in missing))
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"Clover API error: {e.response.text}")
+    for group, modifiers in zip(missing, resolved):
+        group["modifiers"] = {"elements": modifiers}
+
+    item["modifierGroups"] = {"elements": groups}
+    return item
 
 
-async def create_clover_item(merchant_id: str, access_token: str, item_data: Dict[str, Any]) -> Dict[str, Any]:
+async def create_clover_item(client: CloverClient, merchant_id: str, access_token: str, item_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Creates a new item (product) in Clover.
     """
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    base_url = "https://sandbox.dev.clover.com/v3/merchants"
+    try:
+        response = await client.post(f"/v3/merchants/{merchant_id}/items", access_token, json=item_data)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        error_detail = e.response.json().get("message", e.response.text)
+        raise HTTPException(status_code=e.response.status_code, detail=f"Clover API error: {error_detail}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(f"{base_url}/{merchant_id}/items", headers=headers, json=item_data)
+
+async def iter_pages(
+    client: CloverClient,
+    path: str,
+    access_token: str,
+    params: Optional[Dict[str, Any]] = None,
+    page_size: int = 100,
+    offset: int = 0,
+    cache: bool = True,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Walk a Clover list endpoint page by page using limit/offset.
+
+    The request for the next page is started before the current page is
+    handed to the caller, so fetching and consuming overlap. Yields the
+    `elements` of each page and stops after the first short page.
+    Raises httpx.HTTPStatusError if Clover returns an error.
+    Pass cache=False to skip the client's HTTP cache (see CloverClient.get).
+    """
+    base_params = dict(params or {})
+
+    async def fetch(page_offset: int) -> httpx.Response:
+        return await client.get(path, access_token, params={**base_params, "limit": page_size, "offset": page_offset}, cache=cache)
+
+    next_page = asyncio.create_task(fetch(offset))
+    try:
+        while next_page is not None:
+            response = await next_page
             response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            error_detail = e.response.json().get("message", e.response.text)
-            raise HTTPException(status_code=e.response.status_code, detail=f"Clover API error: {error_detail}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+            elements = msgspec.json.decode(response.content).get("elements", [])
+
+            # Prefetch the following page while this one is being consumed
+            offset += page_size
+            next_page = asyncio.create_task(fetch(offset)) if len(elements) >= page_size else None
+
+            yield elements
+    finally:
+        if next_page is not None and not next_page.done():
+            next_page.cancel()
+
+
+async def stream_all_pages(
+    client: CloverClient,
+    path: str,
+    access_token: str,
+    params: Optional[Dict[str, Any]] = None,
+    page_size: int = 100,
+    offset: int = 0,
+    key: str = "elements",
+    envelope: Optional[Dict[str, Any]] = None,
+    count_key: Optional[str] = None,
+    transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+) -> StreamingResponse:
+    """
+    Stream every page of a Clover list endpoint as one JSON document.
+
+    The output looks like {**envelope, key: [...all elements...], count_key: n}.
+    The first page is fetched before the response starts, so a Clover error
+    still turns into a normal HTTPException.
+    """
+    pages = iter_pages(client, path, access_token, params=params, page_size=page_size, offset=offset)
+    try:
+        first_page = await pages.__anext__()
+    except StopAsyncIteration:
+        first_page = []
+    except httpx.HTTPStatusError as e:
+        await pages.aclose()
+        raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
+
+    head = json.dumps(envelope or {})[:-1]
+    head += (", " if envelope else "") + json.dumps(key) + ": ["
+
+    async def body():
+        count = 0
+        try:
+            yield head.encode()
+            page = first_page
+            while True:
+                if page:
+                    if transform:
+                        page = [transform(element) for element in page]
+                    # Encode the whole page natively and drop the list brackets
+                    chunk = msgspec.json.encode(page)[1:-1]
+                    # One write per page, as each page arrives from Clover
+                    yield (b"," if count else b"") + chunk
+                    count += len(page)
+                try:
+                    page = await pages.__anext__()
+                except StopAsyncIteration:
+                    break
+            tail = "]"
+            if count_key:
+                tail += f", {json.dumps(count_key)}: {count}"
+            yield (tail + "}").encode()
+        finally:
+            await pages.aclose()
+
+    return StreamingResponse(body(), media_type="application/json")
+
+
+async def proxy_response(
+    client: CloverClient,
+    path: str,
+    access_token: str,
+    params: Optional[Dict[str, Any]] = None,
+    accept_encoding: Optional[str] = None,
+    if_none_match: Optional[str] = None,
+) -> Response:
+    """
+    Stream a Clover GET response to our client without parsing it.
+
+    The caller's Accept-Encoding is forwarded to Clover and the raw
+    (possibly still compressed) bytes are relayed with Clover's
+    Content-Encoding, so nothing is decoded, parsed or re-serialized.
+    When the body has an ETag the caller already holds, a 304 is sent instead.
+    """
+    # Identical concurrent requests share one upstream stream (see SharedStream)
+    response = await client.stream_get(
+        path,
+        access_token,
+        params=params,
+        headers={"Accept-Encoding": accept_encoding or "identity"},
+    )
+    if response.status_code >= 400:
+        raise HTTPException(status_code=response.status_code, detail=response.text)
+
+    headers = {name: response.headers[name] for name in PASSTHROUGH_HEADERS if name in response.headers}
+    if "etag" in headers:
+        headers["cache-control"] = "no-cache"
+        if etag_matches(if_none_match, headers["etag"]):
+            for name in ("content-type", "content-encoding", "content-length"):
+                headers.pop(name, None)
+            await response.aclose()
+            return Response(status_code=304, headers=headers)
 
+    return StreamingResponse(response.aiter_raw(), status_code=response.status_code, headers=headers)
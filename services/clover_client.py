@@ -0,0 +1,377 @@
+"""
+Shared Clover HTTP client
+
+A single pooled httpx.AsyncClient is created when the app starts (see the
+lifespan handler in main.py) and handed to routes through Depends, so every
+Clover call reuses warm keep-alive connections instead of paying a new
+TCP + TLS handshake per request.
+"""
+
+import asyncio
+import random
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+from fastapi import Request
+
+from app.config.settings import Settings
+from services.circuit_breaker import CircuitBreakerRegistry, CircuitOpenError
+from services.http_cache import FRESH_ENDPOINTS, HttpCache
+from services.rate_limiter import MerchantRateLimiter, parse_retry_after
+from services.single_flight import SingleFlight, SharedStream, StreamReader
+
+_MERCHANT_PATH = re.compile(r"^/v3/merchants/([^/?]+)(?:/([^/?]+))?")
+
+
+def merchant_id_from_path(path: str) -> Optional[str]:
+    """Pull the Clover merchant ID out of a /v3/merchants/{mId}/... path"""
+    match = _MERCHANT_PATH.match(path)
+    return match.group(1) if match else None
+
+
+def endpoint_from_path(path: str) -> str:
+    """First resource under the merchant, e.g. "items" for /v3/merchants/{mId}/items/{id}"""
+    match = _MERCHANT_PATH.match(path)
+    if not match:
+        return path.split("?")[0]
+    return match.group(2) or "merchant"
+
+
+# Headers that describe the encoded body; dropped when caching an already-decoded one
+_ENCODING_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class CloverClient:
+    """Thin wrapper around a pooled httpx.AsyncClient for the Clover REST API"""
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: Optional[httpx.Timeout] = None,
+        limits: Optional[httpx.Limits] = None,
+        http2: bool = True,
+        rate_limiter: Optional[MerchantRateLimiter] = None,
+        max_retries: int = 3,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 10.0,
+        breakers: Optional[CircuitBreakerRegistry] = None,
+        cache: Optional[HttpCache] = None,
+        on_unauthorized: Optional[Callable[[str, str], Awaitable[Optional[str]]]] = None,
+        stream_buffer_bytes: int = 1024 * 1024,
+        stream_cache_max_bytes: int = 4 * 1024 * 1024,
+        stream_stall_seconds: float = 60.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.single_flight = SingleFlight()
+        self.breakers = breakers or CircuitBreakerRegistry()
+        self.cache = cache if cache is not None else HttpCache()
+        # (merchant ID, rejected token) -> token to retry a 401 with, or None (see services/token_refresh.py)
+        self.on_unauthorized = on_unauthorized
+        # How much of a shared streamed body is held for its readers, and up to what size one is cached
+        self.stream_options = {
+            "buffer_bytes": stream_buffer_bytes,
+            "body_limit": stream_cache_max_bytes,
+            "stall_timeout": stream_stall_seconds,
+        }
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout or httpx.Timeout(15.0, connect=5.0),
+            limits=limits or httpx.Limits(),
+            http2=http2,
+        )
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "CloverClient":
+        """Build a client from the CLOVER_* settings"""
+        return cls(
+            base_url=settings.CLOVER_BASE_URL,
+            timeout=httpx.Timeout(
+                settings.CLOVER_READ_TIMEOUT,
+                connect=settings.CLOVER_CONNECT_TIMEOUT,
+                pool=settings.CLOVER_POOL_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.CLOVER_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.CLOVER_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.CLOVER_KEEPALIVE_EXPIRY,
+            ),
+            http2=settings.CLOVER_HTTP2,
+            rate_limiter=MerchantRateLimiter(
+                rate=settings.CLOVER_RATE_LIMIT_PER_SECOND,
+                capacity=settings.CLOVER_RATE_LIMIT_BURST,
+            ),
+            max_retries=settings.CLOVER_MAX_RETRIES,
+            retry_base_delay=settings.CLOVER_RETRY_BASE_DELAY,
+            retry_max_delay=settings.CLOVER_RETRY_MAX_DELAY,
+            breakers=CircuitBreakerRegistry(
+                failure_ratio=settings.CLOVER_BREAKER_FAILURE_RATIO,
+                min_calls=settings.CLOVER_BREAKER_MIN_CALLS,
+                window=settings.CLOVER_BREAKER_WINDOW,
+                slow_call_seconds=settings.CLOVER_BREAKER_SLOW_CALL_SECONDS,
+                open_seconds=settings.CLOVER_BREAKER_OPEN_SECONDS,
+            ),
+            cache=HttpCache(
+                ttl=settings.CLOVER_CACHE_TTL,
+                max_entries=settings.CLOVER_CACHE_SIZE,
+                max_bytes=settings.CLOVER_CACHE_MAX_BYTES,
+            ),
+            stream_buffer_bytes=settings.CLOVER_STREAM_BUFFER_BYTES,
+            stream_cache_max_bytes=settings.CLOVER_STREAM_CACHE_MAX_BYTES,
+            stream_stall_seconds=settings.CLOVER_STREAM_STALL_SECONDS,
+        )
+
+    @staticmethod
+    def build_headers(access_token: Optional[str]) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if access_token:
+            headers["Authorization"] = f"Bearer {access_token}"
+        return headers
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        access_token: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        data: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        merchant_id: Optional[str] = None,
+        stream: bool = False,
+    ) -> httpx.Response:
+        """
+        Send a request to Clover; `path` is relative to the configured base URL.
+
+        Requests are paced by the merchant's token bucket and a 429 is retried
+        with jittered exponential backoff (or Retry-After, when Clover sends it).
+        The last response is returned as-is once retries run out.
+
+        Each call goes through the (merchant, endpoint) circuit breaker once,
+        however many attempts it makes, and reports one outcome for them:
+        5xx, transport errors and slow calls count against it, and while it is
+        open CircuitOpenError is raised right away instead of calling Clover.
+
+        A 401 for a merchant request is retried once with a refreshed token
+        when on_unauthorized is set.
+
+        With stream=True the body is left unread; the caller must close the
+        response (`await response.aclose()`) when done with it.
+        """
+        request_headers = self.build_headers(access_token)
+        if headers:
+            request_headers.update(headers)
+        merchant_id = merchant_id or merchant_id_from_path(path)
+        endpoint = endpoint_from_path(path)
+        breaker = self.breakers.get(merchant_id, endpoint) if merchant_id else None
+        # Gate once per call: retries (401 re-auth, 429 backoff) must not ask for another
+        # slot, since in half-open the probe they'd ask for is the one this call holds
+        if breaker and not breaker.allow_request():
+            raise CircuitOpenError(merchant_id, endpoint, breaker.retry_in())
+
+        recorded = False
+        try:
+            attempt = 0
+            reauthorized = False
+            while True:
+                if self.rate_limiter and merchant_id:
+                    await self.rate_limiter.acquire(merchant_id)
+
+                request = self._client.build_request(
+                    method,
+                    path,
+                    params=params,
+                    json=json,
+                    data=data,
+                    headers=request_headers,
+                )
+                started = time.monotonic()
+                try:
+                    response = await self._client.send(request, stream=stream)
+                except httpx.TransportError:
+                    if breaker:
+                        breaker.record(False, time.monotonic() - started)
+                        recorded = True
+                    raise
+                elapsed = time.monotonic() - started
+                if response.status_code == 401 and self.on_unauthorized and access_token and merchant_id and not reauthorized:
+                    reauthorized = True
+                    new_token = await self.on_unauthorized(merchant_id, access_token)
+                    if new_token:
+                        if stream:
+                            await response.aclose()
+                        access_token = new_token
+                        request_headers["Authorization"] = f"Bearer {new_token}"
+                        continue
+                if response.status_code != 429:
+                    if breaker:
+                        breaker.record(response.status_code < 500, elapsed)
+                        recorded = True
+                    return response
+
+                delay = self._retry_delay(attempt, response.headers.get("Retry-After"))
+                if self.rate_limiter and merchant_id:
+                    # Pause the whole bucket so queued requests back off as well
+                    self.rate_limiter.throttle(merchant_id, delay)
+                if attempt >= self.max_retries:
+                    # 429 is Clover pacing us, not Clover being unhealthy: it answered
+                    if breaker:
+                        breaker.record(True, elapsed)
+                        recorded = True
+                    return response
+                if stream:
+                    await response.aclose()
+                if not (self.rate_limiter and merchant_id):
+                    await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            if breaker and not recorded:
+                breaker.release()  # cancelled or failed before an outcome: free a half-open probe slot
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After"""
+        backoff = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+        server_delay = parse_retry_after(retry_after)
+        if server_delay is not None:
+            return min(self.retry_max_delay, server_delay) + backoff / 2
+        return backoff
+
+    @staticmethod
+    def _flight_key(path: str, access_token: Optional[str], params: Optional[Dict[str, Any]], *extra: Any) -> tuple:
+        """(merchant, path, params) plus the token, so different credentials never share a result"""
+        frozen_params = tuple(sorted((k, str(v)) for k, v in (params or {}).items()))
+        return (merchant_id_from_path(path), path, frozen_params, access_token) + extra
+
+    def _fresh_ttl(self, path: str) -> float:
+        return self.cache.ttl if endpoint_from_path(path) in FRESH_ENDPOINTS else 0.0
+
+    async def get(
+        self,
+        path: str,
+        access_token: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        cache: bool = True,
+    ) -> httpx.Response:
+        """
+        Cached GET with single-flight: identical concurrent reads share one upstream call.
+
+        For catalog / merchant metadata (FRESH_ENDPOINTS) a cached body younger
+        than the cache TTL is returned without calling Clover; otherwise it is
+        revalidated with its validators. If Clover is
+        down (open breaker, transport error or 5xx) the cached body is
+        returned anyway, flagged as stale.
+
+        cache=False always goes to Clover and leaves the cache untouched.
+        """
+        key = self._flight_key(path, access_token, params, cache)
+        if not cache:
+            return await self.single_flight.do(key, lambda: self.request("GET", path, access_token, params=params))
+
+        entry = self.cache.fresh(key, self._fresh_ttl(path))
+        if entry:
+            return entry.to_response()
+        entry = self.cache.lookup(key)
+        conditional = entry.conditional_headers() if entry else None
+
+        try:
+            response = await self.single_flight.do(
+                key, lambda: self.request("GET", path, access_token, params=params, headers=conditional)
+            )
+        except (CircuitOpenError, httpx.TransportError):
+            entry = self.cache.stale(key)
+            if entry is None:
+                raise
+            return entry.to_response(stale=True)
+
+        if response.status_code == 304 and entry:
+            # The entry may have been evicted or invalidated meanwhile; the copy we hold is still valid
+            return (self.cache.touch(key) or entry).to_response()
+        if response.is_success:
+            # httpx already decoded the body, so drop the headers describing the wire encoding
+            headers = httpx.Headers({k: v for k, v in response.headers.items() if k.lower() not in _ENCODING_HEADERS})
+            return self.cache.put(
+                key, response.request, response.status_code, headers, response.content,
+                merchant_id=merchant_id_from_path(path), endpoint=endpoint_from_path(path),
+            ).to_response()
+        if response.status_code >= 500:
+            entry = self.cache.stale(key)
+            if entry:
+                return entry.to_response(stale=True)
+        return response
+
+    async def stream_get(
+        self,
+        path: str,
+        access_token: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> StreamReader:
+        """
+        Streaming GET whose raw body is fanned out to identical concurrent callers.
+
+        Completed bodies (up to stream_cache_max_bytes) are cached still encoded
+        (the key includes the request headers, so Accept-Encoding variants never
+        mix) and go through the same freshness / revalidation / stale rules as get().
+        A caller that arrives after a shared stream has moved past its first
+        chunk gets its own upstream request. Close the reader if it won't be read.
+        """
+        key = self._flight_key(path, access_token, params, tuple(sorted((headers or {}).items())))
+        entry = self.cache.fresh(key, self._fresh_ttl(path))
+        if entry:
+            return SharedStream.completed(entry.status_code, entry.response_headers(), entry.content).reader()
+        entry = self.cache.lookup(key)
+        request_headers = {**(headers or {}), **(entry.conditional_headers() if entry else {})}
+
+        def remember(stream: SharedStream) -> None:
+            if 200 <= stream.status_code < 300:
+                self.cache.put(
+                    key, None, stream.status_code, stream.headers, stream.body(),
+                    merchant_id=merchant_id_from_path(path), endpoint=endpoint_from_path(path),
+                )
+
+        async def open_stream() -> SharedStream:
+            response = await self.request("GET", path, access_token, params=params, headers=request_headers, stream=True)
+            return await SharedStream.open(response, on_complete=remember, **self.stream_options)
+
+        try:
+            stream = await self.single_flight.do(key, open_stream)
+            reader = stream.reader()
+            if reader is None:
+                # Too far along to replay from the start: don't share it
+                stream = await open_stream()
+                reader = stream.reader()
+        except (CircuitOpenError, httpx.TransportError):
+            entry = self.cache.stale(key)
+            if entry is None:
+                raise
+            return SharedStream.completed(entry.status_code, entry.response_headers(stale=True), entry.content).reader()
+
+        if stream.status_code == 304 and entry:
+            await reader.aclose()
+            entry = self.cache.touch(key) or entry  # as in get()
+            return SharedStream.completed(entry.status_code, entry.response_headers(), entry.content).reader()
+        if stream.status_code >= 500:
+            entry = self.cache.stale(key)
+            if entry:
+                await reader.aclose()
+                return SharedStream.completed(entry.status_code, entry.response_headers(stale=True), entry.content).reader()
+        return reader
+
+    async def post(self, path: str, access_token: Optional[str] = None, json: Any = None) -> httpx.Response:
+        return await self.request("POST", path, access_token, json=json)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+def get_clover_client(request: Request) -> CloverClient:
+    """
+    Dependency that returns the app-wide CloverClient.
+    Use with Depends(get_clover_client) in your routes.
+    """
+    return request.app.state.clover_client
@@ -0,0 +1,353 @@
+"""
+Clover webhook handling
+
+Clover POSTs change notifications shaped like
+
+    {"appId": "...", "merchants": {"MID": [{"objectId": "I:ITEMID", "type": "UPDATE", "ts": 1537970958000}]}}
+
+where the objectId prefix says what changed (I item, IC category, IG modifier
+group, IM modifier, O order, M merchant). Every request carries the app's
+auth code in X-Clover-Auth; when a signing secret is configured we also
+expect X-Clover-Signature: t=<unix seconds>,v1=<hex HMAC-SHA256 of
+"<t>.<raw body>">, which is what fake_clover/replay_webhook.py sends.
+
+Clover calls one worker, but every worker holds its own HTTP cache, catalog
+index and availability. WebhookProcessor.receive() records the events in the
+shared clover_changes table, and each worker's run_change_poll() picks up
+the ones other workers received, so all of them end up in handle(). That
+does the cheap part inline (drop cached Clover responses, remove deleted
+objects from the in-memory indexes) and queues the affected merchant; run()
+drains the queue after a short debounce and re-fetches: an incremental
+catalog index refresh and an availability poll, each only where that
+merchant is already loaded. The catalog mirror is shared, so only the worker
+that received the webhook syncs it, and only the entities the events name.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Mapping, Optional, Set
+
+from fastapi import Request
+from sqlalchemy.orm import Session
+
+from database.database import AsyncSessionLocal, SessionLocal
+from helpers.catalog_helper import CatalogHelper
+from helpers.merchant_helper import AsyncMerchantHelper
+from helpers.webhook_helper import AsyncWebhookHelper
+from models.catalog import CatalogCategory, CatalogItem, CatalogItemStock
+from models.webhook import CloverChange
+from services.catalog_index import CatalogIndex
+from services.catalog_sync import sync_merchant_catalog
+from services.clover_client import CloverClient
+from services.item_availability import ItemAvailability
+
+AUTH_HEADER = "x-clover-auth"
+SIGNATURE_HEADER = "x-clover-signature"
+
+# objectId prefix -> cached Clover endpoints (see clover_client.endpoint_from_path) it affects
+OBJECT_ENDPOINTS: Dict[str, tuple] = {
+    "I": ("items", "item_stocks", "categories"),  # categories/{id}/items lists items too
+    "IC": ("categories", "items"),                # items are cached with expand=categories
+    "IG": ("modifier_groups", "items"),
+    "IM": ("modifier_groups",),
+    "O": ("orders",),
+    "M": ("merchant", "address", "properties"),
+}
+CATALOG_OBJECTS = {"I", "IC", "IG", "IM"}
+
+# objectId prefix -> catalog mirror entities (services/catalog_sync.ENTITIES) to resync
+OBJECT_ENTITIES: Dict[str, tuple] = {
+    "I": ("items", "item_stocks"),
+    "IC": ("categories", "items"),  # items carry their categories' names
+    "IG": ("modifier_groups",),
+    "IM": ("modifier_groups",),
+}
+
+# A change row can commit a little after its created_at; polls re-read this far back
+CHANGE_POLL_OVERLAP_SECONDS = 30.0
+
+
+class WebhookVerificationError(Exception):
+    """The request didn't come from Clover (bad auth code or signature)"""
+
+
+@dataclass
+class WebhookEvent:
+    merchant_id: str
+    object_type: str  # objectId prefix, e.g. "I"
+    object_id: str
+    type: str         # CREATE / UPDATE / DELETE
+    ts: Optional[int] = None
+
+
+def verify_webhook(
+    body: bytes,
+    headers: Mapping[str, str],
+    auth_code: Optional[str] = None,
+    signing_secret: Optional[str] = None,
+    tolerance_seconds: float = 300.0,
+) -> None:
+    """Raise WebhookVerificationError unless every configured check passes"""
+    if not auth_code and not signing_secret:
+        raise WebhookVerificationError("Webhook verification is not configured")
+
+    if auth_code and not hmac.compare_digest(headers.get(AUTH_HEADER, ""), auth_code):
+        raise WebhookVerificationError("Invalid X-Clover-Auth")
+
+    if signing_secret:
+        parts = dict(
+            part.strip().split("=", 1) for part in headers.get(SIGNATURE_HEADER, "").split(",") if "=" in part
+        )
+        try:
+            timestamp = int(parts["t"])
+            signature = parts["v1"]
+        except (KeyError, ValueError):
+            raise WebhookVerificationError("Missing or malformed X-Clover-Signature")
+        if abs(time.time() - timestamp) > tolerance_seconds:
+            raise WebhookVerificationError("Webhook timestamp outside the allowed window")
+        if not hmac.compare_digest(sign_webhook(body, signing_secret, timestamp), signature):
+            raise WebhookVerificationError("Invalid X-Clover-Signature")
+
+
+def sign_webhook(body: bytes, signing_secret: str, timestamp: int) -> str:
+    message = str(timestamp).encode() + b"." + body
+    return hmac.new(signing_secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def parse_events(payload: Dict[str, Any]) -> List[WebhookEvent]:
+    events = []
+    for merchant_id, updates in (payload.get("merchants") or {}).items():
+        for update in updates or []:
+            object_type, _, object_id = (update.get("objectId") or "").partition(":")
+            if not object_id:
+                continue
+            events.append(WebhookEvent(
+                merchant_id=merchant_id,
+                object_type=object_type,
+                object_id=object_id,
+                type=(update.get("type") or "UPDATE").upper(),
+                ts=update.get("ts"),
+            ))
+    return events
+
+
+def _apply_deletes(db: Session, merchant_id: str, deleted: List[WebhookEvent]) -> bool:
+    """Drop deleted objects from a synced mirror; False when the merchant's mirror isn't synced"""
+    if not CatalogHelper.is_synced(db, merchant_id, "items"):
+        return False
+    # An incremental sync picks up creates/updates; deletes it wouldn't see until the next full load
+    for event in deleted:
+        if event.object_type == "I":
+            CatalogHelper.delete_ids(db, CatalogItem, merchant_id, [event.object_id])
+            CatalogHelper.delete_ids(db, CatalogItemStock, merchant_id, [event.object_id], key_column="item_id")
+        else:
+            CatalogHelper.delete_ids(db, CatalogCategory, merchant_id, [event.object_id])
+    db.commit()
+    return True
+
+
+class WebhookProcessor:
+    """Turns webhook events into cache invalidations now and re-fetches shortly after"""
+
+    def __init__(
+        self,
+        client: CloverClient,
+        catalog_index: CatalogIndex,
+        item_availability: ItemAvailability,
+        debounce_seconds: float = 1.0,
+        full_sync_hours: float = 24.0,
+        change_poll_seconds: float = 2.0,
+        change_retention_seconds: float = 3600.0,
+    ):
+        self.client = client
+        self.catalog_index = catalog_index
+        self.item_availability = item_availability
+        self.debounce_seconds = debounce_seconds
+        self.full_sync_hours = full_sync_hours
+        self.change_poll_seconds = change_poll_seconds
+        self.change_retention_seconds = change_retention_seconds
+        self._pending: Dict[str, Set[str]] = {}       # merchant ID -> object types changed
+        self._mirror_pending: Dict[str, Set[str]] = {}  # same, for changes this worker received (it syncs the mirror)
+        self._deleted: Dict[str, List[WebhookEvent]] = {}
+        self._wakeup = asyncio.Event()
+        self._changes_since: Optional[datetime] = None  # database time; None until the first poll
+        self._seen_changes: Dict[int, datetime] = {}    # clover_changes IDs already handled here -> created_at
+        self._pruned_at = 0.0
+        self.counters = {
+            "requests": 0, "events": 0, "shared_events": 0, "invalidated": 0, "refreshes": 0, "errors": 0,
+        }
+        self.last_error: Optional[str] = None
+
+    async def receive(self, events: List[WebhookEvent]) -> Dict[str, Any]:
+        """Events from a verified webhook request: record them for the other workers, then handle them here"""
+        self.counters["requests"] += 1
+        if events:
+            try:
+                async with AsyncSessionLocal() as db:
+                    ids = await AsyncWebhookHelper.add_changes(db, [
+                        CloverChange(
+                            merchant_id=event.merchant_id, object_type=event.object_type,
+                            object_id=event.object_id, type=event.type, ts=event.ts,
+                        )
+                        for event in events
+                    ])
+                    # Before the commit, so this worker's own poll never sees them as new
+                    now = await AsyncWebhookHelper.database_now(db)
+                    self._seen_changes.update((change_id, now) for change_id in ids)
+                    await db.commit()
+            except Exception as e:
+                # Still handled here; the other workers' caches catch up as entries expire
+                self.counters["errors"] += 1
+                self.last_error = f"recording changes: {str(e)}"
+                print(f"Could not share webhook events with other workers: {str(e)}")
+        return self.handle(events, sync_mirror=True)
+
+    def handle(self, events: List[WebhookEvent], sync_mirror: bool = False) -> Dict[str, Any]:
+        """Invalidate now and queue re-fetches; sync_mirror for events this worker received from Clover"""
+        self.counters["events"] += len(events)
+        invalidated = 0
+        merchants: Dict[str, Set[str]] = {}
+        for event in events:
+            merchants.setdefault(event.merchant_id, set()).add(event.object_type)
+            if event.type == "DELETE":
+                self._forget(event)
+                if sync_mirror and event.object_type in ("I", "IC"):
+                    self._deleted.setdefault(event.merchant_id, []).append(event)
+
+        for merchant_id, object_types in merchants.items():
+            endpoints = {endpoint for t in object_types for endpoint in OBJECT_ENDPOINTS.get(t, ())}
+            for endpoint in endpoints:
+                invalidated += self.client.cache.invalidate(merchant_id, endpoint)
+            if object_types & CATALOG_OBJECTS:
+                # Snapshots built before this change aren't served here; the refresh below rebuilds
+                self.catalog_index.invalidate(merchant_id)
+            self._pending.setdefault(merchant_id, set()).update(object_types)
+            if sync_mirror:
+                self._mirror_pending.setdefault(merchant_id, set()).update(object_types)
+
+        self.counters["invalidated"] += invalidated
+        if merchants:
+            self._wakeup.set()
+        return {"events": len(events), "merchants": sorted(merchants), "cache_entries_invalidated": invalidated}
+
+    def _forget(self, event: WebhookEvent) -> None:
+        """Deleted objects leave the in-memory indexes right away; re-fetches would never return them"""
+        index = self.catalog_index.peek(event.merchant_id)
+        if index is not None:
+            if event.object_type == "I":
+                index.remove_item(event.object_id)
+            elif event.object_type == "IC":
+                index.remove_category(event.object_id)
+
+    async def run(self) -> None:
+        """Background task: re-fetch for queued merchants, batching bursts of webhooks"""
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.debounce_seconds)
+            self._wakeup.clear()
+            pending, self._pending = self._pending, {}
+            mirror_pending, self._mirror_pending = self._mirror_pending, {}
+            deleted, self._deleted = self._deleted, {}
+            for merchant_id, object_types in pending.items():
+                try:
+                    await self._refresh(
+                        merchant_id, object_types, mirror_pending.get(merchant_id, set()), deleted.get(merchant_id, []),
+                    )
+                    self.counters["refreshes"] += 1
+                except Exception as e:
+                    self.counters["errors"] += 1
+                    self.last_error = f"{merchant_id}: {str(e)}"
+                    print(f"Webhook refresh for {merchant_id} failed: {str(e)}")
+
+    async def run_change_poll(self) -> None:
+        """Background task: handle the webhook events other workers received"""
+        while True:
+            try:
+                await self._poll_changes()
+            except Exception as e:
+                self.counters["errors"] += 1
+                self.last_error = f"change poll: {str(e)}"
+                print(f"Webhook change poll failed: {str(e)}")
+            await asyncio.sleep(self.change_poll_seconds)
+
+    async def _poll_changes(self) -> None:
+        async with AsyncSessionLocal() as db:
+            now = await AsyncWebhookHelper.database_now(db)
+            if self._changes_since is None:
+                # Starting up: nothing is cached here yet that earlier changes could have touched
+                self._changes_since = now
+                return
+            changes = await AsyncWebhookHelper.changes_since(db, self._changes_since)
+            events = []
+            for change in changes:
+                if change.id not in self._seen_changes:
+                    self._seen_changes[change.id] = change.created_at
+                    events.append(WebhookEvent(
+                        merchant_id=change.merchant_id, object_type=change.object_type,
+                        object_id=change.object_id, type=change.type, ts=change.ts,
+                    ))
+            # Row IDs and created_at are assigned before commit, so one can show up after a higher one; look back a little
+            self._changes_since = now - timedelta(seconds=CHANGE_POLL_OVERLAP_SECONDS)
+            self._seen_changes = {
+                change_id: created_at for change_id, created_at in self._seen_changes.items()
+                if created_at >= self._changes_since
+            }
+            if events:
+                self.counters["shared_events"] += len(events)
+                self.handle(events)
+
+            if time.monotonic() - self._pruned_at >= self.change_retention_seconds:
+                self._pruned_at = time.monotonic()
+                await AsyncWebhookHelper.delete_changes_before(db, now - timedelta(seconds=self.change_retention_seconds))
+
+    async def _refresh(
+        self, merchant_id: str, object_types: Set[str], mirror_types: Set[str], deleted: List[WebhookEvent],
+    ) -> None:
+        catalog_changed = bool(object_types & CATALOG_OBJECTS)
+        if not catalog_changed:
+            return  # orders/merchant changes only needed the cache invalidation
+
+        async with AsyncSessionLocal() as adb:
+            access_token = await AsyncMerchantHelper.get_merchant_token(adb, merchant_id)
+        if not access_token:
+            return
+
+        if "I" in object_types and self.item_availability.peek(merchant_id) is not None:
+            await self.item_availability.poll(self.client, merchant_id, access_token)
+        if catalog_changed and self.catalog_index.is_loaded(merchant_id):
+            self.catalog_index.refresh(self.client, merchant_id, access_token)
+
+        entities = {entity for t in mirror_types for entity in OBJECT_ENTITIES.get(t, ())}
+        if not entities:
+            return  # another worker received these; it syncs the shared mirror
+
+        # The mirror goes through a sync session; its work runs off the event loop
+        db = SessionLocal()
+        try:
+            if await asyncio.to_thread(_apply_deletes, db, merchant_id, deleted):
+                await sync_merchant_catalog(
+                    self.client, db, merchant_id, access_token,
+                    full_sync_hours=self.full_sync_hours, entities=entities,
+                )
+        finally:
+            await asyncio.to_thread(db.close)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "pending_merchants": sorted(self._pending),
+            "change_poll_seconds": self.change_poll_seconds,
+            "last_error": self.last_error,
+        }
+
+
+def get_webhook_processor(request: Request) -> WebhookProcessor:
+    """
+    Dependency that returns the app-wide WebhookProcessor.
+    Use with Depends(get_webhook_processor) in your routes.
+    """
+    return request.app.state.webhook_processor
@@ -0,0 +1,319 @@
+"""
+HTTP cache for Clover GETs
+
+Catalog and merchant metadata change rarely, so the last good body is kept
+per request along with its validators. Within the freshness TTL it is served
+without calling Clover; after that it is revalidated with If-None-Match /
+If-Modified-Since (a 304 just refreshes the entry). The same entries back
+the stale fallback used while a circuit breaker is open.
+
+Every cached body gets an ETag (Clover's, or a hash of the body) so our own
+routes can answer the mobile app's conditional requests with a 304.
+
+Entries also keep gzip/brotli variants of their body, made the first time a
+client asks for one, so hot catalog responses aren't recompressed per request.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import httpx
+import msgspec
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.config.settings import settings
+from services.circuit_breaker import STALE_HEADER
+from utils.compression import choose_encoding, compress, precompressed, vary_accept_encoding, weak_etag
+
+
+# Endpoints whose bodies may be served from cache without revalidating within the
+# TTL. Everything else (orders, stock, ...) is always revalidated with Clover.
+FRESH_ENDPOINTS = frozenset({
+    "merchant", "address", "properties",
+    "items", "categories", "modifier_groups", "tags", "item_groups",
+})
+
+
+def make_etag(content: bytes) -> str:
+    return f'W/"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Weak comparison, which is what If-None-Match uses"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+# Set on responses rebuilt from the cache, so routes can reach the entry (and its compressed variants)
+CACHE_ENTRY_EXTENSION = "http_cache_entry"
+
+# Rough per-entry bookkeeping cost (key tuple, dataclass, header objects) on top of the body
+ENTRY_OVERHEAD_BYTES = 512
+
+
+@dataclass
+class CachedResponse:
+    request: Optional[httpx.Request]
+    status_code: int
+    headers: httpx.Headers
+    content: bytes
+    etag: str
+    merchant_id: Optional[str] = None
+    endpoint: Optional[str] = None
+    stored_at: float = field(default_factory=time.time)
+    size: int = 0
+    encoded: Dict[str, bytes] = field(default_factory=dict)  # Content-Encoding -> compressed body
+    on_grow: Optional[Callable[["CachedResponse", int], None]] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.size = (
+            len(self.content)
+            + sum(len(name) + len(value) for name, value in self.headers.raw)
+            + ENTRY_OVERHEAD_BYTES
+        )
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Validators to send when revalidating with Clover"""
+        headers = {}
+        if "etag" in self.headers:
+            headers["If-None-Match"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            headers["If-Modified-Since"] = self.headers["last-modified"]
+        return headers
+
+    def response_headers(self, stale: bool = False) -> httpx.Headers:
+        headers = httpx.Headers(self.headers)
+        headers["ETag"] = self.etag
+        headers["Age"] = str(int(self.age()))
+        if stale:
+            headers[STALE_HEADER] = "true"
+        return headers
+
+    def to_response(self, stale: bool = False) -> httpx.Response:
+        """Rebuild as an httpx.Response (only for entries stored with a decoded body)"""
+        return httpx.Response(
+            self.status_code,
+            headers=self.response_headers(stale),
+            content=self.content,
+            request=self.request,
+            extensions={CACHE_ENTRY_EXTENSION: self},
+        )
+
+    def encoded_body(self, encoding: str) -> bytes:
+        """The body compressed with encoding, made once and kept with the entry"""
+        body = self.encoded.get(encoding)
+        if body is None:
+            body = self.encoded[encoding] = compress(self.content, encoding)
+            self.size += len(body)
+            if self.on_grow:
+                self.on_grow(self, len(body))
+        return body
+
+
+@dataclass
+class CacheCounters:
+    hits: int = 0          # served fresh, no upstream call
+    revalidated: int = 0   # upstream said 304, body reused
+    misses: int = 0        # full body downloaded
+    stale_served: int = 0  # served while Clover was failing
+
+    def add(self, other: "CacheCounters") -> None:
+        self.hits += other.hits
+        self.revalidated += other.revalidated
+        self.misses += other.misses
+        self.stale_served += other.stale_served
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "stale_served": self.stale_served,
+            # A 304 still saves the body transfer, so it counts towards the ratio
+            "hit_ratio": round((self.hits + self.revalidated) / lookups, 4) if lookups else None,
+        }
+
+
+class HttpCache:
+    """
+    LRU of Clover responses with a freshness TTL, bounded by entry count and
+    by bytes held. Counters are kept per (merchant, endpoint).
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._counters: Dict[Tuple[Optional[str], Optional[str]], CacheCounters] = {}
+
+    def _count(self, merchant_id: Optional[str], endpoint: Optional[str]) -> CacheCounters:
+        counters = self._counters.get((merchant_id, endpoint))
+        if counters is None:
+            counters = self._counters[(merchant_id, endpoint)] = CacheCounters()
+        return counters
+
+    def lookup(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def fresh(self, key: Hashable, ttl: Optional[float] = None) -> Optional[CachedResponse]:
+        entry = self.lookup(key)
+        if entry is not None and entry.age() < (self.ttl if ttl is None else ttl):
+            self._count(entry.merchant_id, entry.endpoint).hits += 1
+            return entry
+        return None
+
+    def put(
+        self,
+        key: Hashable,
+        request: Optional[httpx.Request],
+        status_code: int,
+        headers: httpx.Headers,
+        content: bytes,
+        merchant_id: Optional[str] = None,
+        endpoint: Optional[str] = None,
+    ) -> CachedResponse:
+        self._count(merchant_id, endpoint).misses += 1
+        entry = CachedResponse(
+            request, status_code, headers, content,
+            headers.get("etag") or make_etag(content),
+            merchant_id=merchant_id,
+            endpoint=endpoint,
+        )
+        self._remove(key)
+        if entry.size > self.max_bytes:
+            # Too big to be worth holding; hand it back uncached
+            return entry
+
+        self._entries[key] = entry
+        self.bytes += entry.size
+        entry.on_grow = lambda grown, extra: self._grew(key, grown, extra)
+        self._evict()
+        return entry
+
+    def _grew(self, key: Hashable, entry: CachedResponse, extra: int) -> None:
+        """An entry gained a compressed variant; count it (unless the entry was already dropped)"""
+        if self._entries.get(key) is entry:
+            self.bytes += extra
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.size
+            self.evictions += 1
+
+    def touch(self, key: Hashable) -> Optional[CachedResponse]:
+        """Clover answered 304: the entry is fresh again"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.stored_at = time.time()
+            self._count(entry.merchant_id, entry.endpoint).revalidated += 1
+        return entry
+
+    def stale(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._count(entry.merchant_id, entry.endpoint).stale_served += 1
+        return entry
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def invalidate(self, merchant_id: Optional[str] = None, endpoint: Optional[str] = None) -> int:
+        """Drop a merchant's entries (optionally just one endpoint); no merchant clears everything"""
+        keys = [
+            key for key, entry in self._entries.items()
+            if (merchant_id is None or entry.merchant_id == merchant_id)
+            and (endpoint is None or entry.endpoint == endpoint)
+        ]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def stats(self, merchant_id: Optional[str] = None) -> Dict[str, Any]:
+        totals = CacheCounters()
+        merchants: Dict[str, Dict[str, Any]] = {}
+        for (mid, endpoint), counters in self._counters.items():
+            totals.add(counters)
+            if merchant_id is None or mid == merchant_id:
+                merchants.setdefault(mid or "-", {})[endpoint or "-"] = counters.as_dict()
+
+        held: Dict[str, Dict[str, int]] = {}
+        for entry in self._entries.values():
+            if merchant_id is None or entry.merchant_id == merchant_id:
+                usage = held.setdefault(entry.merchant_id or "-", {"entries": 0, "bytes": 0})
+                usage["entries"] += 1
+                usage["bytes"] += entry.size
+
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "ttl": self.ttl,
+            **totals.as_dict(),
+            "memory_by_merchant": held,
+            "by_merchant": merchants,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _cache_headers(source: httpx.Headers, etag: str) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if STALE_HEADER in source:
+        headers[STALE_HEADER] = source[STALE_HEADER]
+    return headers
+
+
+def _negotiate(request: Request, body: bytes, etag: str, entry: Optional[CachedResponse] = None) -> Tuple[bytes, Dict[str, str]]:
+    """Precompressed body + headers when the client accepts gzip/br, else the plain body"""
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    # Same threshold as CompressionMiddleware
+    if encoding is None or len(body) < settings.COMPRESSION_MINIMUM_SIZE:
+        return body, {}
+    compressed = entry.encoded_body(encoding) if entry is not None else precompressed.get(etag, body, encoding)
+    return compressed, {"Content-Encoding": encoding, "Vary": vary_accept_encoding(None), "ETag": weak_etag(etag)}
+
+
+def clover_json_response(request: Request, response: httpx.Response) -> Response:
+    """Relay a Clover JSON body as-is with an ETag, or 304 if the caller already has it"""
+    etag = response.headers.get("etag") or make_etag(response.content)
+    headers = _cache_headers(response.headers, etag)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    body, encoding_headers = _negotiate(request, response.content, etag, response.extensions.get(CACHE_ENTRY_EXTENSION))
+    return Response(content=body, media_type="application/json", headers={**headers, **encoding_headers})
+
+
+def etag_json_response(request: Request, content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """JSON response for a payload we built ourselves, tagged with a hash of its body"""
+    body = msgspec.json.encode(content)
+    etag = make_etag(body)
+    response_headers = {"ETag": etag, "Cache-Control": "no-cache", **(headers or {})}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=response_headers)
+    body, encoding_headers = _negotiate(request, body, etag)
+    return Response(content=body, media_type="application/json", headers={**response_headers, **encoding_headers})
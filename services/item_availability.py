@@ -0,0 +1,223 @@
+"""
+In-memory item availability per merchant
+
+Each merchant's item_stocks are packed into a slot per item ID, an
+array('d') of stock counts (Clover's quantity can be fractional, e.g. items
+sold by weight) and a bytearray bitmap of in-stock bits, so "which of these
+items are sold out" is a few dict lookups and bit tests. Items Clover
+doesn't track stock for have no slot and count as available.
+
+run_availability_poll_loop loads every item stock for every merchant with a
+stored token, in every worker, so requests only ever read what's in memory;
+after the first load it asks Clover only for stocks with
+modifiedTime >= the newest one seen, and reloads everything every
+full_reload_seconds to catch anything a delta missed.
+"""
+
+import asyncio
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import Request
+
+from app.config.settings import Settings
+from database.database import AsyncSessionLocal
+from helpers.merchant_helper import AsyncMerchantHelper
+from services.clover_api import iter_pages
+from services.clover_client import CloverClient
+
+AVAILABILITY_PAGE_SIZE = 1000
+
+
+class ItemUnavailableError(ValueError):
+    """Raised when an item can't be added to a cart because it's out of stock"""
+
+    def __init__(self, item_id: str, requested: int, stock_count: float):
+        self.item_id = item_id
+        self.requested = requested
+        self.stock_count = stock_count
+        super().__init__(f"Item {item_id} is out of stock (requested {requested}, {max(stock_count, 0):g} left)")
+
+
+def _stock_count(stock: Dict[str, Any]) -> float:
+    count = stock.get("stockCount")
+    if count is None:
+        count = stock.get("quantity") or 0
+    return float(count)  # not int(): 0.5 left isn't sold out
+
+
+class MerchantAvailability:
+    def __init__(self):
+        self._slots: Dict[str, int] = {}  # item ID -> slot
+        self._ids: List[str] = []         # slot -> item ID
+        self._counts = array("d")
+        self._bits = bytearray()
+        self.watermark: Optional[int] = None
+        self.loaded_at = time.monotonic()
+        self.polled_at = self.loaded_at
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _in_stock(self, slot: int) -> bool:
+        return bool(self._bits[slot >> 3] & (1 << (slot & 7)))
+
+    def update(self, stocks: Iterable[Dict[str, Any]]) -> int:
+        """Apply a page of Clover item_stocks; returns how many were applied"""
+        applied = 0
+        for stock in stocks:
+            item_id = (stock.get("item") or {}).get("id")
+            if not item_id:
+                continue
+            slot = self._slots.get(item_id)
+            if slot is None:
+                slot = self._slots[item_id] = len(self._ids)
+                self._ids.append(item_id)
+                self._counts.append(0.0)
+                if slot >> 3 >= len(self._bits):
+                    self._bits.append(0)
+            count = _stock_count(stock)
+            self._counts[slot] = count
+            if count > 0:
+                self._bits[slot >> 3] |= 1 << (slot & 7)
+            else:
+                self._bits[slot >> 3] &= ~(1 << (slot & 7)) & 0xFF
+            modified = stock.get("modifiedTime")
+            if modified and (self.watermark is None or modified > self.watermark):
+                self.watermark = modified
+            applied += 1
+        return applied
+
+    def stock_count(self, item_id: str) -> Optional[float]:
+        """Stock count, or None when Clover doesn't track stock for the item"""
+        slot = self._slots.get(item_id)
+        return None if slot is None else self._counts[slot]
+
+    def is_available(self, item_id: str, quantity: int = 1) -> bool:
+        slot = self._slots.get(item_id)
+        if slot is None:
+            return True
+        return self._in_stock(slot) and self._counts[slot] >= quantity
+
+    def sold_out(self) -> List[str]:
+        return [item_id for slot, item_id in enumerate(self._ids) if not self._in_stock(slot)]
+
+    def check(self, item_id: str, quantity: int) -> None:
+        """Raise ItemUnavailableError unless quantity of the item is in stock"""
+        if not self.is_available(item_id, quantity):
+            raise ItemUnavailableError(item_id, quantity, self.stock_count(item_id))
+
+
+class ItemAvailability:
+    """Per-merchant MerchantAvailability, loaded on first use and kept fresh by polling deltas"""
+
+    def __init__(self, full_reload_seconds: float = 3600.0):
+        self.full_reload_seconds = full_reload_seconds
+        self._merchants: Dict[str, MerchantAvailability] = {}
+        self._loads: Dict[str, asyncio.Task] = {}
+        self.polls = 0
+        self.changes = 0
+        self.unchecked = 0  # add-to-carts that skipped the stock check because the merchant wasn't loaded yet
+        self.last_error: Optional[str] = None
+
+    async def get(self, client: CloverClient, merchant_id: str, access_token: str) -> MerchantAvailability:
+        availability = self._merchants.get(merchant_id)
+        if availability is None:
+            availability = await asyncio.shield(self._start_load(client, merchant_id, access_token))
+        return availability
+
+    def peek(self, merchant_id: str) -> Optional[MerchantAvailability]:
+        return self._merchants.get(merchant_id)
+
+    def merchant_ids(self) -> List[str]:
+        return list(self._merchants)
+
+    def invalidate(self, merchant_id: str) -> None:
+        self._merchants.pop(merchant_id, None)
+
+    def _start_load(self, client: CloverClient, merchant_id: str, access_token: str) -> asyncio.Task:
+        task = self._loads.get(merchant_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._load(client, merchant_id, access_token))
+            self._loads[merchant_id] = task
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # don't warn about unretrieved errors
+        return task
+
+    async def _load(self, client: CloverClient, merchant_id: str, access_token: str) -> MerchantAvailability:
+        availability = MerchantAvailability()
+        async for page in iter_pages(
+            client, f"/v3/merchants/{merchant_id}/item_stocks", access_token,
+            page_size=AVAILABILITY_PAGE_SIZE, cache=False,
+        ):
+            availability.update(page)
+        self._merchants[merchant_id] = availability
+        return availability
+
+    async def poll(self, client: CloverClient, merchant_id: str, access_token: str) -> int:
+        """Pull stock changes since the last poll (or everything, when a full reload is due)"""
+        availability = self._merchants.get(merchant_id)
+        if availability is None or availability.watermark is None \
+                or time.monotonic() - availability.loaded_at >= self.full_reload_seconds:
+            availability = await self._start_load(client, merchant_id, access_token)
+            return len(availability)
+
+        changed = 0
+        async for page in iter_pages(
+            client, f"/v3/merchants/{merchant_id}/item_stocks", access_token,
+            params={"filter": f"modifiedTime>={availability.watermark}"},
+            page_size=AVAILABILITY_PAGE_SIZE, cache=False,
+        ):
+            changed += availability.update(page)
+        availability.polled_at = time.monotonic()
+        self.polls += 1
+        self.changes += changed
+        return changed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "polls": self.polls,
+            "changes": self.changes,
+            "full_reload_seconds": self.full_reload_seconds,
+            "unchecked": self.unchecked,
+            "last_error": self.last_error,
+            "merchants": {
+                merchant_id: {
+                    "tracked_items": len(availability),
+                    "sold_out": len(availability.sold_out()),
+                    "watermark": availability.watermark,
+                    "since_poll": round(time.monotonic() - availability.polled_at, 1),
+                }
+                for merchant_id, availability in self._merchants.items()
+            },
+        }
+
+
+async def run_availability_poll_loop(client: CloverClient, availability: ItemAvailability, settings: Settings) -> None:
+    """
+    Background task, in every worker: load every merchant's stock at startup (and any merchant
+    that gets a token later), then poll deltas, forever
+    """
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                tokens = await AsyncMerchantHelper.list_merchant_tokens(db)
+        except Exception as e:
+            availability.last_error = f"loading merchant tokens: {str(e)}"
+            print(f"Availability poll: could not load merchant tokens: {str(e)}")
+            tokens = []
+        for merchant_id, access_token in tokens:
+            try:
+                await availability.poll(client, merchant_id, access_token)
+            except Exception as e:
+                availability.last_error = f"{merchant_id}: {str(e)}"
+                print(f"Availability poll for {merchant_id} failed: {str(e)}")
+        await asyncio.sleep(settings.CLOVER_AVAILABILITY_POLL_SECONDS)
+
+
+def get_item_availability(request: Request) -> ItemAvailability:
+    """
+    Dependency that returns the app-wide ItemAvailability.
+    Use with Depends(get_item_availability) in your routes.
+    """
+    return request.app.state.item_availability
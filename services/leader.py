@@ -0,0 +1,134 @@
+"""
+Scheduler leader election
+
+Some background jobs should run in one worker only, however many uvicorn
+workers (on however many hosts) share the database: the token refresh
+scheduler, the cart totals check, the catalog mirror sync and (without
+catalog snapshots, whose own leader does it) the catalog warm-up. Workers elect
+that one with a MySQL named lock (GET_LOCK) held on a connection of its own
+for as long as the worker leads; MySQL drops the lock when that connection
+closes, so if the leader exits or dies another worker takes over at its next
+attempt.
+
+run() tries for the lock every retry_seconds while this worker isn't leader,
+and while it is, checks on the same interval that the lock is still held
+(which also keeps the idle connection from timing out). Leader-only jobs are
+started on election and cancelled if the lock is lost.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+LOCK_NAME = "bitewise_scheduler_leader"
+
+
+class LeaderElection:
+    def __init__(self, engine: AsyncEngine, name: str = LOCK_NAME, retry_seconds: float = 30.0):
+        self.engine = engine
+        self.name = name
+        self.retry_seconds = retry_seconds
+        self.is_leader = False
+        self.elections = 0
+        self.last_error: Optional[str] = None
+        self._connection: Optional[AsyncConnection] = None
+        self._jobs: List[Callable[[], Awaitable[None]]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(self, job: Callable[[], Awaitable[None]]) -> None:
+        """A background job (coroutine function) to run only while this worker is leader"""
+        self._jobs.append(job)
+
+    async def _query(self, sql: str) -> Any:
+        result = await self._connection.scalar(text(sql), {"name": self.name})
+        await self._connection.commit()  # named locks aren't transactional; don't sit in an open transaction
+        return result
+
+    async def acquire(self) -> bool:
+        """Try to take the lock without waiting; True if this worker holds it now"""
+        if self.engine.dialect.name != "mysql":
+            # No named locks to share (e.g. SQLite): only one process can use the database anyway
+            return True
+        self._connection = await self.engine.connect()
+        try:
+            if await self._query("SELECT GET_LOCK(:name, 0)") == 1:
+                return True
+        except BaseException:  # including cancellation at shutdown
+            await self._close()
+            raise
+        await self._close()
+        return False
+
+    async def _still_held(self) -> bool:
+        if self._connection is None:
+            return True
+        try:
+            return await self._query("SELECT IS_USED_LOCK(:name) = CONNECTION_ID()") == 1
+        except Exception:
+            return False  # connection gone, and the lock with it
+
+    async def _close(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                await connection.close()
+            except Exception:
+                pass
+
+    def _elected(self) -> None:
+        self.is_leader = True
+        self.elections += 1
+        self._tasks = [asyncio.create_task(job()) for job in self._jobs]
+
+    def _deposed(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self.is_leader = False
+
+    async def run(self) -> None:
+        """Background task: become leader when the lock is free, step down if it's lost"""
+        while True:
+            try:
+                if not self.is_leader:
+                    if await self.acquire():
+                        self._elected()
+                elif not await self._still_held():
+                    print("Scheduler leader: lost the leader lock; stopping leader-only jobs")
+                    self._deposed()
+                    await self._close()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Scheduler leader election failed: {str(e)}")
+            await asyncio.sleep(self.retry_seconds)
+
+    async def release(self) -> None:
+        """Stop the leader-only jobs and give the lock up so another worker can take over"""
+        self._deposed()
+        if self._connection is not None:
+            try:
+                await self._query("SELECT RELEASE_LOCK(:name)")
+            except Exception:
+                pass  # closing the connection drops it anyway
+            await self._close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lock": self.name,
+            "is_leader": self.is_leader,
+            "elections": self.elections,
+            "jobs": len(self._jobs),
+            "running_jobs": sum(not task.done() for task in self._tasks),
+            "last_error": self.last_error,
+        }
+
+
+def get_scheduler_leader(request: Request) -> LeaderElection:
+    """
+    Dependency that returns the app-wide LeaderElection.
+    Use with Depends(get_scheduler_leader) in your routes.
+    """
+    return request.app.state.scheduler_leader
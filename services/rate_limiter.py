@@ -0,0 +1,116 @@
+"""
+Per-merchant rate limiting for Clover calls
+
+Clover throttles each merchant token separately, so every merchant gets its
+own token bucket. Callers wait for a token before hitting Clover, which
+smooths bursts out instead of turning them into 429s.
+"""
+
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, up to `capacity` banked"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+        # Counters exposed through MerchantRateLimiter.stats()
+        self.waiting = 0      # requests currently queued for a token
+        self.acquired = 0     # tokens handed out
+        self.delayed = 0      # acquisitions that had to wait
+        self.throttled = 0    # 429 responses received from Clover
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a token is available, then take it"""
+        self.waiting += 1
+        try:
+            # The lock is FIFO, so queued requests are released in arrival order
+            async with self._lock:
+                self._refill()
+                if self.tokens < 1:
+                    self.delayed += 1
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+                    self._refill()
+                self.tokens -= 1
+                self.acquired += 1
+        finally:
+            self.waiting -= 1
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for `seconds` (used when Clover returns 429)"""
+        self._refill()
+        # A negative balance makes the next acquire() sleep until it is paid back
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+        self.throttled += 1
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "rate_per_second": self.rate,
+            "capacity": self.capacity,
+            "available_tokens": round(self.tokens, 2),
+            "queue_depth": self.waiting,
+            "acquired": self.acquired,
+            "delayed": self.delayed,
+            "throttled": self.throttled,
+        }
+
+
+class MerchantRateLimiter:
+    """Token buckets keyed by Clover merchant ID"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, merchant_id: str) -> TokenBucket:
+        bucket = self._buckets.get(merchant_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.capacity)
+            self._buckets[merchant_id] = bucket
+        return bucket
+
+    async def acquire(self, merchant_id: str) -> None:
+        await self.bucket(merchant_id).acquire()
+
+    def throttle(self, merchant_id: str, seconds: float) -> None:
+        self.bucket(merchant_id).pause(seconds)
+
+    def stats(self, merchant_id: Optional[str] = None) -> Dict[str, Any]:
+        """Queue depth and throttle counts, for one merchant or all of them"""
+        if merchant_id is not None:
+            bucket = self._buckets.get(merchant_id)
+            return {merchant_id: bucket.stats()} if bucket else {}
+        return {mid: bucket.stats() for mid, bucket in self._buckets.items()}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
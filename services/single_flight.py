@@ -0,0 +1,243 @@
+"""
+Single-flight request coalescing
+
+When many callers ask for the same thing at the same time (e.g. hundreds of
+phones opening one merchant's menu), only the first one goes upstream; the
+rest wait for and share its result.
+"""
+
+import asyncio
+import itertools
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+import httpx
+
+
+class SingleFlight:
+    """Run at most one in-flight call per key and share its result"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0     # calls that went upstream
+        self.shared = 0    # calls that piggy-backed on an in-flight one
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            # Run as its own task so one caller disconnecting doesn't cancel the others
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "upstream_calls": self.calls,
+            "shared_calls": self.shared,
+        }
+
+
+class StreamStalled(Exception):
+    """Nobody read a shared stream for too long; it was closed to free the upstream connection"""
+
+
+class SharedStream:
+    """
+    Fan one streaming upstream response out to any number of readers.
+
+    A background task pumps the raw bytes into a bounded window of chunks;
+    each reader (see reader()) replays the chunks it has not seen yet and
+    waits for more, so all of them stream while the upstream body is still
+    arriving. Chunks every reader has passed are dropped, and the pump waits
+    while the window holds buffer_bytes, so memory stays bounded however
+    large the body is. Once a chunk has been dropped a new reader can't
+    start from the beginning: reader() returns None and the caller has to
+    make its own request.
+
+    The whole body is also kept for on_complete (the cache) while it stays
+    within body_limit; larger bodies are not kept.
+    """
+
+    def __init__(
+        self,
+        status_code: int,
+        headers: httpx.Headers,
+        buffer_bytes: int = 1024 * 1024,
+        body_limit: int = 0,
+        stall_timeout: float = 30.0,
+    ):
+        self.status_code = status_code
+        self.headers = headers
+        self.text: Optional[str] = None
+        self.buffer_bytes = buffer_bytes
+        self.stall_timeout = stall_timeout
+        self._chunks: Deque[bytes] = deque()
+        self._base = 0          # index (in the whole body) of _chunks[0]
+        self._buffered = 0      # bytes in _chunks
+        self._readers: Dict[int, int] = {}  # reader id -> index of its next chunk
+        self._reader_ids = itertools.count()
+        self._retain = False    # a completed body: never dropped, any number of readers
+        self._body: Optional[List[bytes]] = [] if body_limit > 0 else None
+        self._body_size = 0
+        self._body_limit = body_limit
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+        self._space = asyncio.Event()
+        self._pump: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def open(
+        cls,
+        response: httpx.Response,
+        on_complete: Optional[Callable[["SharedStream"], None]] = None,
+        **options: Any,
+    ) -> "SharedStream":
+        """
+        Wrap a response opened with stream=True; error bodies are read up front.
+        `on_complete` is called once a successful body within body_limit has been fully received.
+        """
+        stream = cls(response.status_code, response.headers, **options)
+        if response.status_code >= 400:
+            await response.aread()
+            await response.aclose()
+            stream.text = response.text
+            stream._done = True
+        else:
+            stream._pump = asyncio.create_task(stream._run(response, on_complete))
+        return stream
+
+    @classmethod
+    def completed(cls, status_code: int, headers: httpx.Headers, content: bytes) -> "SharedStream":
+        """A stream over a body we already have (e.g. a cached one)"""
+        stream = cls(status_code, headers)
+        stream._chunks.append(content)
+        stream._body = [content]
+        stream._retain = True
+        stream._done = True
+        if status_code >= 400:
+            stream.text = content.decode("utf-8", errors="replace")
+        return stream
+
+    def body(self) -> bytes:
+        """The whole body; only available while it was within body_limit"""
+        if self._body is None:
+            raise ValueError("body was larger than body_limit and wasn't kept")
+        return b"".join(self._body)
+
+    def reader(self) -> Optional["StreamReader"]:
+        """A new reader from the first chunk, or None if the stream has already dropped it"""
+        if self._base > 0 or (self._error is not None and not self._retain):
+            return None
+        reader_id = next(self._reader_ids)
+        self._readers[reader_id] = 0
+        return StreamReader(self, reader_id)
+
+    async def _run(self, response: httpx.Response, on_complete: Optional[Callable[["SharedStream"], None]]) -> None:
+        try:
+            async for chunk in response.aiter_raw():
+                while self._buffered >= self.buffer_bytes:
+                    space = self._space
+                    try:
+                        await asyncio.wait_for(space.wait(), self.stall_timeout)
+                    except asyncio.TimeoutError:
+                        raise StreamStalled(f"no reader took a chunk for {self.stall_timeout}s")
+                self._chunks.append(chunk)
+                self._buffered += len(chunk)
+                self._keep(chunk)
+                self._notify()
+            if on_complete and self._body is not None:
+                on_complete(self)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._notify()
+            await response.aclose()
+
+    def _keep(self, chunk: bytes) -> None:
+        if self._body is None:
+            return
+        self._body_size += len(chunk)
+        if self._body_size > self._body_limit:
+            self._body = None
+        else:
+            self._body.append(chunk)
+
+    def _notify(self) -> None:
+        # Wake everyone waiting on the current event and arm a fresh one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _trim(self) -> None:
+        """Drop the chunks every reader has passed and let the pump continue"""
+        if self._retain or not self._readers:
+            return
+        low = min(self._readers.values())
+        while self._base < low:
+            self._buffered -= len(self._chunks.popleft())
+            self._base += 1
+        if self._buffered < self.buffer_bytes:
+            self._space.set()
+            self._space = asyncio.Event()
+
+    def _leave(self, reader_id: int) -> None:
+        self._readers.pop(reader_id, None)
+        self._trim()
+        # Nobody is left and nobody new can start from the beginning: stop pulling the body
+        if not self._readers and self._base > 0 and self._pump and not self._done:
+            self._pump.cancel()
+
+    async def _iter(self, reader_id: int) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                changed = self._changed
+                while reader_id in self._readers and self._readers[reader_id] < self._base + len(self._chunks):
+                    index = self._readers[reader_id]
+                    chunk = self._chunks[index - self._base]
+                    self._readers[reader_id] = index + 1
+                    self._trim()
+                    yield chunk
+                if self._done or reader_id not in self._readers:
+                    if self._error:
+                        raise self._error
+                    return
+                await changed.wait()
+        finally:
+            self._leave(reader_id)
+
+
+class StreamReader:
+    """One caller's view of a SharedStream: status, headers and its own position in the body"""
+
+    def __init__(self, stream: SharedStream, reader_id: int):
+        self._stream = stream
+        self._reader_id = reader_id
+
+    @property
+    def status_code(self) -> int:
+        return self._stream.status_code
+
+    @property
+    def headers(self) -> httpx.Headers:
+        return self._stream.headers
+
+    @property
+    def text(self) -> Optional[str]:
+        return self._stream.text
+
+    def aiter_raw(self) -> AsyncIterator[bytes]:
+        return self._stream._iter(self._reader_id)
+
+    async def aclose(self) -> None:
+        """Give up reading (the stream stops holding chunks for this reader)"""
+        self._stream._leave(self._reader_id)
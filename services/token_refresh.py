@@ -0,0 +1,187 @@
+"""
+Clover OAuth token refresh
+
+Expiring Clover tokens are stored with their refresh token and expiry (see
+MerchantHelper.store_or_update_token). TokenRefresher keeps them valid two ways:
+
+- run(): a background loop that refreshes every token expiring within
+  refresh_ahead_seconds, so customer requests never see an expired one;
+- on_unauthorized(): CloverClient's hook for a 401, which refreshes the
+  merchant's token and lets the client retry once with the new one.
+
+Refreshes are single-flight per merchant: however many requests fail at
+once, one refresh runs and they all wait for it. That only covers one
+worker, so the refresh itself runs with the merchant_tokens row locked
+(SELECT ... FOR UPDATE) from the re-read through to the stored result: a
+refresh in another worker waits for it, then re-reads the row. If the stored
+token already differs from the one that failed (another request or worker
+refreshed it), that one is used instead of refreshing again, since a refresh
+token can only be spent once.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request
+
+from app.routes.clover_auth import clover_refresh
+from database.database import AsyncSessionLocal
+from helpers.merchant_helper import AsyncMerchantHelper, token_cache
+
+
+class TokenRefreshError(Exception):
+    def __init__(self, merchant_id: str, reason: str):
+        self.merchant_id = merchant_id
+        super().__init__(f"Could not refresh the Clover token for merchant {merchant_id}: {reason}")
+
+
+def _timestamp(value: Any) -> Optional[datetime]:
+    """Clover sends expirations as unix seconds (UTC)"""
+    if not value:
+        return None
+    return datetime.utcfromtimestamp(int(value))
+
+
+def parse_token_response(data: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[datetime], Optional[datetime]]:
+    """(access token, refresh token, expires_at, refresh_token_expires_at) from a token endpoint response"""
+    access_token = data.get("access_token")
+    if not access_token:
+        raise ValueError(data.get("message") or data.get("error") or "no access_token in response")
+    expires_at = _timestamp(data.get("access_token_expiration"))
+    if expires_at is None and data.get("expires_in"):
+        expires_at = datetime.utcnow() + timedelta(seconds=int(data["expires_in"]))
+    return access_token, data.get("refresh_token"), expires_at, _timestamp(data.get("refresh_token_expiration"))
+
+
+class TokenRefresher:
+    def __init__(
+        self,
+        refresh_ahead_seconds: float = 600.0,
+        interval_seconds: float = 60.0,
+        concurrency: int = 4,
+        exchange: Callable[[str], Awaitable[Dict[str, Any]]] = clover_refresh,
+    ):
+        self.refresh_ahead_seconds = refresh_ahead_seconds
+        self.interval_seconds = interval_seconds
+        self.concurrency = concurrency
+        self._exchange = exchange
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._flights: Dict[str, asyncio.Task] = {}
+        self.status: Dict[str, Dict[str, Any]] = {}
+        self.refreshes = 0
+        self.reused = 0
+        self.failures = 0
+
+    def refresh(self, merchant_id: str, failed_token: Optional[str] = None, force: bool = False) -> "asyncio.Future[str]":
+        """
+        Refresh a merchant's token, joining a refresh already in flight; resolves to the new access token.
+        Without failed_token or force, a token that isn't due yet is left alone.
+        """
+        task = self._flights.get(merchant_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._refresh(merchant_id, failed_token, force))
+            self._flights[merchant_id] = task
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # don't warn about unretrieved errors
+        # Shielded so a caller giving up doesn't cancel the refresh for everyone else
+        return asyncio.shield(task)
+
+    async def on_unauthorized(self, merchant_id: str, access_token: str) -> Optional[str]:
+        """CloverClient hook for a 401: a token to retry with, or None to give up"""
+        try:
+            new_token = await self.refresh(merchant_id, failed_token=access_token)
+        except TokenRefreshError as e:
+            print(str(e))
+            return None
+        return new_token if new_token != access_token else None
+
+    async def _refresh(self, merchant_id: str, failed_token: Optional[str], force: bool) -> str:
+        status = self.status.setdefault(merchant_id, {"refreshes": 0, "failures": 0})
+        async with self._semaphore:
+            async with AsyncSessionLocal() as db:
+                # Locked until store_or_update_token commits (or the session rolls back on the way out)
+                record = await AsyncMerchantHelper.get_token_record(db, merchant_id, for_update=True)
+                if record is None:
+                    raise TokenRefreshError(merchant_id, "no stored token")
+                internal_id, stored = record
+
+                # Someone already replaced the token we were told about, or the scheduled
+                # refresh finds it no longer due: use what's stored
+                if failed_token is not None and stored.token != failed_token:
+                    self.reused += 1
+                    token_cache.invalidate(merchant_id)
+                    return stored.token
+                if failed_token is None and not force and not self._due(stored.expires_at):
+                    return stored.token
+
+                if not stored.refresh_token:
+                    raise TokenRefreshError(merchant_id, "no refresh token stored")
+                if stored.refresh_token_expires_at and stored.refresh_token_expires_at <= datetime.utcnow():
+                    raise TokenRefreshError(merchant_id, "refresh token expired; the merchant has to reconnect")
+
+                started = time.monotonic()
+                try:
+                    access_token, refresh_token, expires_at, refresh_expires_at = parse_token_response(
+                        await self._exchange(stored.refresh_token)
+                    )
+                except Exception as e:
+                    self.failures += 1
+                    status["failures"] += 1
+                    status["last_error"] = str(e)
+                    raise TokenRefreshError(merchant_id, str(e)) from e
+
+                await AsyncMerchantHelper.store_or_update_token(
+                    db, internal_id, access_token, refresh_token, expires_at, refresh_expires_at
+                )
+
+        self.refreshes += 1
+        status["refreshes"] += 1
+        status["last_error"] = None
+        status["last_refreshed_at"] = datetime.utcnow().isoformat()
+        status["expires_at"] = expires_at.isoformat() if expires_at else None
+        status["last_duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+        return access_token
+
+    def _due(self, expires_at: Optional[datetime]) -> bool:
+        return expires_at is not None and expires_at <= datetime.utcnow() + timedelta(seconds=self.refresh_ahead_seconds)
+
+    async def refresh_expiring(self) -> int:
+        """One pass: refresh every token expiring within refresh_ahead_seconds; returns how many were due"""
+        async with AsyncSessionLocal() as db:
+            merchant_ids = await AsyncMerchantHelper.list_expiring_tokens(
+                db, datetime.utcnow() + timedelta(seconds=self.refresh_ahead_seconds)
+            )
+        results = await asyncio.gather(*(self.refresh(merchant_id) for merchant_id in merchant_ids), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(str(result))
+        return len(merchant_ids)
+
+    async def run(self) -> None:
+        """Background task: refresh tokens ahead of expiry, every interval"""
+        while True:
+            try:
+                await self.refresh_expiring()
+            except Exception as e:
+                print(f"Token refresh: could not load expiring tokens: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "refresh_ahead_seconds": self.refresh_ahead_seconds,
+            "interval_seconds": self.interval_seconds,
+            "refreshes": self.refreshes,
+            "reused": self.reused,
+            "failures": self.failures,
+            "in_flight": [merchant_id for merchant_id, task in self._flights.items() if not task.done()],
+            "merchants": self.status,
+        }
+
+
+def get_token_refresher(request: Request) -> TokenRefresher:
+    """
+    Dependency that returns the app-wide TokenRefresher.
+    Use with Depends(get_token_refresher) in your routes.
+    """
+    return request.app.state.token_refresher
@@ -0,0 +1,83 @@
+import os
+
+import httpx
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from database.database import Base
+import models.cart  # noqa: F401  (registers the tables)
+import models.catalog  # noqa: F401
+import models.merchant  # noqa: F401
+import models.merchant_token  # noqa: F401
+import models.webhook  # noqa: F401
+from fake_clover import server as fake_server
+from services.clover_client import CloverClient
+
+
+class RecordingSession(Session):
+    """Session class the test databases use, so ORM statements can be watched without touching other sessions"""
+
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    # A file, so separate connections (sessions) see each other's commits
+    return f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"
+
+
+@pytest.fixture
+def mysql_url():
+    url = os.getenv("TEST_MYSQL_URL")  # e.g. mysql+aiomysql://root:pw@localhost/bitewise_test (its tables get dropped)
+    if not url:
+        pytest.skip("set TEST_MYSQL_URL to run the MySQL locking tests")
+    return url
+
+
+@pytest.fixture
+def make_database():
+    """async (url) -> sessionmaker on a fresh schema; engines are disposed of afterwards"""
+    engines = []
+
+    async def make(url: str) -> async_sessionmaker:
+        engine = create_async_engine(url)
+        engines.append(engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        return async_sessionmaker(engine, expire_on_commit=False, autoflush=False, sync_session_class=RecordingSession)
+
+    yield make
+    for engine in engines:
+        engine.sync_engine.dispose()
+
+
+@pytest.fixture
+def orm_statements():
+    """Every ORM statement executed by a test database session, in order"""
+    statements = []
+
+    def record(state):
+        statements.append(state.statement)
+
+    event.listen(RecordingSession, "do_orm_execute", record)
+    yield statements
+    event.remove(RecordingSession, "do_orm_execute", record)
+
+
+@pytest.fixture
+def fake_clover():
+    """CloverClient wired in-process to fake_clover.server; .requests lists what it sent"""
+    fake_server._merchants.clear()
+    client = CloverClient("https://clover.test", rate_limiter=None)
+    client.requests = []
+
+    async def record(request: httpx.Request):
+        client.requests.append(request)
+
+    client._client = httpx.AsyncClient(
+        base_url=client.base_url,
+        transport=httpx.ASGITransport(app=fake_server.app),
+        event_hooks={"request": [record]},
+    )
+    return client
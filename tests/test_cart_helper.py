@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+from sqlalchemy import update
+
+from helpers.cart_helper import AsyncCartHelper, CartNotActiveError, totals_drift_query
+from models.cart import Cart, CartItem
+
+
+async def _cart_with_item(sessionmaker, quantity: int = 1):
+    """(cart ID, item ID) of an active cart holding one $2.50 item"""
+    async with sessionmaker() as db:
+        cart = await AsyncCartHelper.create_cart(db, "M1", session_id="S1")
+        item = await AsyncCartHelper.add_item_to_cart(db, cart.id, "I1", "Pizza", 2.50, quantity=quantity)
+        return cart.id, item.id
+
+
+async def _drift(sessionmaker):
+    async with sessionmaker() as db:
+        return (await db.execute(totals_drift_query())).mappings().all()
+
+
+def _locks(statement) -> bool:
+    return statement._for_update_arg is not None
+
+
+def _reads_items(statement) -> bool:
+    return any(getattr(table, "name", None) == CartItem.__tablename__ for table in statement.get_final_froms())
+
+
+def test_mutations_lock_before_reading(sqlite_url, make_database, orm_statements):
+    async def main():
+        sessionmaker = await make_database(sqlite_url)
+        cart_id, item_id = await _cart_with_item(sessionmaker)
+
+        mutations = [
+            lambda db: AsyncCartHelper.add_item_to_cart(db, cart_id, "I1", "Pizza", 2.50),
+            lambda db: AsyncCartHelper.update_item_quantity(db, item_id, 4),
+            lambda db: AsyncCartHelper.add_modifier_to_item(db, item_id, "MOD1", "G1", "Cheese", 0.75),
+            lambda db: AsyncCartHelper.remove_item_from_cart(db, item_id),
+            lambda db: AsyncCartHelper.clear_cart(db, cart_id),
+        ]
+        for mutation in mutations:
+            async with sessionmaker() as db:
+                orm_statements.clear()
+                await mutation(db)
+            selects = [statement for statement in orm_statements if statement.is_select]
+            # The first statement takes the cart lock, and no item is read without a lock either
+            assert _locks(orm_statements[0])
+            assert all(_locks(statement) for statement in selects if _reads_items(statement))
+
+        assert await _drift(sessionmaker) == []
+
+    asyncio.run(main())
+
+
+def test_concurrent_adds_neither_lose_updates_nor_duplicate(mysql_url, make_database):
+    async def main():
+        sessionmaker = await make_database(mysql_url)
+        cart_id, _ = await _cart_with_item(sessionmaker)
+
+        async def add():
+            async with sessionmaker() as db:
+                await AsyncCartHelper.add_item_to_cart(db, cart_id, "I1", "Pizza", 2.50)
+
+        await asyncio.gather(*(add() for _ in range(10)))
+
+        async with sessionmaker() as db:
+            cart = await AsyncCartHelper.get_cart_by_id(db, cart_id)
+            assert [item.quantity for item in cart.items] == [11]
+            assert cart.subtotal_cents == cart.total_cents == 11 * 250
+        assert await _drift(sessionmaker) == []
+
+    asyncio.run(main())
+
+
+def test_concurrent_quantity_updates_keep_totals(mysql_url, make_database):
+    async def main():
+        sessionmaker = await make_database(mysql_url)
+        cart_id, item_id = await _cart_with_item(sessionmaker)
+
+        async def update(quantity):
+            async with sessionmaker() as db:
+                await AsyncCartHelper.update_item_quantity(db, item_id, quantity)
+
+        await asyncio.gather(*(update(quantity) for quantity in range(2, 12)))
+
+        async with sessionmaker() as db:
+            item = await db.get(CartItem, item_id)
+            cart = await db.get(Cart, cart_id)
+            assert cart.subtotal_cents == item.quantity * 250
+        assert await _drift(sessionmaker) == []
+
+    asyncio.run(main())
+
+
+async def _interleave(sessionmaker, cart_id, item_id, in_transaction: bool):
+    """Session A reads the item, B changes it and commits, then A mutates from what it read"""
+    async with sessionmaker() as a:
+        stale = await AsyncCartHelper.get_cart_by_id(a, cart_id)  # item at quantity 1 in A's identity map
+        assert stale.items[0].quantity == 1
+        if not in_transaction:
+            await a.commit()  # objects stay loaded (expire_on_commit=False)
+
+        async with sessionmaker() as b:
+            await AsyncCartHelper.update_item_quantity(b, item_id, 5)
+            await AsyncCartHelper.add_modifier_to_item(b, item_id, "MOD1", "G1", "Cheese", 0.75)
+
+        item = await AsyncCartHelper.update_item_quantity(a, item_id, 3)
+        assert item.quantity == 3 and item.modifiers_cents == 75
+        await AsyncCartHelper.add_modifier_to_item(a, item_id, "MOD2", "G1", "Olives", 0.50)
+
+    async with sessionmaker() as db:
+        cart = await AsyncCartHelper.get_cart_by_id(db, cart_id)
+        assert cart.subtotal_cents == cart.total_cents == 3 * (250 + 75 + 50)
+    assert await _drift(sessionmaker) == []
+
+
+def test_interleaved_updates_use_current_rows(sqlite_url, make_database):
+    async def main():
+        sessionmaker = await make_database(sqlite_url)
+        cart_id, item_id = await _cart_with_item(sessionmaker)
+        await _interleave(sessionmaker, cart_id, item_id, in_transaction=False)
+
+        # Removing from a stale copy takes off what the item is worth now
+        async with sessionmaker() as a:
+            await AsyncCartHelper.get_cart_by_id(a, cart_id)
+            await a.commit()
+            async with sessionmaker() as b:
+                await AsyncCartHelper.update_item_quantity(b, item_id, 7)
+            assert await AsyncCartHelper.remove_item_from_cart(a, item_id)
+        assert await _drift(sessionmaker) == []
+
+    asyncio.run(main())
+
+
+def test_interleaved_updates_see_past_the_snapshot(mysql_url, make_database):
+    async def main():
+        sessionmaker = await make_database(mysql_url)
+        cart_id, item_id = await _cart_with_item(sessionmaker)
+        # A's first read fixes its REPEATABLE READ snapshot; B commits after it
+        await _interleave(sessionmaker, cart_id, item_id, in_transaction=True)
+
+    asyncio.run(main())
+
+
+def test_add_checks_the_cart_status_under_the_lock(sqlite_url, make_database):
+    async def main():
+        sessionmaker = await make_database(sqlite_url)
+        cart_id, _ = await _cart_with_item(sessionmaker)
+
+        async with sessionmaker() as db:
+            cart = await AsyncCartHelper.get_cart_by_id(db, cart_id, with_items=False)
+            assert cart.status == "active"
+            # Checked out between the route's read and the add
+            async with sessionmaker() as other:
+                await other.execute(update(Cart).where(Cart.id == cart_id).values(status="converted"))
+                await other.commit()
+            with pytest.raises(CartNotActiveError):
+                await AsyncCartHelper.add_item_to_cart(db, cart_id, "I2", "Salad", 4.00)
+
+        async with sessionmaker() as db:
+            cart = await AsyncCartHelper.get_cart_by_id(db, cart_id)
+            assert [item.clover_item_id for item in cart.items] == ["I1"]
+            assert cart.subtotal_cents == 250
+
+    asyncio.run(main())
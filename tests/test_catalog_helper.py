@@ -0,0 +1,36 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base
+from helpers.catalog_helper import CatalogHelper
+from models.catalog import CatalogCategory, CatalogItem, CatalogItemCategory
+
+
+def _session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, autoflush=False)()
+
+
+def _item(item_id, *category_ids):
+    return {"id": item_id, "name": item_id, "price": 100, "categories": {"elements": [{"id": c} for c in category_ids]}}
+
+
+def _links(db):
+    return sorted((link.item_id, link.category_id) for link in db.query(CatalogItemCategory))
+
+
+def test_deleting_a_category_drops_its_item_links():
+    db = _session()
+    CatalogHelper.upsert_categories(db, "M1", [{"id": "C1", "name": "Pizza"}, {"id": "C2", "name": "Sides"}])
+    CatalogHelper.upsert_items(db, "M1", [_item("I1", "C1", "C2"), _item("I2", "C1")])
+    db.commit()
+
+    CatalogHelper.delete_ids(db, CatalogCategory, "M1", ["C1"])
+    db.commit()
+    assert _links(db) == [("I1", "C2")]
+
+    CatalogHelper.delete_missing(db, CatalogItem, "M1", {"I2"})
+    db.commit()
+    assert _links(db) == []
+    assert [row.clover_id for row in db.query(CatalogCategory)] == ["C2"]
@@ -0,0 +1,54 @@
+import asyncio
+
+from services.catalog_index import CatalogIndex
+from services.catalog_search import SearchIndex, top_matches
+
+
+def _index(**docs) -> SearchIndex:
+    index = SearchIndex()
+    for doc_id, text in docs.items():
+        index.add(doc_id, [(text, 1.0)])
+    return index
+
+
+def test_exact_beats_prefix_beats_typo():
+    index = _index(a="mar", b="margherita", c="mra")
+    scores = index.match("mar")
+    assert scores["a"] > scores["b"] > scores.get("c", 0.0)
+
+
+def test_typos_match_by_trigrams():
+    index = _index(a="farmhouse pizza", b="garlic bread")
+    assert set(index.match("farmhuse")) == {"a"}
+    assert index.match("xyzzy") == {}
+
+
+def test_removed_documents_stop_matching():
+    index = _index(a="cola", b="cold coffee")
+    index.remove("a")
+    assert set(index.match("col")) == {"b"}
+    assert "a" not in index and len(index) == 1
+
+    # Re-adding replaces the old tokens instead of merging with them
+    index.add("b", [("espresso", 1.0)])
+    assert index.match("cold") == {} and set(index.match("esp")) == {"b"}
+
+
+def test_every_term_must_match():
+    index = _index(a="lemon iced tea", b="iced coffee", c="lemon tart")
+    assert [doc_id for doc_id, _ in top_matches([index.match("iced"), index.match("lemon")], 10)] == ["a"]
+    assert top_matches([], 10) == []
+
+
+def test_catalog_search_ranks_names_and_categories(fake_clover):
+    async def run():
+        return await CatalogIndex().get(fake_clover, "M1", "token")
+
+    catalog = asyncio.run(run())
+    assert catalog.search("marg")[0]["id"] == "ITEM1"
+    assert catalog.search("margarita")[0]["name"] == "Margherita"  # typo
+    assert catalog.search("pz-002")[0]["id"] == "ITEM2"  # SKU
+    # A category name finds its items, and extra words narrow them down
+    assert {result["id"] for result in catalog.search("pizzas")} == {"ITEM1", "ITEM2", "ITEM3"}
+    assert [result["id"] for result in catalog.search("pizzas peppy")] == ["ITEM3"]
+    assert catalog.search("peppy", limit=1)[0]["categories"] == [{"id": "CAT1", "name": "Pizzas"}]
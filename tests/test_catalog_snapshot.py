@@ -0,0 +1,85 @@
+import asyncio
+
+from services.catalog_index import CatalogIndex
+from services.catalog_snapshot import SnapshotStore
+
+MERCHANT = "M1"
+
+
+def _items_requests(client) -> int:
+    return sum(request.url.path.endswith("/items") for request in client.requests)
+
+
+def test_snapshot_round_trip(tmp_path, fake_clover):
+    leader = SnapshotStore(str(tmp_path))
+    assert leader.acquire_leadership()
+    catalog = CatalogIndex(snapshots=leader)
+    index = asyncio.run(catalog.get(fake_clover, MERCHANT, "token"))
+
+    snapshot = SnapshotStore(str(tmp_path)).open(MERCHANT)
+    assert len(snapshot) == len(index.items)
+    assert snapshot.item("ITEM1") == index.item("ITEM1")
+    assert snapshot.category_id(" pizzas ") == index.category_id("Pizzas") == "CAT1"
+    assert snapshot.items_in_category("CAT1") == index.items_in_category("CAT1")
+    assert [r["id"] for r in snapshot.search("marg")] == [r["id"] for r in index.search("marg")] == ["ITEM1"]
+    leader.release()
+
+
+def test_only_the_leader_writes_snapshots(tmp_path, fake_clover):
+    leader = SnapshotStore(str(tmp_path))
+    assert leader.acquire_leadership()
+    reader = SnapshotStore(str(tmp_path))
+    assert not reader.acquire_leadership()
+
+    # No snapshot yet: the reader builds an index of its own, and keeps it to itself
+    catalog = CatalogIndex(snapshots=reader)
+    asyncio.run(catalog.get(fake_clover, MERCHANT, "token"))
+    assert catalog.peek(MERCHANT) is not None
+    assert reader.open(MERCHANT) is None and reader.writes == 0
+    leader.release()
+
+
+def test_readers_skip_stale_and_invalidated_snapshots(tmp_path, fake_clover):
+    leader = SnapshotStore(str(tmp_path))
+    assert leader.acquire_leadership()
+    asyncio.run(CatalogIndex(snapshots=leader).get(fake_clover, MERCHANT, "token"))
+    reader = SnapshotStore(str(tmp_path))
+    fake_clover.requests.clear()
+
+    fresh = CatalogIndex(snapshots=reader)
+    assert asyncio.run(fresh.get(fake_clover, MERCHANT, "token")) is reader.open(MERCHANT)
+    assert _items_requests(fake_clover) == 0
+
+    # A webhook said the catalog changed: the snapshot predates it, so build from Clover
+    fresh.invalidate(MERCHANT)
+    assert asyncio.run(fresh.get(fake_clover, MERCHANT, "token")) is fresh.peek(MERCHANT)
+    assert _items_requests(fake_clover) == 1
+
+    stale = CatalogIndex(snapshots=reader, snapshot_max_age_seconds=-1)
+    assert asyncio.run(stale.get(fake_clover, MERCHANT, "token")) is stale.peek(MERCHANT)
+    assert _items_requests(fake_clover) == 2
+    leader.release()
+
+
+def test_reader_takes_over_when_the_leader_releases(tmp_path):
+    leader = SnapshotStore(str(tmp_path))
+    assert leader.acquire_leadership()
+    reader = SnapshotStore(str(tmp_path), retry_seconds=0.01)
+    started = []
+
+    async def job():
+        started.append(True)
+
+    reader.add_job(job)
+
+    async def run():
+        election = asyncio.create_task(reader.run())
+        await asyncio.sleep(0.05)
+        assert not reader.is_leader and not started
+        leader.release()
+        await asyncio.wait_for(election, 1)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert reader.is_leader and started == [True]
+    reader.release()
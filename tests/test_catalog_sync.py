@@ -0,0 +1,70 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database.database import Base
+from fake_clover import server as fake_server
+from models.catalog import CatalogItem, CatalogItemStock
+from services.catalog_sync import sync_merchant_catalog
+
+
+def _session():
+    # One shared in-memory connection; the sync runs its database work in worker threads
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, autoflush=False)()
+
+
+def _sync(client, db, **options):
+    return asyncio.run(sync_merchant_catalog(client, db, "M1", "token", **options))
+
+
+def _paths(client):
+    return [request.url.path.rsplit("/", 1)[-1] for request in client.requests]
+
+
+def test_first_sync_loads_everything_then_only_changes(fake_clover):
+    db = _session()
+    first = _sync(fake_clover, db)
+    assert {entity: result["mode"] for entity, result in first.items()} == {
+        "categories": "full", "items": "full", "modifier_groups": "full", "item_stocks": "full",
+    }
+    assert db.query(CatalogItem).count() == first["items"]["fetched"] == 7
+    assert db.query(CatalogItemStock).count() == 7
+
+    items = fake_server._merchants["M1"]["items"]
+    margherita = next(item for item in items if item["id"] == "ITEM1")
+    margherita.update(name="Margherita DOP", modifiedTime=first["items"]["watermark"] + 1)
+
+    fake_clover.requests.clear()
+    second = _sync(fake_clover, db)
+    assert second["items"]["mode"] == "incremental"
+    assert second["items"]["watermark"] == margherita["modifiedTime"]
+    item_request = next(request for request in fake_clover.requests if request.url.path.endswith("/items"))
+    assert item_request.url.params["filter"] == f"modifiedTime>={first['items']['watermark']}"
+    assert db.query(CatalogItem).filter_by(clover_id="ITEM1").one().name == "Margherita DOP"
+
+    # Nothing changed since: only the item at the (inclusive) watermark comes back
+    assert _sync(fake_clover, db)["items"]["fetched"] == 1
+
+
+def test_full_sync_drops_what_clover_no_longer_returns(fake_clover):
+    db = _session()
+    _sync(fake_clover, db)
+    items = fake_server._merchants["M1"]["items"]
+    items.remove(next(item for item in items if item["id"] == "ITEM1"))
+
+    # An incremental pass can't see deletions; a full one removes them
+    assert _sync(fake_clover, db)["items"]["removed"] == 0
+    assert _sync(fake_clover, db, full=True)["items"]["removed"] == 1
+    assert db.query(CatalogItem).filter_by(clover_id="ITEM1").count() == 0
+
+
+def test_sync_only_the_named_entities(fake_clover):
+    db = _session()
+    result = _sync(fake_clover, db, entities=["item_stocks"])
+    assert list(result) == ["item_stocks"]
+    assert set(_paths(fake_clover)) == {"item_stocks"}
+    assert db.query(CatalogItem).count() == 0
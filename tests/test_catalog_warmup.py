@@ -0,0 +1,82 @@
+import asyncio
+
+import httpx
+
+from services.catalog_index import CatalogIndex
+from services.catalog_warmup import CatalogWarmer
+from services.clover_client import CloverClient
+from services.item_availability import ItemAvailability
+
+
+class SlowIndex:
+    """CatalogIndex stand-in that records how many merchants load at once"""
+
+    def __init__(self):
+        self.active = 0
+        self.most_active = 0
+        self.loaded = []
+
+    def peek(self, merchant_id):
+        return None
+
+    async def get(self, client, merchant_id, access_token):
+        self.active += 1
+        self.most_active = max(self.most_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        self.loaded.append(merchant_id)
+
+
+class NoAvailability:
+    async def poll(self, client, merchant_id, access_token):
+        return 0
+
+
+def test_warm_merchant_loads_then_refreshes(fake_clover):
+    warmer = CatalogWarmer(fake_clover, CatalogIndex(), ItemAvailability())
+
+    async def run():
+        first = dict(await warmer.warm_merchant("M1", "token"))
+        second = await warmer.warm_merchant("M1", "token")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first["state"] == "ok" and first["runs"] == 1
+    assert second["runs"] == 2 and second["failures"] == 0
+    assert warmer.catalog_index.peek("M1") is not None
+    assert warmer.item_availability.peek("M1").stock_count("ITEM1") == 25
+    assert warmer.catalog_index.stats()["incremental_refreshes"] == 1
+
+
+def test_a_failing_merchant_is_recorded_not_raised():
+    client = CloverClient("https://clover.test", rate_limiter=None)
+    client._client = httpx.AsyncClient(
+        base_url=client.base_url, transport=httpx.MockTransport(lambda request: httpx.Response(500))
+    )
+    warmer = CatalogWarmer(client, CatalogIndex(), ItemAvailability())
+
+    status = asyncio.run(warmer.warm_merchant("M1", "token"))
+    assert status["state"] == "error" and status["failures"] == 1 and status["last_error"]
+
+
+def test_warm_all_caps_concurrency_and_covers_every_merchant():
+    index = SlowIndex()
+    merchants = [(f"M{i}", "token") for i in range(6)]
+
+    async def run():
+        warmer = CatalogWarmer(None, index, NoAvailability(), spread_seconds=0.0, jitter_seconds=0.0, concurrency=2)
+        await warmer.warm_all(merchants)
+        return warmer
+
+    warmer = asyncio.run(run())
+    assert sorted(index.loaded) == sorted(merchant_id for merchant_id, _ in merchants)
+    assert index.most_active == 2
+    assert warmer.cycles == 1
+    assert all(status["state"] == "ok" for status in warmer.status.values())
+
+
+def test_merchants_are_spread_over_the_window():
+    warmer = CatalogWarmer(None, None, None, spread_seconds=60.0, jitter_seconds=0.0)
+    assert warmer._delays(4) == [0.0, 15.0, 30.0, 45.0]
+    warmer.jitter_seconds = 5.0
+    assert all(i * 15.0 <= delay <= i * 15.0 + 5.0 for i, delay in enumerate(warmer._delays(4)))
@@ -0,0 +1,80 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from services.circuit_breaker import CircuitOpenError
+from services.clover_api import get_item_details, get_item_full, get_items_by_category
+from services.clover_client import CloverClient
+
+
+class FailingIndex:
+    """CatalogIndex stand-in whose build fails the way Clover made it fail"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+    async def get(self, client, merchant_id, access_token):
+        raise self.error
+
+
+def _client(handler) -> CloverClient:
+    client = CloverClient("https://clover.test", rate_limiter=None)
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+    return client
+
+
+def _status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://clover.test/v3/merchants/M1/items")
+    return httpx.HTTPStatusError("failed", request=request, response=httpx.Response(status, request=request, text="nope"))
+
+
+def _status(coroutine) -> HTTPException:
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(coroutine)
+    return raised.value
+
+
+def test_index_build_errors_keep_clover_status():
+    client = _client(lambda request: httpx.Response(500))
+    for status in (401, 404, 429):
+        index = FailingIndex(_status_error(status))
+        assert _status(get_items_by_category(client, "M1", "token", "Pizza", index=index)).status_code == status
+        assert _status(get_item_details(client, "M1", "token", "I1", index=index)).status_code == status
+
+
+def test_open_circuit_while_indexing_is_a_503():
+    client = _client(lambda request: httpx.Response(500))
+    index = FailingIndex(CircuitOpenError("M1", "items", 12.0))
+    error = _status(get_items_by_category(client, "M1", "token", "Pizza", index=index))
+    assert error.status_code == 503 and error.headers["Retry-After"] == "12"
+
+
+def test_unknown_category_is_a_404():
+    client = _client(lambda request: httpx.Response(200, json={"elements": [{"id": "C1", "name": "Sides"}]}))
+    error = _status(get_items_by_category(client, "M1", "token", "Pizza"))
+    assert error.status_code == 404 and "Pizza" in error.detail
+
+
+def test_item_full_makes_one_item_call_plus_one_per_group(fake_clover):
+    item = asyncio.run(get_item_full(fake_clover, "M1", "token", "ITEM1"))
+
+    assert item["name"] == "Margherita"
+    assert [c["name"] for c in item["categories"]["elements"]] == ["Pizzas"]
+    groups = {g["name"]: [m["name"] for m in g["modifiers"]["elements"]] for g in item["modifierGroups"]["elements"]}
+    assert groups == {"Crust": ["Thin Crust", "Cheese Burst"], "Extra Toppings": ["Olives", "Jalapenos", "Paneer"]}
+
+    paths = [request.url.path for request in fake_clover.requests]
+    assert paths[0] == "/v3/merchants/M1/items/ITEM1"
+    assert fake_clover.requests[0].url.params["expand"] == "categories,modifierGroups,itemStock"
+    assert sorted(paths[1:]) == [
+        "/v3/merchants/M1/modifier_groups/MG1/modifiers",
+        "/v3/merchants/M1/modifier_groups/MG2/modifiers",
+    ]
+
+
+def test_item_full_for_an_unknown_item_is_a_404(fake_clover):
+    error = _status(get_item_full(fake_clover, "M1", "token", "NOPE"))
+    assert error.status_code == 404
+    assert len(fake_clover.requests) == 1
@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import httpx
+
+from services.clover_client import CloverClient
+
+ORDERS = "/v3/merchants/M1/orders"  # not a FRESH_ENDPOINT, so every read revalidates
+
+
+def _client(handler) -> CloverClient:
+    client = CloverClient("https://clover.test", rate_limiter=None)
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+    return client
+
+
+def _streamed(content: bytes):
+    # A body MockTransport doesn't pre-read, so stream=True responses can stream it
+    async def chunks():
+        yield content
+    return chunks()
+
+
+def _invalidating_304(client_ref):
+    """200 with an ETag first; then the cache is invalidated while the conditional request is in flight"""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if "if-none-match" not in request.headers:
+            body = json.dumps({"elements": [{"id": "O1"}]}).encode()
+            return httpx.Response(
+                200, content=_streamed(body), headers={"ETag": '"v1"', "Content-Type": "application/json"}
+            )
+        client_ref[0].cache.invalidate("M1")  # e.g. a webhook for this merchant
+        return httpx.Response(304, content=_streamed(b""), headers={"ETag": '"v1"'})
+
+    return handler, calls
+
+
+def test_get_304_after_invalidation_returns_held_entry():
+    client_ref = []
+    handler, calls = _invalidating_304(client_ref)
+    client = _client(handler)
+    client_ref.append(client)
+
+    async def run():
+        first = await client.get(ORDERS, "token")
+        second = await client.get(ORDERS, "token")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(calls) == 2 and calls[1].headers["if-none-match"] == '"v1"'
+    assert second.status_code == 200
+    assert second.json() == first.json() == {"elements": [{"id": "O1"}]}
+
+
+def test_stream_get_304_after_invalidation_returns_held_entry():
+    client_ref = []
+    handler, calls = _invalidating_304(client_ref)
+    client = _client(handler)
+    client_ref.append(client)
+
+    async def read(reader):
+        return b"".join([chunk async for chunk in reader.aiter_raw()])
+
+    async def run():
+        first = await read(await client.stream_get(ORDERS, "token"))
+        second = await client.stream_get(ORDERS, "token")
+        return first, second.status_code, await read(second)
+
+    first, status, second = asyncio.run(run())
+    assert len(calls) == 2
+    assert status == 200
+    assert second == first
+
+
+def _half_open(client: CloverClient, endpoint: str = "orders"):
+    """Trip the M1 breaker and let its cool-down pass, so the next call is the half-open probe"""
+    breaker = client.breakers.get("M1", endpoint)
+    breaker._open()
+    breaker.opened_at -= breaker.open_seconds
+    return breaker
+
+
+def test_half_open_probe_reauthorizes_on_401():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers["authorization"])
+        if request.headers["authorization"] == "Bearer old":
+            return httpx.Response(401, json={"message": "Unauthorized"})
+        return httpx.Response(200, json={"elements": []})
+
+    client = _client(handler)
+    client.on_unauthorized = lambda merchant_id, token: asyncio.sleep(0, result="new")
+    breaker = _half_open(client)
+
+    response = asyncio.run(client.request("GET", ORDERS, "old"))
+    # The retry rides on the probe's own admission instead of asking for a second one
+    assert response.status_code == 200
+    assert seen == ["Bearer old", "Bearer new"]
+    assert breaker.state == breaker.CLOSED
+
+
+def test_half_open_probe_retries_429_and_records_once():
+    statuses = [429, 429, 200]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(statuses.pop(0), json={})
+
+    client = _client(handler)
+    client.retry_base_delay = client.retry_max_delay = 0.0
+    breaker = _half_open(client)
+    assert asyncio.run(client.request("GET", ORDERS, "token")).status_code == 200
+    assert breaker.state == breaker.CLOSED
+
+
+def test_half_open_probe_that_runs_out_of_429_retries_frees_the_breaker():
+    client = _client(lambda request: httpx.Response(429, json={}))
+    client.retry_base_delay = client.retry_max_delay = 0.0
+    breaker = _half_open(client)
+
+    assert asyncio.run(client.request("GET", ORDERS, "token")).status_code == 429
+    # Clover answered (it's pacing us, not down): the probe reported, and calls go through again
+    assert breaker.state == breaker.CLOSED
+    assert breaker.allow_request()
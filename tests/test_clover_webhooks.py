@@ -0,0 +1,196 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config.settings import settings
+from app.routes.clover_webhooks import router
+from database.database import Base
+from fake_clover.replay_webhook import build_request
+from services import clover_webhooks
+from services.catalog_index import CatalogIndex
+from services.clover_client import CloverClient
+from services.clover_webhooks import (
+    SIGNATURE_HEADER,
+    WebhookEvent,
+    WebhookProcessor,
+    WebhookVerificationError,
+    parse_events,
+    sign_webhook,
+    verify_webhook,
+)
+from services.item_availability import ItemAvailability
+
+WEBHOOKS = Path(__file__).resolve().parent.parent / "fake_clover" / "webhooks"
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(router)
+    app.state.webhook_processor = WebhookProcessor(
+        CloverClient("https://clover.test", rate_limiter=None), CatalogIndex(), ItemAvailability()
+    )
+    return app
+
+
+def _configure(monkeypatch, auth_code=None, signing_secret=None):
+    monkeypatch.setattr(settings, "CLOVER_WEBHOOK_AUTH_CODE", auth_code)
+    monkeypatch.setattr(settings, "CLOVER_WEBHOOK_SIGNING_SECRET", signing_secret)
+
+
+def test_verification_handshake_needs_no_auth(monkeypatch):
+    # Clover sends the code before the app has an auth code to send back, configured or not
+    for auth_code in (None, "secret-auth"):
+        _configure(monkeypatch, auth_code=auth_code)
+        response = TestClient(_app()).post("/clover/webhooks", content=(WEBHOOKS / "verification.json").read_bytes())
+        assert response.status_code == 200
+        assert response.json() == {"success": True}
+
+
+def test_signed_events_are_accepted_and_invalidate(monkeypatch, shared_log):
+    _configure(monkeypatch, auth_code="secret-auth", signing_secret="signing-secret")
+    app = _app()
+    payload = json.loads((WEBHOOKS / "inventory_update.json").read_text())
+    body, headers = build_request(payload, "secret-auth", "signing-secret")
+
+    response = TestClient(app).post("/clover/webhooks", content=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["events"] == len(next(iter(payload["merchants"].values())))
+    assert app.state.webhook_processor.counters["requests"] == 1
+    assert app.state.webhook_processor.counters["errors"] == 0  # recorded for the other workers
+
+
+def test_unsigned_or_tampered_events_are_refused(monkeypatch):
+    _configure(monkeypatch, auth_code="secret-auth", signing_secret="signing-secret")
+    client = TestClient(_app())
+    payload = json.loads((WEBHOOKS / "inventory_update.json").read_text())
+
+    assert client.post("/clover/webhooks", content=json.dumps(payload)).status_code == 401
+
+    body, headers = build_request(payload, "secret-auth", "signing-secret")
+    assert client.post("/clover/webhooks", content=body.replace(b"UPDATE", b"DELETE"), headers=headers).status_code == 401
+    # A verification code riding along with events doesn't skip the checks
+    body, _ = build_request({**payload, "verificationCode": "x"}, None, None)
+    assert client.post("/clover/webhooks", content=body).status_code == 401
+
+
+def test_events_are_refused_when_verification_is_not_configured(monkeypatch):
+    _configure(monkeypatch)
+    body = (WEBHOOKS / "inventory_update.json").read_bytes()
+    assert TestClient(_app()).post("/clover/webhooks", content=body).status_code == 401
+
+
+def _signed(body: bytes, secret: str = "signing-secret", age: float = 0.0):
+    timestamp = int(time.time() - age)
+    return {SIGNATURE_HEADER: f"t={timestamp}, v1={sign_webhook(body, secret, timestamp)}"}
+
+
+def _refused(body: bytes, headers, **checks) -> str:
+    with pytest.raises(WebhookVerificationError) as raised:
+        verify_webhook(body, headers, **checks)
+    return str(raised.value)
+
+
+def test_signature_must_be_fresh_and_made_with_our_secret():
+    body = b'{"merchants": {}}'
+    verify_webhook(body, _signed(body), signing_secret="signing-secret")
+    verify_webhook(body, _signed(body, age=200), signing_secret="signing-secret")
+
+    assert "window" in _refused(body, _signed(body, age=301), signing_secret="signing-secret")
+    assert "window" in _refused(body, _signed(body, age=-301), signing_secret="signing-secret")
+    assert "Invalid" in _refused(body, _signed(body, secret="other"), signing_secret="signing-secret")
+    for header in ("", "t=abc,v1=00", "v1=00"):
+        assert "malformed" in _refused(body, {SIGNATURE_HEADER: header}, signing_secret="signing-secret")
+
+
+def test_auth_code_is_checked_alongside_the_signature():
+    body = b"{}"
+    headers = {**_signed(body), "x-clover-auth": "secret-auth"}
+    verify_webhook(body, headers, auth_code="secret-auth", signing_secret="signing-secret")
+    assert "Auth" in _refused(body, headers, auth_code="other", signing_secret="signing-secret")
+    assert "not configured" in _refused(body, headers)
+
+
+def test_parse_events_splits_object_ids():
+    events = parse_events({"merchants": {"M1": [
+        {"objectId": "I:ITEM1", "type": "delete", "ts": 5},
+        {"objectId": "IC:CAT1"},
+        {"objectId": "malformed"},
+    ]}})
+    assert events == [
+        WebhookEvent("M1", "I", "ITEM1", "DELETE", 5),
+        WebhookEvent("M1", "IC", "CAT1", "UPDATE", None),
+    ]
+    assert parse_events({}) == []
+
+
+def _event(object_type="I", object_id="ITEM1", type="UPDATE", merchant_id="M1") -> WebhookEvent:
+    return WebhookEvent(merchant_id=merchant_id, object_type=object_type, object_id=object_id, type=type)
+
+
+@pytest.fixture
+def shared_log(monkeypatch, sqlite_url):
+    """Points the processors at a fresh SQLite clover_changes table, as if every worker shared it"""
+    engine = create_async_engine(sqlite_url, poolclass=NullPool)  # connections don't outlive a test's event loop
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create())
+    monkeypatch.setattr(clover_webhooks, "AsyncSessionLocal", async_sessionmaker(engine, expire_on_commit=False))
+    yield
+    engine.sync_engine.dispose()
+
+
+def _worker() -> WebhookProcessor:
+    return WebhookProcessor(CloverClient("https://clover.test", rate_limiter=None), CatalogIndex(), ItemAvailability())
+
+
+def test_changes_fan_out_to_other_workers(shared_log):
+    receiver, other = _worker(), _worker()
+    other.client.cache.put("items-key", None, 200, httpx.Headers(), b"{}", merchant_id="M1", endpoint="items")
+
+    async def run():
+        await other._poll_changes()      # a worker starts from "now"
+        await receiver._poll_changes()
+        await receiver.receive([_event(), _event("IC", "CAT1", "DELETE")])
+        await other._poll_changes()
+        await receiver._poll_changes()   # its own events aren't handled twice
+        await other._poll_changes()      # nor are re-read ones
+
+    asyncio.run(run())
+    assert other.counters["shared_events"] == 2 and receiver.counters["shared_events"] == 0
+    assert other.counters["events"] == receiver.counters["events"] == 2
+    assert other.client.cache.stats()["entries"] == 0
+    assert other._pending == receiver._pending == {"M1": {"I", "IC"}}
+    assert "M1" in other.catalog_index._invalidated
+    # The shared mirror is synced by the receiving worker only
+    assert other._mirror_pending == {} and other._deleted == {}
+    assert receiver._mirror_pending == {"M1": {"I", "IC"}} and len(receiver._deleted["M1"]) == 1
+
+
+def test_mirror_resyncs_only_the_entities_named(monkeypatch):
+    synced = []
+
+    async def fake_sync(client, db, merchant_id, access_token, full_sync_hours=24.0, entities=None):
+        synced.append(set(entities))
+
+    async def fake_token(db, merchant_id):
+        return "token"
+
+    monkeypatch.setattr(clover_webhooks, "sync_merchant_catalog", fake_sync)
+    monkeypatch.setattr(clover_webhooks, "_apply_deletes", lambda db, merchant_id, deleted: True)
+    monkeypatch.setattr(clover_webhooks.AsyncMerchantHelper, "get_merchant_token", fake_token)
+    processor = _worker()
+
+    asyncio.run(processor._refresh("M1", {"IG", "O"}, {"IG", "O"}, []))
+    asyncio.run(processor._refresh("M1", {"I"}, set(), []))  # another worker's change: no mirror work here
+    assert synced == [{"modifier_groups"}]
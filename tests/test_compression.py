@@ -0,0 +1,88 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from utils.compression import CompressionMiddleware, PrecompressedCache, choose_encoding
+
+BIG = b'{"items": [' + b",".join(b'{"name": "Margherita"}' for _ in range(200)) + b"]}"
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/big")
+    def big():
+        return Response(BIG, media_type="application/json", headers={"ETag": '"v1"', "Vary": "Origin"})
+
+    @app.get("/small")
+    def small():
+        return Response(b'{"ok": true}', media_type="application/json")
+
+    @app.get("/image")
+    def image():
+        return Response(BIG, media_type="image/png")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((BIG[i:i + 500] for i in range(0, len(BIG), 500)), media_type="application/json")
+
+    @app.get("/precompressed")
+    def already():
+        return Response(gzip.compress(BIG), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+    return TestClient(app)
+
+
+def _get(client: TestClient, path: str, accept_encoding: str = "gzip"):
+    return client.get(path, headers={"Accept-Encoding": accept_encoding})
+
+
+def test_large_json_is_gzipped():
+    response = _get(_client(), "/big")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Origin, Accept-Encoding"
+    assert response.headers["etag"] == 'W/"v1"'  # the compressed bytes aren't the ones the strong tag named
+    assert int(response.headers["content-length"]) < len(BIG)
+    assert response.content == BIG
+
+
+def test_streamed_bodies_are_compressed_chunk_by_chunk():
+    response = _get(_client(), "/stream")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == BIG
+
+
+def test_what_is_left_alone():
+    client = _client()
+    for path, accept_encoding in (
+        ("/small", "gzip"),      # under the minimum size
+        ("/image", "gzip"),      # not a compressible type
+        ("/big", "identity"),    # client doesn't accept gzip
+        ("/big", "gzip;q=0"),
+    ):
+        response = _get(client, path, accept_encoding)
+        assert "content-encoding" not in response.headers, (path, accept_encoding)
+
+    # Already encoded (precompressed cache entries): passed through, not compressed twice
+    response = _get(client, "/precompressed")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == BIG
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("*") == "gzip"
+    assert choose_encoding("*;q=0") is None
+    assert choose_encoding("deflate") is None
+    assert choose_encoding(None) is None
+
+
+def test_precompressed_bodies_are_reused():
+    cache = PrecompressedCache()
+    first = cache.get('"v1"', BIG, "gzip")
+    assert cache.get('"v1"', BIG, "gzip") is first
+    assert gzip.decompress(first) == BIG
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
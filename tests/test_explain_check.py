@@ -0,0 +1,43 @@
+import asyncio
+
+from sqlalchemy.dialects import mysql
+
+from database.explain_check import hot_queries, verdict
+from helpers.cart_helper import AsyncCartHelper, active_cart_by_session_query
+
+
+def test_scan_fails_even_with_possible_keys():
+    # MySQL listed the index but didn't use it (key=NULL): still a full table scan
+    assert verdict([{"type": "ALL", "possible_keys": "ix_carts_session_status", "key": None}]) == "FAIL"
+    assert verdict([{"type": "ALL", "possible_keys": None, "key": None}]) == "FAIL"
+    assert verdict([{"type": "index", "possible_keys": None, "key": "PRIMARY"}]) == "FAIL"
+
+
+def test_index_lookups_pass():
+    assert verdict([{"type": "ref", "possible_keys": "ix_carts_session_status", "key": "ix_carts_session_status"}]) == "ok"
+    assert verdict([
+        {"type": "eq_ref", "possible_keys": "PRIMARY", "key": "PRIMARY"},
+        {"type": "range", "possible_keys": "ix_orders_merchant_created", "key": "ix_orders_merchant_created"},
+    ]) == "ok"
+
+
+def test_hot_queries_compile_for_mysql():
+    dialect = mysql.dialect()
+    for label, statement, params in hot_queries():
+        if params:
+            continue  # text() queries run as written
+        sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+        assert sql.startswith("SELECT"), label
+
+
+def test_hot_queries_are_what_the_helpers_run(sqlite_url, make_database, orm_statements):
+    async def main():
+        sessionmaker = await make_database(sqlite_url)
+        async with sessionmaker() as db:
+            await AsyncCartHelper.get_active_cart_by_session(db, "EXPLAIN")
+
+    asyncio.run(main())
+    dialect = mysql.dialect()
+    assert [str(statement.compile(dialect=dialect)) for statement in orm_statements] == [
+        str(active_cart_by_session_query("EXPLAIN").compile(dialect=dialect))
+    ]
@@ -0,0 +1,119 @@
+import asyncio
+
+import httpx
+from fastapi import Request
+
+from services.clover_client import CloverClient
+from services.http_cache import ENTRY_OVERHEAD_BYTES, HttpCache, etag_json_response, etag_matches, make_etag
+
+ITEMS = "/v3/merchants/M1/items"
+
+
+def _put(cache: HttpCache, key, content: bytes = b"{}", merchant_id: str = "M1", endpoint: str = "items"):
+    return cache.put(key, None, 200, httpx.Headers(), content, merchant_id=merchant_id, endpoint=endpoint)
+
+
+def _request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = HttpCache(max_entries=2)
+    _put(cache, "a")
+    _put(cache, "b")
+    cache.lookup("a")
+    _put(cache, "c")
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") is not None and cache.lookup("c") is not None
+    assert cache.evictions == 1
+
+
+def test_byte_budget_bounds_the_cache():
+    body = b"x" * 1000
+    cache = HttpCache(max_bytes=2 * (len(body) + ENTRY_OVERHEAD_BYTES))
+    for key in "abc":
+        _put(cache, key, body)
+    assert len(cache) == 2 and cache.bytes <= cache.max_bytes
+
+    # A body bigger than the whole budget is handed back without being held
+    entry = _put(cache, "huge", b"x" * cache.max_bytes)
+    assert entry.content and cache.lookup("huge") is None
+
+
+def test_entries_are_fresh_only_within_the_ttl():
+    cache = HttpCache(ttl=60)
+    entry = _put(cache, "a")
+    assert cache.fresh("a") is entry
+    entry.stored_at -= 61
+    assert cache.fresh("a") is None
+    cache.touch("a")  # a 304 from Clover
+    assert cache.fresh("a") is entry
+    stats = cache.stats()
+    assert (stats["hits"], stats["revalidated"], stats["misses"]) == (2, 1, 1)
+
+
+def test_invalidate_by_merchant_and_endpoint():
+    cache = HttpCache()
+    _put(cache, "m1-items", merchant_id="M1", endpoint="items")
+    _put(cache, "m1-categories", merchant_id="M1", endpoint="categories")
+    _put(cache, "m2-items", merchant_id="M2", endpoint="items")
+
+    assert cache.invalidate("M1", "items") == 1
+    assert cache.invalidate("M1") == 1
+    assert cache.lookup("m2-items") is not None
+    assert cache.invalidate() == 1 and cache.bytes == 0
+
+
+def test_etag_matching_is_weak():
+    assert etag_matches('"abc"', 'W/"abc"')
+    assert etag_matches('W/"x", "abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_fresh_endpoints_are_served_without_calling_clover(fake_clover):
+    async def run():
+        first = await fake_clover.get(ITEMS, "token")
+        second = await fake_clover.get(ITEMS, "token")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(fake_clover.requests) == 1
+    assert second.content == first.content
+    assert second.headers["etag"] == make_etag(first.content)
+
+
+def test_stale_entry_is_revalidated_with_its_etag():
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, json={"elements": []}, headers={"ETag": '"v1"'})
+
+    client = CloverClient("https://clover.test", rate_limiter=None)
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+
+    async def run():
+        await client.get(ITEMS, "token")
+        for entry in client.cache._entries.values():
+            entry.stored_at -= client.cache.ttl + 1
+        return await client.get(ITEMS, "token")
+
+    response = asyncio.run(run())
+    assert response.status_code == 200 and response.json() == {"elements": []}
+    assert [request.headers.get("if-none-match") for request in sent] == [None, '"v1"']
+    assert client.cache.stats("M1")["revalidated"] == 1
+
+
+def test_matching_if_none_match_gets_a_304():
+    first = etag_json_response(_request(), {"items": [1, 2, 3]})
+    assert first.status_code == 200
+
+    again = etag_json_response(_request(if_none_match=first.headers["etag"]), {"items": [1, 2, 3]})
+    assert again.status_code == 304 and again.body == b""
+    changed = etag_json_response(_request(if_none_match=first.headers["etag"]), {"items": [1, 2]})
+    assert changed.status_code == 200
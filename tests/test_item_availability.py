@@ -0,0 +1,51 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services import item_availability as availability_module
+from services.item_availability import ItemAvailability, ItemUnavailableError, MerchantAvailability
+
+
+def _stock(item_id, **fields):
+    return {"item": {"id": item_id}, **fields}
+
+
+def test_fractional_quantities_are_kept():
+    availability = MerchantAvailability()
+    availability.update([_stock("BY_WEIGHT", quantity=0.5), _stock("COUNTED", stockCount=2), _stock("GONE", quantity=0)])
+
+    assert availability.stock_count("BY_WEIGHT") == 0.5
+    assert availability.sold_out() == ["GONE"]
+    assert availability.is_available("COUNTED", 2) and availability.is_available("UNTRACKED", 99)
+    with pytest.raises(ItemUnavailableError, match="0.5 left"):
+        availability.check("BY_WEIGHT", 1)
+
+
+def test_poll_loop_loads_every_merchant_with_a_token(monkeypatch, fake_clover):
+    class NoSession:
+        async def __aenter__(self):
+            return None
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def tokens(db):
+        return [("M1", "token"), ("M2", "token")]
+
+    monkeypatch.setattr(availability_module, "AsyncSessionLocal", NoSession)
+    monkeypatch.setattr(availability_module.AsyncMerchantHelper, "list_merchant_tokens", tokens)
+    availability = ItemAvailability()
+
+    async def run():
+        loop = asyncio.create_task(availability_module.run_availability_poll_loop(
+            fake_clover, availability, SimpleNamespace(CLOVER_AVAILABILITY_POLL_SECONDS=60),
+        ))
+        while len(availability.merchant_ids()) < 2:
+            await asyncio.sleep(0.01)
+        loop.cancel()
+
+    # Loaded before any request looked the merchants up, so the add-to-cart check never waits on Clover
+    asyncio.run(asyncio.wait_for(run(), 5))
+    assert sorted(availability.merchant_ids()) == ["M1", "M2"]
+    assert len(availability.peek("M1")) > 0
@@ -0,0 +1,57 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from services.leader import LeaderElection
+
+
+def _job(events, name):
+    async def job():
+        events.append(f"{name} started")
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            events.append(f"{name} stopped")
+            raise
+    return job
+
+
+def test_jobs_run_only_while_leader(sqlite_url):
+    async def main():
+        events = []
+        leader = LeaderElection(create_async_engine(sqlite_url), retry_seconds=0.01)
+        leader.add_job(_job(events, "refresh"))
+        election = asyncio.create_task(leader.run())
+        await asyncio.sleep(0.05)
+        assert leader.is_leader and events == ["refresh started"]
+
+        # Lock lost (e.g. the connection dropped): the jobs stop, and start again on re-election
+        still_held = [False]
+
+        async def lock_check():
+            held, still_held[0] = still_held[0], True
+            return held
+
+        leader._still_held = lock_check
+        await asyncio.sleep(0.05)
+        assert events == ["refresh started", "refresh stopped", "refresh started"]
+        assert leader.elections == 2
+
+        election.cancel()
+        await leader.release()
+        await asyncio.sleep(0)
+        assert not leader.is_leader and events[-1] == "refresh stopped"
+
+    asyncio.run(main())
+
+
+def test_mysql_lock_has_one_holder(mysql_url):
+    async def main():
+        first, second = (LeaderElection(create_async_engine(mysql_url), name="test_leader_lock") for _ in range(2))
+        assert await first.acquire()
+        assert not await second.acquire()
+        await first.release()
+        assert await second.acquire()
+        await second.release()
+
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+import asyncio
+
+import msgspec
+
+from models.clover import Item, item_page_decoder
+from utils.merchant_extractor import clean_order, extract_inventory_items, extract_merchant_details, extract_orders
+
+
+def _body(client, path: str, **params) -> bytes:
+    async def fetch():
+        response = await client.get(path, "token", params=params or None)
+        response.raise_for_status()
+        return response.content
+
+    return asyncio.run(fetch())
+
+
+def test_bytes_and_dicts_extract_the_same(fake_clover):
+    for path, extract, params in (
+        ("/v3/merchants/M1", extract_merchant_details, {}),
+        ("/v3/merchants/M1/items", extract_inventory_items, {"expand": "categories"}),
+        ("/v3/merchants/M1/orders", extract_orders, {}),
+    ):
+        body = _body(fake_clover, path, **params)
+        assert extract(body) == extract(msgspec.json.decode(body))
+
+
+def test_camel_case_fields_are_decoded(fake_clover):
+    merchant = extract_merchant_details(_body(fake_clover, "/v3/merchants/M1"))
+    assert merchant["merchant_id"] == "M1"
+    assert merchant["merchant_plan_id"] == "PLAN1"
+    assert merchant["owner_info"] == {"owner_id": "OWNER1"}
+
+    items = extract_inventory_items(_body(fake_clover, "/v3/merchants/M1/items", expand="categories"))
+    margherita = next(item for item in items["items"] if item["item_id"] == "ITEM1")
+    assert margherita == {
+        "item_id": "ITEM1",
+        "name": "Margherita",
+        "price": 299.0,
+        "price_type": "FIXED",
+        "sku": "PZ-001",
+        "category": "Pizzas",
+        "hidden": False,
+        "available": True,
+    }
+
+    orders = extract_orders(_body(fake_clover, "/v3/merchants/M1/orders"))
+    assert orders["orders"][0]["total"] == 448.0
+    assert orders["orders"][0]["line_items_count"] == 1
+
+
+def test_unknown_fields_are_skipped_and_missing_ones_default():
+    page = item_page_decoder.decode(b'{"elements": [{"id": "I1", "isRevenue": true, "tags": {"elements": []}}]}')
+    assert page.elements == [Item(id="I1")]
+    assert page.elements[0].price == 0 and page.elements[0].hidden is False
+
+
+def test_clean_order_accepts_a_dict():
+    order = {"id": "O1", "state": "open", "total": 1250, "employee": {"id": "E1"}, "device": {"name": "Station"}}
+    assert clean_order(order) == {
+        "order_id": "O1",
+        "state": "open",
+        "total": 12.5,
+        "tax_amount": 0,
+        "employee_id": "E1",
+        "device_name": "Station",
+        "line_items_count": 0,
+    }
@@ -0,0 +1,74 @@
+import asyncio
+
+from sqlalchemy import update
+
+from helpers import merchant_helper
+from helpers.merchant_helper import AsyncMerchantHelper
+from helpers.merchant_token_cache import MerchantTokenCache
+from models.merchant import Merchant
+from models.merchant_token import MerchantToken
+
+
+def test_entries_expire_and_unknown_merchants_are_cached_briefly():
+    cache = MerchantTokenCache(ttl=60, negative_ttl=5)
+    cache.put("M1", "token")
+    cache.put("M2", None)
+    assert cache.get("M1") == (True, "token")
+    assert cache.get("M2") == (True, None)
+    assert cache.get("M3") == (False, None)
+
+    for key, (token, expires_at) in list(cache._entries.items()):
+        cache._entries[key] = (token, expires_at - 6)
+    assert cache.get("M1") == (True, "token")
+    assert cache.get("M2") == (False, None)  # the negative TTL is shorter
+    assert cache.stats()["hits"] == 2 and cache.stats()["negative_hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_least_recently_used_merchant_is_dropped_first():
+    cache = MerchantTokenCache(max_entries=2)
+    cache.put("M1", "a")
+    cache.put("M2", "b")
+    cache.get("M1")
+    cache.put("M3", "c")
+    assert cache.get("M2") == (False, None)
+    assert cache.get("M1") == (True, "a") and cache.get("M3") == (True, "c")
+
+    cache.invalidate("M1")
+    assert cache.get("M1") == (False, None)
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+
+
+def test_zero_ttl_disables_caching():
+    cache = MerchantTokenCache(ttl=0)
+    cache.put("M1", "token")
+    assert cache.get("M1") == (False, None)
+
+
+def test_lookups_are_cached_until_the_token_is_stored(monkeypatch, sqlite_url, make_database):
+    monkeypatch.setattr(merchant_helper, "token_cache", MerchantTokenCache())
+
+    async def main():
+        sessionmaker = await make_database(sqlite_url)
+        async with sessionmaker() as db:
+            merchant = Merchant(clover_merchant_id="M1", name="Pizza Co")
+            db.add(merchant)
+            await db.flush()
+            db.add(MerchantToken(merchant_id=merchant.id, token="first"))
+            await db.commit()
+
+            assert await AsyncMerchantHelper.get_merchant_token(db, "M1") == "first"
+            assert await AsyncMerchantHelper.get_merchant_token(db, "NOPE") is None
+
+            # A write that bypasses the helper isn't seen until the entry expires...
+            await db.execute(update(MerchantToken).values(token="second"))
+            await db.commit()
+            assert await AsyncMerchantHelper.get_merchant_token(db, "M1") == "first"
+
+            # ...but one through the helper invalidates it right away
+            await AsyncMerchantHelper.store_or_update_token(db, merchant.id, "third")
+            assert await AsyncMerchantHelper.get_merchant_token(db, "M1") == "third"
+
+    asyncio.run(main())
+    stats = merchant_helper.token_cache.stats()
+    assert (stats["hits"], stats["negative_hits"], stats["misses"]) == (1, 0, 3)
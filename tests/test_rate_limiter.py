@@ -0,0 +1,83 @@
+import asyncio
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from services.clover_client import CloverClient
+from services.rate_limiter import MerchantRateLimiter, TokenBucket, parse_retry_after
+
+
+def test_bucket_grants_its_capacity_then_paces_the_rest():
+    bucket = TokenBucket(rate=50.0, capacity=3)
+
+    async def run():
+        started = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(run())
+    # Three banked tokens go at once; the other two wait 1/50 s each
+    assert elapsed >= 2 / 50 * 0.9
+    assert bucket.acquired == 5 and bucket.delayed == 2
+
+
+def test_pause_holds_back_the_next_caller():
+    bucket = TokenBucket(rate=100.0, capacity=10)
+    bucket.pause(0.1)
+
+    async def run():
+        started = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.09
+    assert bucket.throttled == 1 and bucket.delayed == 1
+
+
+def test_merchants_have_separate_buckets():
+    limiter = MerchantRateLimiter(rate=1.0, capacity=1)
+    limiter.throttle("M1", 60)
+
+    async def run():
+        await asyncio.wait_for(limiter.acquire("M2"), timeout=1)
+
+    asyncio.run(run())
+    stats = limiter.stats()
+    assert stats["M1"]["throttled"] == 1 and stats["M1"]["acquired"] == 0
+    assert stats["M2"]["acquired"] == 1 and stats["M2"]["throttled"] == 0
+    assert limiter.stats("M3") == {}
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("-5") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= parse_retry_after(later) <= 30
+    earlier = format_datetime(datetime.now(timezone.utc) - timedelta(seconds=30), usegmt=True)
+    assert parse_retry_after(earlier) == 0.0
+
+
+def test_429_pauses_the_merchant_bucket_for_retry_after():
+    statuses = [429, 200]
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(time.monotonic())
+        return httpx.Response(statuses.pop(0), json={}, headers={"Retry-After": "0.2"})
+
+    limiter = MerchantRateLimiter(rate=100.0, capacity=10)
+    client = CloverClient("https://clover.test", rate_limiter=limiter, retry_base_delay=0.0)
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+
+    response = asyncio.run(client.request("GET", "/v3/merchants/M1/orders", "token"))
+    assert response.status_code == 200
+    # The retry waited on the bucket, not on a sleep of its own
+    assert sent[1] - sent[0] >= 0.18
+    bucket = limiter.stats("M1")["M1"]
+    assert bucket["throttled"] == 1 and bucket["acquired"] == 2 and bucket["delayed"] == 1
@@ -0,0 +1,80 @@
+import asyncio
+
+import httpx
+
+from services.single_flight import SharedStream, StreamStalled
+
+
+def _body(chunks: int, size: int = 1000):
+    async def gen():
+        for i in range(chunks):
+            await asyncio.sleep(0)
+            yield bytes([i % 256]) * size
+    return gen()
+
+
+async def _open(chunks: int, on_complete=None, **options) -> SharedStream:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=_body(chunks))))
+    response = await client.send(client.build_request("GET", "http://clover.test/v3/merchants/M1/items"), stream=True)
+    return await SharedStream.open(response, on_complete=on_complete, **options)
+
+
+def test_readers_share_a_bounded_window():
+    async def run():
+        stream = await _open(500, buffer_bytes=10_000)
+        fast, slow = stream.reader(), stream.reader()
+        peak = 0
+
+        async def read(reader, delay):
+            nonlocal peak
+            received = b""
+            async for chunk in reader.aiter_raw():
+                received += chunk
+                peak = max(peak, stream._buffered)
+                await asyncio.sleep(delay)
+            return received
+
+        bodies = await asyncio.gather(read(fast, 0), read(slow, 0.0005))
+        return stream, bodies, peak
+
+    stream, (fast_body, slow_body), peak = asyncio.run(run())
+    assert len(fast_body) == 500_000 and fast_body == slow_body
+    assert peak <= 10_000
+    # The start of the body is gone, so nobody else can join
+    assert stream.reader() is None
+
+
+def test_body_kept_for_the_cache_only_within_limit():
+    async def run(chunks):
+        completed = []
+        stream = await _open(chunks, on_complete=lambda s: completed.append(s.body()), body_limit=20_000)
+        async for _ in stream.reader().aiter_raw():
+            pass
+        return completed
+
+    assert [len(body) for body in asyncio.run(run(5))] == [5_000]
+    assert asyncio.run(run(50)) == []
+
+
+def test_unread_stream_is_closed_after_stall_timeout():
+    async def run():
+        stream = await _open(100, buffer_bytes=5_000, stall_timeout=0.05)
+        await asyncio.sleep(0.3)
+        return stream
+
+    stream = asyncio.run(run())
+    assert isinstance(stream._error, StreamStalled)
+    assert stream.reader() is None
+
+
+def test_last_reader_leaving_stops_the_pump():
+    async def run():
+        stream = await _open(1000, buffer_bytes=5_000)
+        chunks = stream.reader().aiter_raw()
+        for _ in range(20):
+            await chunks.__anext__()
+        await chunks.aclose()
+        await asyncio.sleep(0.05)
+        return stream
+
+    assert asyncio.run(run())._pump.done()
@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from models.merchant import Merchant
+from models.merchant_token import MerchantToken
+from services import token_refresh
+from services.token_refresh import TokenRefresher
+
+
+async def _add_merchant(sessionmaker) -> None:
+    async with sessionmaker() as db:
+        merchant = Merchant(clover_merchant_id="M1")
+        db.add(merchant)
+        await db.flush()
+        db.add(MerchantToken(
+            merchant_id=merchant.id, token="old", refresh_token="r1",
+            expires_at=datetime.utcnow() + timedelta(minutes=1),
+        ))
+        await db.commit()
+
+
+def _exchange(calls):
+    async def exchange(refresh_token):
+        calls.append(refresh_token)
+        await asyncio.sleep(0.2)  # long enough for the other worker to get to the token row
+        return {"access_token": f"new-{len(calls)}", "refresh_token": f"r{len(calls) + 1}", "expires_in": 3600}
+    return exchange
+
+
+def test_refresh_reads_the_token_row_for_update(sqlite_url, make_database, orm_statements, monkeypatch):
+    async def main():
+        sessionmaker = await make_database(sqlite_url)
+        monkeypatch.setattr(token_refresh, "AsyncSessionLocal", sessionmaker)
+        await _add_merchant(sessionmaker)
+        orm_statements.clear()
+
+        calls = []
+        assert await TokenRefresher(exchange=_exchange(calls)).refresh("M1", failed_token="old") == "new-1"
+        assert calls == ["r1"]
+        # The re-read that decides whether to spend the refresh token holds the row lock
+        assert orm_statements[0]._for_update_arg is not None
+
+    asyncio.run(main())
+
+
+def test_two_workers_spend_the_refresh_token_once(mysql_url, make_database, monkeypatch):
+    async def main():
+        sessionmaker = await make_database(mysql_url)
+        monkeypatch.setattr(token_refresh, "AsyncSessionLocal", sessionmaker)
+        await _add_merchant(sessionmaker)
+
+        calls = []
+        # Two workers (separate single-flight maps) get a 401 for the same token at once
+        workers = [TokenRefresher(exchange=_exchange(calls)) for _ in range(2)]
+        tokens = await asyncio.gather(*(worker.refresh("M1", failed_token="old") for worker in workers))
+
+        assert calls == ["r1"]
+        assert tokens == ["new-1", "new-1"]
+        assert sum(worker.reused for worker in workers) == 1
+
+    asyncio.run(main())
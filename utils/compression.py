@@ -0,0 +1,201 @@
+"""
+Response compression
+
+CompressionMiddleware gzip- or brotli-compresses responses the client will
+accept (brotli only when the `brotli` package is installed), streaming
+bodies included. Responses that already carry a Content-Encoding pass
+through untouched, which is how precompressed bodies skip it:
+HttpCache entries and ETagged JSON keep their compressed variants (see
+precompressed() / CachedResponse.encoded_body) so a hot menu is compressed
+once, not per request.
+"""
+
+import gzip
+import zlib
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Preference order when the client accepts several
+SUPPORTED_ENCODINGS: Tuple[str, ...] = ("br", "gzip") if brotli else ("gzip",)
+
+# Smaller bodies aren't worth the CPU (or the framing overhead)
+MINIMUM_SIZE = 1024
+
+# Per-request compression favours speed; bodies compressed once and kept can afford more
+STREAM_LEVELS = {"gzip": 5, "br": 4}
+CACHED_LEVELS = {"gzip": 9, "br": 9}
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best encoding we support from an Accept-Encoding header (honours q=0), or None"""
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    level = CACHED_LEVELS[encoding] if level is None else level
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def vary_accept_encoding(vary: Optional[str]) -> str:
+    if not vary:
+        return "Accept-Encoding"
+    if "accept-encoding" in vary.lower():
+        return vary
+    return f"{vary}, Accept-Encoding"
+
+
+def weak_etag(etag: str) -> str:
+    """A compressed body isn't byte-identical to the original, so a strong ETag has to become weak"""
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=STREAM_LEVELS["br"])
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(STREAM_LEVELS["gzip"], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def feed(self, data: bytes) -> bytes:
+        if self._brotli:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self._brotli else self._zlib.flush()
+
+
+class PrecompressedCache:
+    """Small LRU of compressed bodies keyed by (ETag, encoding), for responses we build ourselves"""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+
+    def get(self, key: Hashable, body: bytes, encoding: str) -> bytes:
+        cache_key = (key, encoding)
+        compressed = self._entries.get(cache_key)
+        if compressed is not None:
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return compressed
+
+        self.misses += 1
+        compressed = compress(body, encoding)
+        if len(compressed) <= self.max_bytes:
+            self._entries[cache_key] = compressed
+            self.bytes += len(compressed)
+            while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+        return compressed
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+
+precompressed = PrecompressedCache()
+
+
+class CompressionMiddleware:
+    """Pure ASGI so streaming responses are compressed chunk by chunk instead of buffered"""
+
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        accept_encoding = next(
+            (value.decode("latin-1") for name, value in scope["headers"] if name == b"accept-encoding"), None
+        )
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start_message = None
+        compressor: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = {name.lower(): value for name, value in start_message["headers"]}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if (
+                    b"content-encoding" in headers
+                    or start_message["status"] in (204, 304)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    return await send(message)
+
+                compressor = _StreamCompressor(encoding)
+                new_headers = [
+                    (name, value) for name, value in start_message["headers"]
+                    if name.lower() not in (b"content-length", b"vary", b"etag")
+                ]
+                new_headers.append((b"content-encoding", encoding.encode()))
+                new_headers.append((b"vary", vary_accept_encoding(headers.get(b"vary", b"").decode("latin-1")).encode()))
+                if b"etag" in headers:
+                    new_headers.append((b"etag", weak_etag(headers[b"etag"].decode("latin-1")).encode()))
+                if not more_body:
+                    compressed = compressor.feed(body) + compressor.finish()
+                    new_headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start_message, "headers": new_headers})
+                    return await send({"type": "http.response.body", "body": compressed})
+                await send({**start_message, "headers": new_headers})
+
+            chunk = compressor.feed(body)
+            if not more_body:
+                chunk += compressor.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
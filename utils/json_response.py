@@ -0,0 +1,16 @@
+"""
+JSON responses encoded with msgspec
+
+Drop-in for FastAPI's JSONResponse (use as response_class, or return it
+directly) that skips the stdlib encoder for large Clover payloads.
+"""
+
+from typing import Any
+
+import msgspec
+from fastapi.responses import JSONResponse
+
+
+class MsgspecJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return msgspec.json.encode(content)
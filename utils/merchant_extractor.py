@@ -6,51 +6,79 @@ from Clover API responses, making them more suitable for mobile apps.
 """
 
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Type, TypeVar, Union
 
+import msgspec
 
-def extract_merchant_details(clover_response: Dict[str, Any]) -> Dict[str, Any]:
+from models.clover import Elements, Item, Merchant, Order, Ref, item_page_decoder, merchant_decoder, order_page_decoder
+
+T = TypeVar("T")
+
+# Extractors take the raw response bytes (fastest), an already decoded struct,
+# or a plain dict for older callers
+CloverPayload = Union[bytes, str, Dict[str, Any], msgspec.Struct]
+
+
+def _decode(payload: CloverPayload, decoder: msgspec.json.Decoder, type_: Type[T]) -> T:
+    if isinstance(payload, (bytes, bytearray, memoryview, str)):
+        return decoder.decode(payload)
+    if isinstance(payload, msgspec.Struct):
+        return payload
+    return msgspec.convert(payload, type_)
+
+
+def _format_timestamp(timestamp_ms: Optional[int], fmt: str = "%Y-%m-%d %H:%M:%S") -> Optional[str]:
+    """Convert millisecond timestamp to readable date string"""
+    if timestamp_ms:
+        try:
+            return datetime.fromtimestamp(timestamp_ms / 1000).strftime(fmt)
+        except (ValueError, TypeError, OverflowError, OSError):
+            return None
+    return None
+
+
+def _id(ref: Optional[Ref]) -> Optional[str]:
+    return ref.id if ref else None
+
+
+def _href(ref: Optional[Ref]) -> Optional[str]:
+    return ref.href if ref else None
+
+
+def extract_merchant_details(clover_response: CloverPayload) -> Dict[str, Any]:
     """
     Extract only essential merchant details from Clover API response
     This function can be reused for any merchant API response
 
     Args:
-        clover_response: Raw response from Clover merchant API
+        clover_response: Raw response (bytes) or decoded body from Clover merchant API
 
     Returns:
         Cleaned merchant details with only relevant information
     """
-
-    def convert_timestamp(timestamp_ms: Optional[int]) -> Optional[str]:
-        """Convert millisecond timestamp to readable date string"""
-        if timestamp_ms:
-            try:
-                return datetime.fromtimestamp(timestamp_ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
-            except (ValueError, TypeError):
-                return None
-        return None
+    merchant = _decode(clover_response, merchant_decoder, Merchant)
 
     # Extract basic merchant info
     merchant_details = {
-        "merchant_id": clover_response.get("id"),
-        "merchant_name": clover_response.get("name"),
-        "created_date": convert_timestamp(clover_response.get("createdTime")),
-        "merchant_plan_id": clover_response.get("merchantPlan", {}).get("id"),
-        "reseller_id": clover_response.get("reseller", {}).get("id"),
+        "merchant_id": merchant.id,
+        "merchant_name": merchant.name,
+        "created_date": _format_timestamp(merchant.created_time),
+        "merchant_plan_id": _id(merchant.merchant_plan),
+        "reseller_id": _id(merchant.reseller),
         "owner_info": {
-            "owner_id": clover_response.get("owner", {}).get("id"),
-        } if clover_response.get("owner") else None,
+            "owner_id": merchant.owner.id,
+        } if merchant.owner else None,
         "available_endpoints": {
-            "address": clover_response.get("address", {}).get("href"),
-            "orders": clover_response.get("orders", {}).get("href"),
-            "payments": clover_response.get("payments", {}).get("href"),
-            "tenders": clover_response.get("tenders", {}).get("href"),
-            "tax_rates": clover_response.get("taxRates", {}).get("href"),
-            "printers": clover_response.get("printers", {}).get("href"),
-            "modifier_groups": clover_response.get("modifierGroups", {}).get("href"),
-            "order_types": clover_response.get("orderTypes", {}).get("href"),
-            "opening_hours": clover_response.get("opening_hours", {}).get("href"),
-            "shifts": clover_response.get("shifts", {}).get("href")
+            "address": _href(merchant.address),
+            "orders": _href(merchant.orders),
+            "payments": _href(merchant.payments),
+            "tenders": _href(merchant.tenders),
+            "tax_rates": _href(merchant.tax_rates),
+            "printers": _href(merchant.printers),
+            "modifier_groups": _href(merchant.modifier_groups),
+            "order_types": _href(merchant.order_types),
+            "opening_hours": _href(merchant.opening_hours),
+            "shifts": _href(merchant.shifts)
         }
     }
 
@@ -102,29 +130,30 @@ def validate_merchant_response(clover_response: Dict[str, Any]) -> bool:
     return all(field in clover_response and clover_response[field] for field in required_fields)
 
 
-def extract_inventory_items(clover_response: Dict[str, Any]) -> Dict[str, Any]:
+def extract_inventory_items(clover_response: CloverPayload) -> Dict[str, Any]:
     """
     Extract and clean inventory items from Clover API response
 
     Args:
-        clover_response: Raw response from Clover inventory API
+        clover_response: Raw response (bytes) or decoded body from Clover inventory API
 
     Returns:
         Cleaned inventory data
     """
-    items = clover_response.get("elements", [])
+    items = _decode(clover_response, item_page_decoder, Elements[Item]).elements
 
     cleaned_items = []
     for item in items:
+        categories = item.categories.elements if item.categories else None
         cleaned_item = {
-            "item_id": item.get("id"),
-            "name": item.get("name"),
-            "price": item.get("price", 0) / 100 if item.get("price") else 0,  # Convert cents to dollars
-            "price_type": item.get("priceType"),
-            "sku": item.get("sku"),
-            "category": item.get("categories", {}).get("elements", [{}])[0].get("name") if item.get("categories") else None,
-            "hidden": item.get("hidden", False),
-            "available": not item.get("hidden", False)
+            "item_id": item.id,
+            "name": item.name,
+            "price": item.price / 100 if item.price else 0,  # Convert cents to dollars
+            "price_type": item.price_type,
+            "sku": item.sku,
+            "category": categories[0].name if categories else None,
+            "hidden": item.hidden,
+            "available": not item.hidden
         }
 
         # Remove None values
@@ -136,43 +165,47 @@ def extract_inventory_items(clover_response: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def extract_orders(clover_response: Dict[str, Any]) -> Dict[str, Any]:
+def clean_order(order: Union[Order, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Clean a single order element from a Clover orders response
+
+    Args:
+        order: One element of the Clover orders API "elements" list (Order or dict)
+
+    Returns:
+        Cleaned order data
+    """
+    if not isinstance(order, Order):
+        order = msgspec.convert(order, Order)
+
+    cleaned_order = {
+        "order_id": order.id,
+        "state": order.state,
+        "total": order.total / 100 if order.total else 0,  # Convert cents to dollars
+        "tax_amount": order.tax_amount / 100 if order.tax_amount else 0,
+        "created_time": _format_timestamp(order.created_time),
+        "employee_id": _id(order.employee),
+        "device_name": order.device.name if order.device else None,
+        "line_items_count": len(order.line_items.elements) if order.line_items else 0
+    }
+
+    # Remove None values
+    return {k: v for k, v in cleaned_order.items() if v is not None}
+
+
+def extract_orders(clover_response: CloverPayload) -> Dict[str, Any]:
     """
     Extract and clean orders from Clover API response
 
     Args:
-        clover_response: Raw response from Clover orders API
+        clover_response: Raw response (bytes) or decoded body from Clover orders API
 
     Returns:
         Cleaned orders data
     """
-    orders = clover_response.get("elements", [])
-
-    cleaned_orders = []
-    for order in orders:
-        # Convert timestamp
-        created_time = None
-        if order.get("createdTime"):
-            try:
-                created_time = datetime.fromtimestamp(
-                    order.get("createdTime", 0) / 1000
-                ).strftime("%Y-%m-%d %H:%M:%S")
-            except (ValueError, TypeError):
-                created_time = None
-
-        cleaned_order = {
-            "order_id": order.get("id"),
-            "state": order.get("state"),
-            "total": order.get("total", 0) / 100 if order.get("total") else 0,  # Convert cents to dollars
-            "tax_amount": order.get("taxAmount", 0) / 100 if order.get("taxAmount") else 0,
-            "created_time": created_time,
-            "employee_id": order.get("employee", {}).get("id") if order.get("employee") else None,
-            "device_name": order.get("device", {}).get("name") if order.get("device") else None,
-            "line_items_count": len(order.get("lineItems", {}).get("elements", []))
-        }
+    orders = _decode(clover_response, order_page_decoder, Elements[Order]).elements
 
-        # Remove None values
-        cleaned_orders.append({k: v for k, v in cleaned_order.items() if v is not None})
+    cleaned_orders = [clean_order(order) for order in orders]
 
     return {
         "total_orders": len(cleaned_orders),